@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['InstagramLiveStreamFolder.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
     datas=[],
     hiddenimports=[],
@@ -6,15 +6,21 @@ A tkinter-based GUI application for streaming video to Instagram Live
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
 import threading
 import os
+import sys
 import json
-import time
-import queue
-import platform
 from datetime import datetime
 
+# Shared streaming core lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamer.dispatch import UIDispatcher
+from streamer.engine import StreamEngine
+from streamer.logqueue import LogQueue
+from streamer.logsink import LogSink
+from streamer.logview import LogView
+from streamer.profiles import PROFILES
+
 class InstagramStreamerGUI:
     def __init__(self, root):
         self.root = root
@@ -30,22 +36,21 @@ class InstagramStreamerGUI:
         
         # Streaming state
         self.streaming = False
-        self.ffmpeg_process = None
-        self.restart_count = 0
-        self.stream_thread = None
-        self.output_queue = queue.Queue()
+        self.stopping = False
+        self.engine = None
+        # Worker threads reach the widgets only through this dispatcher
+        self.ui = UIDispatcher(self.root)
+        # Bounded: a chatty ffmpeg can never outrun the display and eat memory
+        self.log_queue = LogQueue()
+        
+        # Rotating log file, written by its own thread
+        self.log_sink = LogSink(os.path.join("logs", "insta_stream.log"))
         
         # Create UI
         self.create_widgets()
         
         # Load saved configuration
         self.load_config()
-        
-        # Ensure logs directory exists
-        os.makedirs("logs", exist_ok=True)
-        
-        # Start output reader thread
-        self.start_output_reader()
     
     def setup_instagram_theme(self):
         """Setup Instagram-inspired pink/violet/dark theme"""
@@ -181,6 +186,7 @@ class InstagramStreamerGUI:
             highlightbackground=self.border_color, state=tk.DISABLED
         )
         self.log_text.grid(row=6, column=0, columnspan=3, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.log_view = LogView(self.root, self.log_text)
         main_frame.rowconfigure(6, weight=1)
 
     def create_styled_entry(self, parent, variable, show=None):
@@ -257,89 +263,79 @@ class InstagramStreamerGUI:
     def log_message(self, msg):
         ts = datetime.now().strftime('%H:%M:%S')
         full_msg = f"[{ts}] {msg}\n"
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, full_msg)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        try:
-            with open("logs/insta_stream.log", "a") as f: f.write(full_msg)
-        except: pass
+        self.log_view.append(full_msg)
+        self.log_sink.write(full_msg)
 
-    def start_output_reader(self):
-        def reader():
-            while True:
-                try:
-                    msg = self.output_queue.get(timeout=0.1)
-                    if msg: self.log_message(msg)
-                except queue.Empty: continue
-        threading.Thread(target=reader, daemon=True).start()
+    def on_engine_log(self, msg):
+        if self.log_queue.put(msg):
+            self.ui.post(self.flush_engine_log)
+
+    def flush_engine_log(self):
+        for msg in self.log_queue.drain():
+            self.log_message(msg)
 
     def start_stream(self):
         if not self.video_file_var.get() or not self.stream_key_var.get():
             messagebox.showerror("Missing Data", "Please select a video and enter your Stream Key.")
             return
+        if not self.rtmp_url_var.get():
+            messagebox.showerror("Missing Data", "Please enter the RTMP URL.")
+            return
+        if self.streaming or self.stopping:
+            return
         
+        profile = PROFILES["ig"]
         self.streaming = True
         # Toggle buttons
         self._set_btn_state(self.start_btn, True)
         self._set_btn_state(self.stop_btn, False)
         
         self.update_status("Starting Instagram Live...")
-        self.stream_thread = threading.Thread(target=self.run_ffmpeg, daemon=True)
-        self.stream_thread.start()
+        self.log_message("Launching FFmpeg...")
+        self.engine = StreamEngine(
+            profile,
+            self.video_file_var.get(),
+            profile.output_url(self.stream_key_var.get(), self.rtmp_url_var.get()),
+            on_log=self.on_engine_log,
+            on_status=self.ui.wrap(self.on_engine_status),
+            on_error=self.ui.wrap(lambda message: messagebox.showerror("Error", message)),
+            on_stopped=self.ui.wrap(self.on_engine_stopped)
+        )
+        self.engine.start()
 
-    def stop_stream(self):
+    def stop_stream(self, on_done=None):
+        if self.stopping:
+            return
         self.streaming = False
+        self.stopping = True
         self.update_status("Stopping...")
-        if self.ffmpeg_process:
-            try:
-                if platform.system() == "Windows":
-                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.ffmpeg_process.pid)], capture_output=True)
-                else:
-                    self.ffmpeg_process.terminate()
-            except: pass
-        
-        self.ffmpeg_process = None
-        # Toggle buttons back
-        self._set_btn_state(self.start_btn, False)
         self._set_btn_state(self.stop_btn, True)
-        self.update_status("Stream Stopped")
+        # engine.stop() waits for ffmpeg to exit, so it runs off the Tk main loop
+        threading.Thread(target=self._shutdown, args=(on_done,), daemon=True).start()
 
-    def run_ffmpeg(self):
-        video = self.video_file_var.get()
-        url = self.rtmp_url_var.get()
-        key = self.stream_key_var.get()
-        
-        # Instagram vertical format command
-        cmd = [
-            "ffmpeg", "-re", "-stream_loop", "-1", "-i", video,
-            "-vf", "crop=in_h*9/16:in_h,scale=720:1280", 
-            "-c:v", "libx264", "-preset", "superfast", "-b:v", "2500k",
-            "-maxrate", "2500k", "-bufsize", "5000k", "-pix_fmt", "yuv420p",
-            "-g", "60", "-c:a", "aac", "-b:a", "128k", "-ar", "44100",
-            "-f", "flv", f"{url}{key}"
-        ]
+    def _shutdown(self, on_done):
+        if self.engine:
+            self.engine.stop()
+        self.ui.post(self._on_shutdown_complete, on_done)
 
-        self.log_message("Launching FFmpeg...")
-        
-        try:
-            self.ffmpeg_process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-                universal_newlines=True, bufsize=1
-            )
-            
-            self.root.after(0, lambda: self.update_status("LIVE on Instagram", self.accent_pink))
+    def _on_shutdown_complete(self, on_done):
+        self.stopping = False
+        self.on_engine_stopped()
+        if on_done: on_done()
 
-            for line in iter(self.ffmpeg_process.stdout.readline, ''):
-                if not self.streaming: break
-                if line.strip(): self.output_queue.put(line.strip())
-            
-            self.ffmpeg_process.wait()
-        except Exception as e:
-            self.log_message(f"Execution Error: {str(e)}")
-        
-        if self.streaming:
-            self.root.after(0, self.stop_stream)
+    def on_engine_status(self, msg):
+        if msg == "Streaming...":
+            self.update_status("LIVE on Instagram", self.accent_pink)
+        elif msg != "Stopped":
+            self.update_status(msg)
+
+    def on_engine_stopped(self):
+        self.streaming = False
+        if self.stopping: return
+        # Toggle buttons back
+        self._set_btn_state(self.start_btn, False)
+        self._set_btn_state(self.stop_btn, True)
+        self.update_status("Stream Stopped")
 
     def save_config(self):
         data = {"video": self.video_file_var.get(), "url": self.rtmp_url_var.get(), "key": self.stream_key_var.get()}
@@ -358,15 +354,12 @@ class InstagramStreamerGUI:
             except: pass
 
     def clear_logs(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.clear()
 
     def on_closing(self):
         if self.streaming:
             if messagebox.askokcancel("Quit", "Stream is active. Force quit?"):
-                self.stop_stream()
-                self.root.destroy()
+                self.stop_stream(on_done=self.root.destroy)
         else:
             self.root.destroy()
 
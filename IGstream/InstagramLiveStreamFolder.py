@@ -7,15 +7,20 @@ in a vertical format (9:16) and a continuous circular loop.
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
 import threading
 import os
+import sys
 import json
-import time
-import queue
-import platform
 from datetime import datetime
 
+# Shared streaming core lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamer.dispatch import UIDispatcher
+from streamer.engine import StreamEngine
+from streamer.logqueue import LogQueue
+from streamer.logview import LogView
+from streamer.profiles import PROFILES
+
 class InstagramStreamerGUI:
     def __init__(self, root):
         self.root = root
@@ -31,21 +36,18 @@ class InstagramStreamerGUI:
         
         # Streaming state
         self.streaming = False
-        self.ffmpeg_process = None
-        self.stream_thread = None
-        self.output_queue = queue.Queue()
-        
-        # Supported video extensions
-        self.video_extensions = ('.mp4', '.mov', '.avi', '.mkv', '.flv', '.ts')
+        self.stopping = False
+        self.engine = None
+        # Worker threads reach the widgets only through this dispatcher
+        self.ui = UIDispatcher(self.root)
+        # Bounded: a chatty ffmpeg can never outrun the display and eat memory
+        self.log_queue = LogQueue()
         
         # Create UI
         self.create_widgets()
         
         # Load saved configuration
         self.load_config()
-        
-        # Start output reader thread
-        self.start_output_reader()
     
     def setup_instagram_theme(self):
         """Setup Instagram-inspired pink/violet/dark theme"""
@@ -114,6 +116,10 @@ class InstagramStreamerGUI:
         self.show_key_var = tk.BooleanVar()
         ttk.Checkbutton(k_frame, text="Show", variable=self.show_key_var, 
                        command=lambda: self.key_entry.config(show="" if self.show_key_var.get() else "*")).grid(row=0, column=1)
+        
+        # 4. Gapless playout keeps a single RTMP connection open across files
+        self.gapless_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(section_frame, text="Gapless playout (single connection)", variable=self.gapless_var).grid(row=3, column=1, sticky=tk.W, pady=(0, 8))
 
         # Controls
         self.button_frame = ttk.Frame(main_frame)
@@ -151,6 +157,7 @@ class InstagramStreamerGUI:
         
         self.log_text = scrolledtext.ScrolledText(main_frame, height=10, bg=self.entry_bg, fg=self.fg_color, font=("Consolas", 9), relief=tk.FLAT, state=tk.DISABLED)
         self.log_text.grid(row=7, column=0, columnspan=3, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.log_view = LogView(self.root, self.log_text)
         main_frame.rowconfigure(7, weight=1)
 
     def create_styled_entry(self, parent, variable, show=None):
@@ -206,114 +213,77 @@ class InstagramStreamerGUI:
     def log_message(self, msg):
         ts = datetime.now().strftime('%H:%M:%S')
         full_msg = f"[{ts}] {msg}\n"
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, full_msg)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.append(full_msg)
+
+    def on_engine_log(self, msg):
+        if self.log_queue.put(msg):
+            self.ui.post(self.flush_engine_log)
 
-    def start_output_reader(self):
-        def reader():
-            while True:
-                try:
-                    msg = self.output_queue.get(timeout=0.1)
-                    if msg: self.log_message(msg)
-                except queue.Empty: continue
-                except: break
-        threading.Thread(target=reader, daemon=True).start()
+    def flush_engine_log(self):
+        for msg in self.log_queue.drain():
+            self.log_message(msg)
 
     def start_stream(self):
         folder = self.folder_path_var.get().strip()
+        url = self.rtmp_url_var.get().strip()
         key = self.stream_key_var.get().strip()
         if not folder or not os.path.isdir(folder):
             return messagebox.showerror("Error", "Please select a valid folder")
         if not key:
             return messagebox.showerror("Error", "Enter Stream Key")
+        if not url:
+            return messagebox.showerror("Error", "Enter Stream URL")
+        if self.streaming or self.stopping:
+            return
         
+        profile = PROFILES["ig"]
         self.streaming = True
         self._set_btn_state(self.start_btn, True)
         self._set_btn_state(self.stop_btn, False)
         self.status_var.set("Starting Folder Loop...")
         self.status_indicator.config(fg=self.accent_pink)
         
-        self.stream_thread = threading.Thread(target=self.stream_loop, daemon=True)
-        self.stream_thread.start()
+        self.engine = StreamEngine(
+            profile, folder, profile.output_url(key, url),
+            folder=True, gapless=self.gapless_var.get(),
+            on_log=self.on_engine_log,
+            on_status=self.ui.wrap(self.status_var.set),
+            on_file=self.ui.wrap(lambda f: self.current_video_var.set(f"NOW LIVE: {f}" if f else "Stream cycle ended")),
+            on_error=self.ui.wrap(lambda message: messagebox.showerror("Error", message)),
+            on_stopped=self.ui.wrap(self.on_engine_stopped)
+        )
+        self.engine.start()
 
-    def stop_stream(self):
+    def stop_stream(self, on_done=None):
+        if self.stopping:
+            return
         self.streaming = False
+        self.stopping = True
         self.status_var.set("Stopping...")
-        if self.ffmpeg_process:
-            try:
-                if platform.system() == "Windows":
-                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.ffmpeg_process.pid)], capture_output=True)
-                else:
-                    self.ffmpeg_process.terminate()
-            except: pass
-        
+        self._set_btn_state(self.stop_btn, True)
+        # engine.stop() waits for ffmpeg to exit, so it runs off the Tk main loop
+        threading.Thread(target=self._shutdown, args=(on_done,), daemon=True).start()
+
+    def _shutdown(self, on_done):
+        if self.engine:
+            self.engine.stop()
+        self.ui.post(self._on_shutdown_complete, on_done)
+
+    def _on_shutdown_complete(self, on_done):
+        self.stopping = False
+        self.on_engine_stopped()
+        if on_done: on_done()
+
+    def on_engine_stopped(self):
+        self.streaming = False
+        if self.stopping: return
         self._set_btn_state(self.start_btn, False)
         self._set_btn_state(self.stop_btn, True)
         self.status_var.set("Stream Stopped")
         self.status_indicator.config(fg=self.success_color)
 
-    def stream_loop(self):
-        folder = self.folder_path_var.get().strip()
-        url = self.rtmp_url_var.get().strip()
-        key = self.stream_key_var.get().strip()
-        full_url = f"{url}{key}"
-        
-        while self.streaming:
-            # Re-scan folder for videos
-            files = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(self.video_extensions)]
-            files.sort()
-            
-            if not files:
-                self.log_message("No video files found! Waiting...")
-                time.sleep(5)
-                continue
-            
-            for video_path in files:
-                if not self.streaming: break
-                
-                filename = os.path.basename(video_path)
-                self.root.after(0, lambda f=filename: self.current_video_var.set(f"NOW LIVE: {f}"))
-                self.log_message(f"Starting Video: {filename}")
-                
-                # FFmpeg Instagram Vertical Command
-                # crop=in_h*9/16:in_h crops the center to vertical, then we scale to 720:1280
-                cmd = [
-                    "ffmpeg", "-re", "-i", video_path,
-                    "-vf", "crop=in_h*9/16:in_h,scale=720:1280", 
-                    "-c:v", "libx264", "-preset", "superfast", "-b:v", "3000k", "-maxrate", "3000k", "-bufsize", "6000k",
-                    "-pix_fmt", "yuv420p", "-g", "60",
-                    "-c:a", "aac", "-b:a", "128k", "-ar", "44100",
-                    "-f", "flv", full_url
-                ]
-                
-                try:
-                    self.ffmpeg_process = subprocess.Popen(
-                        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-                        universal_newlines=True, bufsize=1,
-                        creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                    )
-                    
-                    for line in iter(self.ffmpeg_process.stdout.readline, ''):
-                        if not self.streaming: break
-                        if "fps=" in line and time.time() % 4 < 0.1: # Throttled logs
-                            self.output_queue.put(line.strip())
-                        elif "Error" in line:
-                            self.output_queue.put(line.strip())
-                            
-                    self.ffmpeg_process.wait()
-                except Exception as e:
-                    self.log_message(f"FFmpeg Error: {e}")
-                
-                if self.streaming:
-                    self.log_message(f"Finished {filename}. Transitioning...")
-                    time.sleep(1)
-
-        self.root.after(0, lambda: self.current_video_var.set("Stream cycle ended"))
-
     def save_config(self):
-        data = {"folder": self.folder_path_var.get(), "url": self.rtmp_url_var.get(), "key": ""}
+        data = {"folder": self.folder_path_var.get(), "url": self.rtmp_url_var.get(), "key": "", "gapless": self.gapless_var.get()}
         try:
             with open(self.config_file, "w") as f: json.dump(data, f)
             self.log_message("Configuration saved.")
@@ -327,18 +297,16 @@ class InstagramStreamerGUI:
                     self.folder_path_var.set(data.get("folder", ""))
                     self.rtmp_url_var.set(data.get("url", ""))
                     self.stream_key_var.set(data.get("key", ""))
+                    self.gapless_var.set(data.get("gapless", True))
             except: pass
 
     def clear_logs(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.clear()
 
     def on_closing(self):
         if self.streaming:
             if messagebox.askokcancel("Quit", "Stop stream and quit?"):
-                self.stop_stream()
-                self.root.destroy()
+                self.stop_stream(on_done=self.root.destroy)
         else:
             self.root.destroy()
 
@@ -33,10 +33,9 @@ fi
 # CREATE LOGS DIRECTORY IF IT DOES NOT EXIST
 mkdir -p logs
 
-# use this parameter to crop and scale video for Instagram vertical format
-# -vf "crop=in_h*9/16:in_h,scale=720:1280" \
-
-ffmpeg -re -stream_loop -1 -i "$VIDEO_FILE" \
--c:v libx264 -preset superfast -b:v 2000k -maxrate 2000k -bufsize 4000k \
--pix_fmt yuv420p -g 60 -c:a aac -b:a 128k -ar 44100 \
--f flv -rtmp_live live "${INSTAGRAM_RTMP_URL}${INSTAGRAM_STREAM_KEY}" > logs/insta_stream.log 2>&1
+# Supervised by the shared stream engine: ffmpeg is restarted if it exits.
+# ig-script keeps this script's original encode: 2000k, no crop, -rtmp_live live.
+PYTHONPATH="$(dirname "$0")/..${PYTHONPATH:+:$PYTHONPATH}" \
+python3 -m streamer run --profile ig-script --file "$VIDEO_FILE" \
+--url "$INSTAGRAM_RTMP_URL" --key "$INSTAGRAM_STREAM_KEY" \
+--log-file logs/insta_stream.log
@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['YouTubeLiveStreamFolder.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
     datas=[],
     hiddenimports=[],
@@ -6,15 +6,20 @@ A tkinter-based GUI application for streaming video to YouTube Live
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
 import threading
 import os
 import sys
 from datetime import datetime
 import json
-import time
-import queue
-import platform
+
+# Shared streaming core lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamer.dispatch import UIDispatcher
+from streamer.engine import StreamEngine
+from streamer.logqueue import LogQueue
+from streamer.logsink import LogSink
+from streamer.logview import LogView
+from streamer.profiles import PROFILES
 
 class YouTubeStreamerGUI:
     def __init__(self, root):
@@ -31,22 +36,21 @@ class YouTubeStreamerGUI:
         
         # Streaming state
         self.streaming = False
-        self.ffmpeg_process = None
-        self.restart_count = 0
-        self.stream_thread = None
-        self.output_queue = queue.Queue()
+        self.stopping = False
+        self.engine = None
+        # Worker threads reach the widgets only through this dispatcher
+        self.ui = UIDispatcher(self.root)
+        # Bounded: a chatty ffmpeg can never outrun the display and eat memory
+        self.log_queue = LogQueue()
+        
+        # Rotating log file, written by its own thread
+        self.log_sink = LogSink(os.path.join("logs", "stream_yt.log"))
         
         # Create UI
         self.create_widgets()
         
         # Load saved configuration
         self.load_config()
-        
-        # Ensure logs directory exists
-        os.makedirs("logs", exist_ok=True)
-        
-        # Start output reader thread
-        self.start_output_reader()
     
     def setup_dark_theme(self):
         """Setup YouTube red theme with rounded corners"""
@@ -305,6 +309,7 @@ class YouTubeStreamerGUI:
             highlightcolor=self.accent_color
         )
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_view = LogView(self.root, self.log_text)
     
     def create_rounded_button(self, parent, text, command, width=15, height=1, disabled=False):
         """Create a button with rounded corners using Canvas"""
@@ -454,140 +459,24 @@ class YouTubeStreamerGUI:
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         log_entry = f"[{timestamp}] {message}\n"
         
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.append(log_entry)
         
-        # Also write to log file
-        try:
-            with open("logs/stream_yt.log", "a", encoding="utf-8") as f:
-                f.write(log_entry)
-        except Exception as e:
-            print(f"Error writing to log file: {e}")
-    
-    def clear_logs(self):
-        """Clear the log display"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        # Also write to log file (in the background, never blocks)
+        self.log_sink.write(log_entry)
     
-    def start_output_reader(self):
-        """Start a thread to read output from the queue"""
-        def read_queue():
-            while True:
-                try:
-                    message = self.output_queue.get(timeout=0.1)
-                    if message:
-                        self.log_message(message)
-                except queue.Empty:
-                    continue
-                except Exception:
-                    break
-        
-        reader_thread = threading.Thread(target=read_queue, daemon=True)
-        reader_thread.start()
+    def on_engine_log(self, message):
+        """Queue a log line from a worker thread, waking the UI once per batch"""
+        if self.log_queue.put(message):
+            self.ui.post(self.flush_engine_log)
     
-    def kill_all_ffmpeg_processes(self):
-        """Kill all ffmpeg processes (integrated from kill_ffmpeg.py)"""
-        try:
-            if platform.system() == "Windows":
-                # Find all ffmpeg processes
-                result = subprocess.run(
-                    ["tasklist", "/FI", "IMAGENAME eq ffmpeg.exe", "/FO", "CSV"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                if "ffmpeg.exe" in result.stdout:
-                    self.log_message("Found ffmpeg processes. Killing them...")
-                    subprocess.run(
-                        ["taskkill", "/F", "/IM", "ffmpeg.exe"],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        timeout=5,
-                        check=False
-                    )
-                    self.log_message("All ffmpeg processes killed.")
-                else:
-                    self.log_message("No ffmpeg processes found.")
-            else:
-                # Unix-like systems
-                result = subprocess.run(
-                    ["pgrep", "-f", "ffmpeg"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                if result.returncode == 0:
-                    pids = result.stdout.strip().split('\n')
-                    self.log_message(f"Found {len(pids)} ffmpeg process(es). Killing them...")
-                    for pid in pids:
-                        if pid:
-                            try:
-                                subprocess.run(
-                                    ["kill", "-9", pid],
-                                    stdout=subprocess.DEVNULL,
-                                    stderr=subprocess.DEVNULL,
-                                    timeout=2,
-                                    check=False
-                                )
-                            except:
-                                pass
-                    self.log_message("All ffmpeg processes killed.")
-                else:
-                    self.log_message("No ffmpeg processes found.")
-        except Exception as e:
-            self.log_message(f"Error killing ffmpeg processes: {e}")
+    def flush_engine_log(self):
+        """Show every queued log line (main thread)"""
+        for message in self.log_queue.drain():
+            self.log_message(message)
     
-    def kill_process_tree(self, process):
-        """Kill process and all its children (Windows-compatible)"""
-        if process is None:
-            return
-        
-        try:
-            if platform.system() == "Windows":
-                # On Windows, use taskkill to kill the process tree
-                try:
-                    # First try graceful termination
-                    process.terminate()
-                    try:
-                        process.wait(timeout=2)
-                        return
-                    except subprocess.TimeoutExpired:
-                        pass
-                    
-                    # Force kill if graceful termination failed
-                    subprocess.run(
-                        ["taskkill", "/F", "/T", "/PID", str(process.pid)],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        timeout=3,
-                        check=False
-                    )
-                except Exception:
-                    # If taskkill fails, try direct kill
-                    try:
-                        process.kill()
-                        process.wait(timeout=1)
-                    except:
-                        pass
-            else:
-                # On Unix-like systems
-                process.terminate()
-                try:
-                    process.wait(timeout=2)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-                    try:
-                        process.wait(timeout=1)
-                    except:
-                        pass
-        except Exception as e:
-            # Silently handle errors - process might already be dead
-            pass
+    def clear_logs(self):
+        """Clear the log display"""
+        self.log_view.clear()
     
     def validate_inputs(self):
         """Validate that all required inputs are provided"""
@@ -613,208 +502,75 @@ class YouTubeStreamerGUI:
         if not self.validate_inputs():
             return
         
-        if self.streaming:
+        if self.streaming or self.stopping:
             messagebox.showwarning("Warning", "Stream is already running")
             return
         
+        profile = PROFILES["yt"]
         self.streaming = True
-        self.restart_count = 0
         # Disable start button, enable stop button
         self._update_button_state(self.start_button_frame, disabled=True)
         self._update_button_state(self.stop_button_frame, disabled=False)
         self.update_status("Starting stream...")
         
-        # Start streaming in a separate thread
-        self.stream_thread = threading.Thread(target=self.stream_loop, daemon=True)
-        self.stream_thread.start()
+        # The engine streams on its own thread and reports back through these callbacks
+        self.engine = StreamEngine(
+            profile,
+            self.video_file_var.get().strip(),
+            profile.output_url(self.stream_key_var.get().strip()),
+            on_log=self.on_engine_log,
+            on_status=self.ui.wrap(self.update_status),
+            on_error=self.ui.wrap(self.on_engine_error),
+            on_stopped=self.ui.wrap(self.on_engine_stopped)
+        )
+        self.engine.start()
     
-    def stop_stream(self):
+    def stop_stream(self, on_done=None):
         """Stop the YouTube streaming process"""
-        if not self.streaming:
+        if not self.streaming or self.stopping:
             return
         
         self.streaming = False
+        self.stopping = True
         self.update_status("Stopping stream...")
         self.log_message("Received stop signal, stopping stream...")
         
         # Disable stop button to prevent multiple clicks
         self._update_button_state(self.stop_button_frame, disabled=True)
         
-        # Force kill the ffmpeg process immediately
-        if self.ffmpeg_process:
-            try:
-                self.log_message("Terminating ffmpeg process...")
-                self.kill_process_tree(self.ffmpeg_process)
-                self.ffmpeg_process = None
-                self.log_message("FFmpeg process terminated.")
-            except Exception as e:
-                self.log_message(f"Error stopping ffmpeg: {e}")
-        
-        # Wait a moment for thread to recognize the stop
-        time.sleep(0.5)
-        
-        # Kill all remaining ffmpeg processes (from kill_ffmpeg.py)
-        self.log_message("Checking for any remaining ffmpeg processes...")
-        self.kill_all_ffmpeg_processes()
-        
-        # Wait a bit more to ensure everything is stopped
-        time.sleep(0.5)
-        
-        # Verify streaming is fully stopped
-        max_wait = 10  # Maximum 10 seconds
-        wait_count = 0
-        self.update_status("Verifying stream stopped...")
-        while wait_count < max_wait:
-            # Check if any ffmpeg processes are still running
-            try:
-                if platform.system() == "Windows":
-                    result = subprocess.run(
-                        ["tasklist", "/FI", "IMAGENAME eq ffmpeg.exe", "/FO", "CSV"],
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    if "ffmpeg.exe" not in result.stdout:
-                        break
-                else:
-                    result = subprocess.run(
-                        ["pgrep", "-f", "ffmpeg"],
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    if result.returncode != 0:
-                        break
-            except:
-                # If check fails, assume processes are stopped
-                break
-            
-            wait_count += 1
-            if wait_count % 2 == 0:  # Update status every second
-                self.update_status(f"Verifying stream stopped... ({wait_count/2}s)")
-            time.sleep(0.5)
-        
-        if wait_count >= max_wait:
-            self.log_message("Warning: Some processes may still be running. Forcing kill...")
-            self.kill_all_ffmpeg_processes()
-        
+        # engine.stop() waits for ffmpeg to exit, so it runs off the Tk main loop
+        threading.Thread(target=self._shutdown, args=(on_done,), daemon=True).start()
+    
+    def _shutdown(self, on_done):
+        """Blocking part of stop_stream; runs on a worker thread"""
+        # Stop the engine; it stops its own ffmpeg (q, then SIGTERM, then SIGKILL)
+        # and leaves any other ffmpeg on the machine alone
+        if self.engine:
+            self.engine.stop()
+        self.ui.post(self._on_shutdown_complete, on_done)
+    
+    def _on_shutdown_complete(self, on_done):
+        self.stopping = False
         self._update_button_state(self.start_button_frame, disabled=False)
         self.update_status("Stopped")
         self.log_message("Stream stopped by user.")
+        if on_done:
+            on_done()
     
-    def stream_loop(self):
-        """Main streaming loop with automatic restart on errors"""
-        video_file = self.video_file_var.get().strip()
-        stream_key = self.stream_key_var.get().strip()
-        
-        while self.streaming:
-            self.restart_count += 1
-            
-            if self.restart_count == 1:
-                self.log_message(f"Starting YouTube stream (attempt {self.restart_count})...")
-                self.root.after(0, lambda: self.update_status("Streaming..."))
-            else:
-                self.log_message(f"Stream disconnected. Restarting stream (attempt {self.restart_count})...")
-                self.root.after(0, lambda: self.update_status(f"Reconnecting... (attempt {self.restart_count})"))
-                # Wait 5 seconds before restarting
-                for _ in range(5):
-                    if not self.streaming:
-                        break
-                    time.sleep(1)
-            
-            if not self.streaming:
-                break
-            
-            # Build ffmpeg command
-            rtmp_url = f"rtmp://a.rtmp.youtube.com/live2/{stream_key}"
-            
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-re",  # Read input at native frame rate
-                "-stream_loop", "-1",  # Loop video indefinitely
-                "-i", video_file,
-                "-c:v", "libx264",
-                "-preset", "superfast",
-                "-b:v", "4500k",
-                "-maxrate", "4500k",
-                "-bufsize", "9000k",
-                "-vf", "scale=1920:1080",
-                "-r", "30",
-                "-pix_fmt", "yuv420p",
-                "-g", "60",
-                "-c:a", "aac",
-                "-b:a", "128k",
-                "-ar", "44100",
-                "-f", "flv",
-                rtmp_url
-            ]
-            
-            try:
-                self.log_message(f"Running ffmpeg command...")
-                
-                # Create process with proper flags for Windows
-                popen_kwargs = {
-                    "stdout": subprocess.PIPE,
-                    "stderr": subprocess.STDOUT,
-                    "universal_newlines": True,
-                    "bufsize": 1
-                }
-                
-                if platform.system() == "Windows":
-                    popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
-                
-                self.ffmpeg_process = subprocess.Popen(ffmpeg_cmd, **popen_kwargs)
-                
-                # Read output in a separate thread to avoid blocking
-                def read_output():
-                    try:
-                        for line in iter(self.ffmpeg_process.stdout.readline, ''):
-                            if not self.streaming or self.ffmpeg_process is None:
-                                break
-                            if line.strip():
-                                try:
-                                    self.output_queue.put(line.strip(), timeout=0.1)
-                                except queue.Full:
-                                    pass
-                    except Exception:
-                        pass
-                
-                output_thread = threading.Thread(target=read_output, daemon=True)
-                output_thread.start()
-                
-                # Wait for process to complete, but check streaming flag periodically
-                while self.ffmpeg_process.poll() is None:
-                    if not self.streaming:
-                        # Force kill if we're stopping
-                        self.kill_process_tree(self.ffmpeg_process)
-                        break
-                    time.sleep(0.1)
-                
-                exit_code = self.ffmpeg_process.poll()
-                
-                if not self.streaming:
-                    self.log_message("Stream stopped by user.")
-                    break
-                
-                if exit_code is not None:
-                    self.log_message(f"FFmpeg exited with code {exit_code}. Will restart...")
-                
-            except FileNotFoundError:
-                self.root.after(0, lambda: messagebox.showerror(
-                    "Error", 
-                    "FFmpeg not found. Please install FFmpeg and ensure it's in your PATH."
-                ))
-                self.root.after(0, self.stop_stream)
-                break
-            except Exception as e:
-                self.log_message(f"Error running ffmpeg: {e}")
-                if self.streaming:
-                    time.sleep(5)
-        
-        # Cleanup
-        self.root.after(0, lambda: self.update_status("Stopped"))
-        self.root.after(0, lambda: self._update_button_state(self.start_button_frame, disabled=False))
-        self.root.after(0, lambda: self._update_button_state(self.stop_button_frame, disabled=True))
+    def on_engine_error(self, message):
+        """Report a fatal engine error"""
+        self.log_message(message)
+        messagebox.showerror("Error", message)
+    
+    def on_engine_stopped(self):
+        """Reset the controls once the engine thread has finished"""
+        self.streaming = False
+        if self.stopping:
+            # _on_shutdown_complete re-enables the controls
+            return
+        self.update_status("Stopped")
+        self._update_button_state(self.start_button_frame, disabled=False)
+        self._update_button_state(self.stop_button_frame, disabled=True)
     
     def save_config(self):
         """Save configuration to JSON file"""
@@ -850,7 +606,7 @@ class YouTubeStreamerGUI:
     
     def on_closing(self):
         """Handle window closing event - prevent closing while streaming"""
-        if self.streaming:
+        if self.streaming or self.stopping:
             messagebox.showwarning(
                 "Cannot Close", 
                 "Stream is currently running. Please click 'Stop Stream' to stop the stream before closing the application."
@@ -6,15 +6,20 @@ A tkinter-based GUI application for streaming a folder of videos to YouTube Live
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
 import threading
 import os
 import sys
 from datetime import datetime
 import json
-import time
-import queue
-import platform
+
+# Shared streaming core lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamer.dispatch import UIDispatcher
+from streamer.engine import StreamEngine
+from streamer.logqueue import LogQueue
+from streamer.logsink import LogSink
+from streamer.logview import LogView
+from streamer.profiles import PROFILES
 
 class YouTubeStreamerGUI:
     def __init__(self, root):
@@ -31,24 +36,21 @@ class YouTubeStreamerGUI:
         
         # Streaming state
         self.streaming = False
-        self.ffmpeg_process = None
-        self.stream_thread = None
-        self.output_queue = queue.Queue()
+        self.stopping = False
+        self.engine = None
+        # Worker threads reach the widgets only through this dispatcher
+        self.ui = UIDispatcher(self.root)
+        # Bounded: a chatty ffmpeg can never outrun the display and eat memory
+        self.log_queue = LogQueue()
         
-        # Supported video extensions
-        self.video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.ts', '.wmv')
+        # Rotating log file, written by its own thread
+        self.log_sink = LogSink(os.path.join("logs", "stream_yt.log"))
         
         # Create UI
         self.create_widgets()
         
         # Load saved configuration
         self.load_config()
-        
-        # Ensure logs directory exists
-        os.makedirs("logs", exist_ok=True)
-        
-        # Start output reader thread
-        self.start_output_reader()
     
     def setup_dark_theme(self):
         """Setup YouTube red theme with rounded corners"""
@@ -125,6 +127,10 @@ class YouTubeStreamerGUI:
         self.show_key_var = tk.BooleanVar()
         ttk.Checkbutton(key_frame, text="Show", variable=self.show_key_var, command=lambda: stream_key_entry.config(show="" if self.show_key_var.get() else "*")).grid(row=0, column=1)
         
+        # Gapless playout keeps a single RTMP connection open across files
+        self.gapless_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(section_frame, text="Gapless playout (single connection)", variable=self.gapless_var).grid(row=2, column=1, sticky=tk.W, pady=(0, 8))
+        
         # Control buttons
         self.button_frame = ttk.Frame(main_frame)
         self.button_frame.grid(row=2, column=0, columnspan=3, pady=30)
@@ -167,6 +173,7 @@ class YouTubeStreamerGUI:
         
         self.log_text = scrolledtext.ScrolledText(log_section, height=12, wrap=tk.WORD, state=tk.DISABLED, bg=self.entry_bg, fg=self.fg_color, insertbackground=self.fg_color, font=("Consolas", 9), relief=tk.FLAT, highlightthickness=2, highlightbackground=self.border_color)
         self.log_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_view = LogView(self.root, self.log_text)
 
     def create_rounded_button(self, parent, text, command, width=15, height=1, disabled=False):
         btn_frame = tk.Frame(parent, bg=self.bg_color)
@@ -227,32 +234,16 @@ class YouTubeStreamerGUI:
     def log_message(self, message):
         timestamp = datetime.now().strftime('%H:%M:%S')
         log_entry = f"[{timestamp}] {message}\n"
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        try:
-            with open("logs/stream_yt.log", "a", encoding="utf-8") as f:
-                f.write(log_entry)
-        except: pass
+        self.log_view.append(log_entry)
+        self.log_sink.write(log_entry)
 
-    def start_output_reader(self):
-        def read_queue():
-            while True:
-                try:
-                    msg = self.output_queue.get(timeout=0.1)
-                    if msg: self.log_message(msg)
-                except queue.Empty: continue
-                except: break
-        threading.Thread(target=read_queue, daemon=True).start()
+    def on_engine_log(self, msg):
+        if self.log_queue.put(msg):
+            self.ui.post(self.flush_engine_log)
 
-    def kill_all_ffmpeg(self):
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(["taskkill", "/F", "/IM", "ffmpeg.exe"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            else:
-                subprocess.run(["pkill", "-9", "ffmpeg"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
+    def flush_engine_log(self):
+        for msg in self.log_queue.drain():
+            self.log_message(msg)
 
     def start_stream(self):
         folder = self.folder_path_var.get().strip()
@@ -262,92 +253,58 @@ class YouTubeStreamerGUI:
             return messagebox.showerror("Error", "Please select a valid folder")
         if not key:
             return messagebox.showerror("Error", "Please enter your Stream Key")
+        if self.streaming or self.stopping:
+            return
         
+        profile = PROFILES["yt"]
         self.streaming = True
         self.update_btn_state(self.start_button_frame, True)
         self.update_btn_state(self.stop_button_frame, False)
         self.status_var.set("Starting sequence...")
         self.status_indicator.config(fg=self.accent_color)
         
-        self.stream_thread = threading.Thread(target=self.stream_loop, daemon=True)
-        self.stream_thread.start()
+        self.engine = StreamEngine(
+            profile, folder, profile.output_url(key),
+            folder=True, gapless=self.gapless_var.get(),
+            on_log=self.on_engine_log,
+            on_status=self.ui.wrap(self.status_var.set),
+            on_file=self.ui.wrap(lambda f: self.current_file_var.set(f"NOW STREAMING: {f}" if f else "Stream stopped")),
+            on_error=self.ui.wrap(lambda message: messagebox.showerror("Error", message)),
+            on_stopped=self.ui.wrap(self.on_engine_stopped)
+        )
+        self.engine.start()
 
-    def stop_stream(self):
+    def stop_stream(self, on_done=None):
+        if self.stopping:
+            return
         self.streaming = False
+        self.stopping = True
         self.status_var.set("Stopping...")
-        self.log_message("Stopping stream and killing processes...")
-        if self.ffmpeg_process:
-            try: self.ffmpeg_process.terminate()
-            except: pass
-        self.kill_all_ffmpeg()
+        self.log_message("Stopping stream...")
+        self.update_btn_state(self.stop_button_frame, True)
+        # engine.stop() waits for ffmpeg to exit, so it runs off the Tk main loop
+        threading.Thread(target=self._shutdown, args=(on_done,), daemon=True).start()
+
+    def _shutdown(self, on_done):
+        if self.engine:
+            self.engine.stop()
+        self.ui.post(self._on_shutdown_complete, on_done)
+
+    def _on_shutdown_complete(self, on_done):
+        self.stopping = False
+        self.on_engine_stopped()
+        if on_done: on_done()
+
+    def on_engine_stopped(self):
+        self.streaming = False
+        if self.stopping: return
         self.update_btn_state(self.stop_button_frame, True)
         self.update_btn_state(self.start_button_frame, False)
         self.status_var.set("Stopped")
         self.status_indicator.config(fg=self.success_color)
 
-    def stream_loop(self):
-        folder = self.folder_path_var.get().strip()
-        key = self.stream_key_var.get().strip()
-        rtmp_url = f"rtmp://a.rtmp.youtube.com/live2/{key}"
-        
-        while self.streaming:
-            # Re-scan folder every cycle to pick up new files
-            files = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(self.video_extensions)]
-            files.sort()
-            
-            if not files:
-                self.log_message("No video files found in folder! Waiting 10 seconds...")
-                time.sleep(10)
-                continue
-                
-            self.log_message(f"Found {len(files)} videos. Starting circular queue.")
-            
-            for video_path in files:
-                if not self.streaming: break
-                
-                filename = os.path.basename(video_path)
-                self.root.after(0, lambda f=filename: self.current_file_var.set(f"NOW STREAMING: {f}"))
-                self.root.after(0, lambda: self.status_var.set("Streaming Live"))
-                self.log_message(f"Streaming: {filename}")
-                
-                # FFmpeg command (No -stream_loop here, we want to move to next file)
-                cmd = [
-                    "ffmpeg", "-re", "-i", video_path,
-                    "-c:v", "libx264", "-preset", "veryfast", "-b:v", "4000k", "-maxrate", "4000k", "-bufsize", "8000k",
-                    "-vf", "scale=1280:720,format=yuv420p", "-g", "60",
-                    "-c:a", "aac", "-b:a", "128k", "-ar", "44100",
-                    "-f", "flv", rtmp_url
-                ]
-                
-                try:
-                    self.ffmpeg_process = subprocess.Popen(
-                        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-                        universal_newlines=True, bufsize=1,
-                        creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                    )
-                    
-                    # Read FFmpeg output
-                    for line in iter(self.ffmpeg_process.stdout.readline, ''):
-                        if not self.streaming: break
-                        if "fps=" in line: # Only log actual progress lines occasionally
-                            if time.time() % 5 < 0.1: self.output_queue.put(line.strip())
-                        elif "Error" in line:
-                            self.output_queue.put(line.strip())
-                            
-                    self.ffmpeg_process.wait()
-                    
-                except Exception as e:
-                    self.log_message(f"Error streaming {filename}: {e}")
-                    time.sleep(2)
-                
-                if self.streaming:
-                    self.log_message(f"Finished {filename}. Moving to next...")
-                    time.sleep(1) # Small gap between files
-
-        self.root.after(0, lambda: self.current_file_var.set("Stream stopped"))
-
     def save_config(self):
-        config = {"folder_path": self.folder_path_var.get(), "stream_key": self.stream_key_var.get()}
+        config = {"folder_path": self.folder_path_var.get(), "stream_key": self.stream_key_var.get(), "gapless": self.gapless_var.get()}
         try:
             with open(self.config_file, "w") as f: json.dump(config, f, indent=4)
             messagebox.showinfo("Success", "Settings saved")
@@ -360,18 +317,16 @@ class YouTubeStreamerGUI:
                     config = json.load(f)
                     self.folder_path_var.set(config.get("folder_path", ""))
                     self.stream_key_var.set(config.get("stream_key", ""))
+                    self.gapless_var.set(config.get("gapless", True))
             except: pass
 
     def clear_logs(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_view.clear()
 
     def on_closing(self):
         if self.streaming:
             if messagebox.askokcancel("Quit", "Are you sure?"):
-                self.stop_stream()
-                self.root.destroy()
+                self.stop_stream(on_done=self.root.destroy)
         else:
             self.root.destroy()
 
@@ -26,7 +26,10 @@ if [ ! -f "$VIDEO_FILE" ]; then
     exit 1
 fi
 
-ffmpeg -re -stream_loop -1 -i "$VIDEO_FILE" \
--c:v libx264 -preset superfast -b:v 6800k -maxrate 6800k -bufsize 13600k \
--pix_fmt yuv420p -g 60 -c:a aac -b:a 128k -ar 44100 \
--f flv "rtmp://a.rtmp.youtube.com/live2/$YOUTUBE_STREAM_KEY" > logs/stream_yt.log 2>&1
+mkdir -p logs
+
+# Supervised by the shared stream engine: ffmpeg is restarted if it exits.
+# yt-script keeps this script's original encode: 6800k at the source resolution.
+PYTHONPATH="$(dirname "$0")/..${PYTHONPATH:+:$PYTHONPATH}" \
+python3 -m streamer run --profile yt-script --file "$VIDEO_FILE" --key "$YOUTUBE_STREAM_KEY" \
+--log-file logs/stream_yt.log
@@ -0,0 +1,4 @@
+"""
+Streaming Software core
+Shared, tkinter-free building blocks used by the YouTube and Instagram streamers.
+"""
@@ -0,0 +1,168 @@
+"""
+Adaptive encoding
+Watches ffmpeg's progress (encode speed and dropped frames) and steps the
+encode down a quality ladder when it cannot keep up with real time, and
+back up once it has been healthy for a while.
+
+Level 0 is the configured encode. Lower rungs first switch to faster x264
+presets, then cut the video bitrate. Under -re a healthy encoder reports
+about 1.0x and never more, so headroom cannot be read off the speed;
+instead the controller probes one rung up after a long healthy stretch and
+doubles the wait whenever a probe has to be undone.
+"""
+
+import re
+
+from .calibrate import PRESETS, current_preset, with_preset
+
+UNDER_SPEED = 0.97      # below this the encoder is falling behind real time
+DOWN_AFTER = 15         # seconds of sustained under-speed before stepping down
+DROP_RATIO = 0.05       # or dropped frames above this share of output frames...
+WINDOW = 10             # ...over this many seconds while below real time
+MIN_WINDOW = 2          # seconds of samples needed before judging the speed
+UP_AFTER = 600          # healthy seconds before probing one rung up
+UP_AFTER_MAX = 3600
+PROBATION = 120         # a probe that fails within this doubles the wait
+BITRATE_STEPS = [0.85, 0.7]
+
+
+def scale_bitrates(encode_args, factor):
+    """Copy of encode_args with video bitrate, maxrate and bufsize scaled by factor"""
+    args = list(encode_args)
+    for index in range(0, len(args) - 1, 2):
+        option = args[index]
+        name = option.split(":")[0]
+        if name not in ("-b", "-maxrate", "-bufsize") or (name == "-b" and not option.startswith("-b:v")):
+            continue
+        match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKM]?)", args[index + 1])
+        if match:
+            value = float(match.group(1)) * factor
+            args[index + 1] = f"{int(round(value))}{match.group(2)}"
+    return args
+
+
+def build_ladder(encode_args):
+    """Rungs of (preset, bitrate factor), from the configured encode downwards"""
+    preset = current_preset(encode_args)
+    ladder = [(preset, 1.0)]
+    if preset in PRESETS:
+        for faster in reversed(PRESETS[:PRESETS.index(preset)]):
+            ladder.append((faster, 1.0))
+    for factor in BITRATE_STEPS:
+        ladder.append((ladder[-1][0], factor))
+    return ladder
+
+
+class AdaptiveController:
+    """Chooses the encode rung from a stream of Progress records.
+
+    observe() is fed every progress block and returns True when the rung
+    changed; the engine then applies encode_args() at its next safe point
+    and calls applied(). Observations are ignored while a change is pending.
+    """
+
+    def __init__(self, encode_args, log=print):
+        self.base_args = list(encode_args)
+        self.ladder = build_ladder(encode_args)
+        self.log = log
+        self.level = 0
+        self.adjustments = {"down": 0, "up": 0}
+        self._under_since = None
+        self._healthy_since = None
+        self._samples = []          # (time, out_time, frame, drop_frames) within WINDOW
+        self._up_after = UP_AFTER
+        self._probed_at = None
+        self.pending = False
+
+    def encode_args(self):
+        preset, factor = self.ladder[self.level]
+        args = with_preset(self.base_args, preset) if preset else list(self.base_args)
+        return scale_bitrates(args, factor) if factor != 1.0 else args
+
+    def describe(self, level=None):
+        preset, factor = self.ladder[self.level if level is None else level]
+        bitrate = "" if factor == 1.0 else f", {int(factor * 100)}% bitrate"
+        return f"{preset or 'default'} preset{bitrate}"
+
+    def reset(self):
+        """Forget the running measurements (a new ffmpeg process started)"""
+        self._under_since = None
+        self._healthy_since = None
+        self._samples = []
+
+    def applied(self):
+        """The engine is now encoding with encode_args()"""
+        self.pending = False
+        self.reset()
+
+    def observe(self, progress):
+        now = progress.updated
+        if now is None or progress.status == "end" or self.pending:
+            return False
+
+        self._samples.append((now, progress.out_time, progress.frame, progress.drop_frames))
+        while now - self._samples[0][0] > WINDOW:
+            self._samples.pop(0)
+        first_time, first_out, first_frame, first_drops = self._samples[0]
+        if progress.frame < first_frame or progress.drop_frames < first_drops:
+            # Counters went backwards: a new ffmpeg process
+            self.reset()
+            return False
+        if now - first_time < MIN_WINDOW:
+            return False
+
+        # ffmpeg's own speed= is averaged over the whole run; use the recent window
+        speed = (progress.out_time - first_out) / (now - first_time)
+        frames = progress.frame - first_frame
+        dropping = frames > 0 and (progress.drop_frames - first_drops) > frames * DROP_RATIO
+
+        behind = speed < UNDER_SPEED or (dropping and speed < 1.0)
+        if behind:
+            self._healthy_since = None
+            if self._under_since is None:
+                self._under_since = now
+            if now - self._under_since >= DOWN_AFTER:
+                return self._step_down(now)
+            return False
+
+        self._under_since = None
+        if self._healthy_since is None:
+            self._healthy_since = now
+        if self.level > 0 and now - self._healthy_since >= self._up_after:
+            return self._step_up(now)
+        return False
+
+    def _step_down(self, now):
+        self._under_since = None
+        if self.level + 1 >= len(self.ladder):
+            return False
+        if self._probed_at is not None and now - self._probed_at < PROBATION:
+            # The last probe up could not hold; wait longer before the next one
+            self._up_after = min(self._up_after * 2, UP_AFTER_MAX)
+        self._probed_at = None
+        self.level += 1
+        self.pending = True
+        self.adjustments["down"] += 1
+        self.log(f"Encoder below {UNDER_SPEED}x real time for {DOWN_AFTER}s; stepping down to {self.describe()}")
+        return True
+
+    def force_down(self, reason):
+        """Step down one rung now, without waiting for measurements; True if there was one"""
+        self._under_since = None
+        self._probed_at = None
+        if self.level + 1 >= len(self.ladder):
+            return False
+        self.level += 1
+        self.pending = True
+        self.adjustments["down"] += 1
+        self.log(f"{reason[:1].upper()}{reason[1:]}; stepping down to {self.describe()}")
+        return True
+
+    def _step_up(self, now):
+        self._healthy_since = None
+        self._probed_at = now
+        self.level -= 1
+        self.pending = True
+        self.adjustments["up"] += 1
+        self.log(f"Encoder healthy for {int(self._up_after)}s; stepping up to {self.describe()}")
+        return True
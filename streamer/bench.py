@@ -0,0 +1,204 @@
+"""
+Streaming benchmark
+Runs the stream engine against a local RTMP sink (see rtmpsink.py) instead
+of a real ingest and reports, per streaming mode, what a viewer-side
+ingest would see:
+
+    time to first packet    engine start -> first media message at the sink
+    sustained bitrate       average and worst 5 s window
+    file transitions        longest arrival gap around each item switch
+    reconnect downtime      last packet before a dropped connection -> first after it
+    stalls                  any other arrival gap
+    discontinuities         audio/video timestamps jumping back or > 1 s ahead
+
+    python -m streamer bench --folder videos/ --seconds 120 --drop-every 45
+"""
+
+import bisect
+import json
+import threading
+import time
+
+from .engine import StreamEngine
+from .profiles import get_profile
+from .rtmpsink import RTMPSink
+
+GAP_THRESHOLD = 0.25        # seconds without any media message that count as a gap
+SWITCH_WINDOW = 3.0         # seconds after an item switch searched for its transition gap
+DISCONTINUITY_MS = 1000
+BITRATE_WINDOW = 5.0
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0, "mean": None, "max": None, "total": 0.0}
+    return {"count": len(values), "mean": round(sum(values) / len(values), 3),
+            "max": round(max(values), 3), "total": round(sum(values), 3)}
+
+
+def window_bitrates(packets, window=BITRATE_WINDOW):
+    """kbit/s of each complete window of arrivals"""
+    if not packets:
+        return []
+    start, end = packets[0][0], packets[-1][0]
+    buckets = [0] * max(1, int((end - start) // window))
+    for packet in packets:
+        index = int((packet[0] - start) // window)
+        if index < len(buckets):
+            buckets[index] += packet[3]
+    return [size * 8 / window / 1000 for size in buckets] if end - start >= window else []
+
+
+def discontinuities(session):
+    """Timestamp jumps per track within one publishing session"""
+    found = []
+    last = {}
+    for arrival, kind, timestamp, _, _ in session.packets:
+        previous = last.get(kind)
+        last[kind] = timestamp
+        if previous is None:
+            continue
+        jump = timestamp - previous
+        if jump < 0 or jump > DISCONTINUITY_MS:
+            found.append({"session": session.index, "track": kind, "jump_ms": jump})
+    return found
+
+
+def analyze(sessions, started, switches, drops=(), ended=None):
+    """Benchmark report from the sink's sessions, the engine start time, item switch and drop times"""
+    packets = [(*packet, session.index) for session in sessions for packet in session.packets]
+    packets.sort(key=lambda packet: packet[0])
+    report = {"sessions": len(sessions), "packets": len(packets), "switches": len(switches)}
+    if not packets:
+        report["error"] = "no media reached the sink"
+        return report
+
+    first, last = packets[0][0], packets[-1][0]
+    total_bytes = sum(packet[3] for packet in packets)
+    rates = window_bitrates(packets)
+    report.update({
+        "time_to_first_packet": round(first - started, 3),
+        "streamed_seconds": round(last - first, 3),
+        "bitrate_kbps": round(total_bytes * 8 / max(last - first, 1e-6) / 1000, 1),
+        "min_window_bitrate_kbps": round(min(rates), 1) if rates else None,
+    })
+
+    arrivals = [packet[0] for packet in packets]
+    transitions, reconnects, stalls = [], [], []
+    explained = set()
+    for drop in drops:
+        # The gap spanning a deliberate drop is its reconnect downtime
+        index = bisect.bisect_right(arrivals, drop) - 1
+        if 0 <= index < len(arrivals) - 1 and index not in explained:
+            reconnects.append(arrivals[index + 1] - arrivals[index])
+            explained.add(index)
+    for switch in switches:
+        # The widest arrival gap from the one spanning the switch through the new item's first seconds
+        start = max(0, bisect.bisect_right(arrivals, switch) - 1)
+        if start in explained:
+            continue  # the item restarting inside a reconnect gap, not a transition
+        end = bisect.bisect_right(arrivals, switch + SWITCH_WINDOW)
+        widest, widest_at = 0.0, None
+        for index in range(start, min(end, len(arrivals) - 1)):
+            gap = arrivals[index + 1] - arrivals[index]
+            if gap > widest and index not in explained:
+                widest, widest_at = gap, index
+        transitions.append(widest)
+        if widest_at is not None:
+            explained.add(widest_at)
+    for index in range(len(packets) - 1):
+        gap = arrivals[index + 1] - arrivals[index]
+        if gap < GAP_THRESHOLD or index in explained:
+            continue
+        stalls.append(gap)
+
+    found = [jump for session in sessions for jump in discontinuities(session)]
+    report.update({
+        "transitions": summarize(transitions),
+        "reconnects": summarize(reconnects),
+        "stalls": summarize(stalls),
+        "discontinuities": len(found),
+        "discontinuity_samples": found[:10],
+    })
+    if ended:
+        report["tail_gap"] = round(ended - last, 3)
+    return report
+
+
+def run_mode(mode, source, seconds, profile="yt", drop_every=None, ffmpeg="ffmpeg", ffprobe="ffprobe",
+             use_cache=False, log=print):
+    """Stream source in one mode for seconds against a fresh sink; returns the report"""
+    sink = RTMPSink(port=0, log=log)
+    sink.start()
+    switches = []
+    engine = StreamEngine(
+        get_profile(profile), source, sink.url(), folder=mode != "file", gapless=mode == "gapless",
+        use_cache=use_cache, ffmpeg=ffmpeg, ffprobe=ffprobe, resume_dir=None,
+        on_log=lambda message: log(f"[{mode}] {message}"),
+        on_file=lambda filename: filename and switches.append(time.monotonic()),
+    )
+
+    stop = threading.Event()
+    drops = []
+
+    def drop_connections():
+        while not stop.wait(drop_every):
+            log(f"[{mode}] Dropping the RTMP connection")
+            drops.append(time.monotonic())
+            sink.drop()
+
+    started = time.monotonic()
+    engine.start()
+    if drop_every:
+        threading.Thread(target=drop_connections, daemon=True).start()
+    engine.wait(seconds)
+    stop.set()
+    ended = time.monotonic()
+    engine.stop()
+    engine.wait(10)
+    sink.stop()
+
+    # The first item's switch is the stream start, not a transition
+    report = analyze(sink.sessions, started, switches[1:], drops, ended)
+    report.update(mode=mode, source=source, seconds=seconds)
+    report["session_details"] = [session.as_dict() for session in sink.sessions]
+    return report
+
+
+def format_report(report):
+    if "error" in report:
+        return f"{report['mode']}: {report['error']}"
+
+    def gaps(name):
+        stats = report[name]
+        if not stats["count"]:
+            return f"{name}: none"
+        return f"{name}: {stats['count']}, mean {stats['mean']:.3f}s, max {stats['max']:.3f}s"
+
+    worst = report["min_window_bitrate_kbps"]
+    worst = f"{worst} kbit/s" if worst is not None else "n/a"
+    return "\n".join([
+        f"{report['mode']} ({report['source']}, {report['seconds']}s, {report['sessions']} session(s))",
+        f"  time to first packet: {report['time_to_first_packet']:.3f}s",
+        f"  bitrate: {report['bitrate_kbps']} kbit/s (worst {BITRATE_WINDOW:.0f}s window: {worst})",
+        f"  {gaps('transitions')}",
+        f"  {gaps('reconnects')}",
+        f"  {gaps('stalls')}",
+        f"  timestamp discontinuities: {report['discontinuities']}",
+    ])
+
+
+def run(source, folder, modes, seconds, json_file=None, log=print, **kwargs):
+    """Benchmark each mode in turn; returns the list of reports"""
+    modes = modes or (["gapless", "folder"] if folder else ["file"])
+    reports = []
+    for mode in modes:
+        if (mode == "file") == folder:
+            raise ValueError(f"Mode '{mode}' needs a {'file' if mode == 'file' else 'folder'} source")
+        reports.append(run_mode(mode, source, seconds, log=log, **kwargs))
+    for report in reports:
+        print(format_report(report), flush=True)
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    return reports
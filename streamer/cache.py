@@ -0,0 +1,293 @@
+"""
+Segment cache
+On-disk cache of stream-ready encodes so folder loops only pay the libx264
+cost once per file instead of once per pass.
+
+Several caches can share one directory (supervisor channels, both GUIs):
+index.json is merged under a file lock on every save, so no instance drops
+another's entries and the size cap holds for the directory as a whole.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+
+from .processes import popen_flags, restrict, signal_group
+
+# Bytes hashed from the start, middle and end of a source file. Hashing whole
+# multi-GB videos on every lookup would cost more than the encode it saves.
+SAMPLE_SIZE = 1024 * 1024
+
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+INDEX_SAVE_INTERVAL = 60    # seconds between saves of last-used times alone
+
+
+def content_digest(path, sample_size=SAMPLE_SIZE):
+    """Return a sampled sha1 of a file's size, head, middle and tail"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        for offset in (0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)):
+            f.seek(offset)
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on path (created if missing), held across processes for the block"""
+    with open(path, "a+b") as f:
+        if platform.system() == "Windows":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if platform.system() == "Windows":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            # flock is released when the file closes
+
+
+class SegmentCache:
+    """Size-capped LRU cache of pre-encoded sources, populated in the background"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, ffmpeg="ffmpeg", threads=None, cpus=None, log=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ffmpeg = ffmpeg
+        self.threads = threads      # the channel's thread budget, for decoding as well as encoding
+        self.cpus = cpus
+        self.log = log or (lambda message: None)
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.lock_file = os.path.join(cache_dir, "index.lock")
+
+        self._lock = threading.Lock()
+        self._digests = {}  # path -> (size, mtime_ns, content digest), latest version only
+        # Keys this instance evicted. They are not encoded again: with a folder
+        # bigger than max_bytes, LRU would otherwise evict each encode just
+        # before its next use and re-encode it every pass
+        self._evicted = set()
+        self._pending = set()
+        self._jobs = queue.Queue()
+        self._worker = None
+        self._process = None
+        self._closed = False
+        self._added = set()         # keys this instance encoded since its last save
+        self._dirty = False         # last_used times changed since the last save
+        self._saved_at = time.monotonic()
+        self._paused_until = 0.0
+        self._wake = threading.Event()     # set by close() to end a pause early
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose encode vanished from disk
+        return {key: entry for key, entry in entries.items()
+                if os.path.exists(os.path.join(self.cache_dir, entry["file"]))}
+
+    def _sync_index(self):
+        """Merge this instance's changes into index.json, evict to the size cap and save (under _lock)"""
+        with file_lock(self.lock_file):
+            entries = self._load_index()
+            for key, entry in self._entries.items():
+                current = entries.get(key)
+                if current is not None:
+                    current["last_used"] = max(current["last_used"], entry["last_used"])
+                elif key in self._added:
+                    entries[key] = entry
+                # else another instance evicted it
+            self._entries = entries
+            self._added.clear()
+            self._evict()
+            self._save_index()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _save_index(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.index_file)
+
+    def key(self, source, encode_args):
+        """Build the cache key from source content, mtime and encode parameters"""
+        st = os.stat(source)
+        path = os.path.abspath(source)
+        known = self._digests.get(path)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            digest = known[2]
+        else:
+            digest = content_digest(source)
+            self._digests[path] = (st.st_size, st.st_mtime_ns, digest)
+        material = json.dumps([digest, st.st_mtime_ns, list(encode_args)])
+        return hashlib.sha1(material.encode()).hexdigest()
+
+    def lookup(self, source, encode_args):
+        """Return the cached encode for source, or None if it is not ready yet"""
+        try:
+            key = self.key(source, encode_args)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(path):
+                del self._entries[key]  # evicted by another instance
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL:
+                self._sync_index()
+            return path
+
+    def peek(self, source, encode_args):
+        """Like lookup(), without marking the entry as used"""
+        try:
+            key = self.key(source, encode_args)
+        except OSError:
+            return None
+        entry = self._entries.get(key)
+        return os.path.join(self.cache_dir, entry["file"]) if entry else None
+
+    def populate(self, source, encode_args):
+        """Queue a background encode of source unless it is cached or queued.
+
+        The key (and so the content digest) is computed on the worker, so
+        queueing a whole folder reads nothing on the caller's thread.
+        """
+        job = (os.path.abspath(source), tuple(encode_args))
+        with self._lock:
+            if self._closed or job in self._pending:
+                return
+            self._pending.add(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_jobs, daemon=True)
+                self._worker.start()
+        self._jobs.put(job)
+
+    def close(self):
+        """Stop background population and abort the encode in progress"""
+        with self._lock:
+            self._closed = True
+            process = self._process
+            if self._dirty:
+                self._sync_index()
+        self._jobs.put(None)
+        self._wake.set()
+        if process and process.poll() is None:
+            signal_group(process, force=True)  # a half-written cache file is deleted anyway
+
+    def pause(self, seconds):
+        """Abort the encode in progress and start no other for seconds (the machine is short of resources).
+
+        The aborted source is queued again by the next populate() call for it.
+        """
+        with self._lock:
+            self._paused_until = time.monotonic() + seconds
+            process = self._process
+        if process and process.poll() is None:
+            signal_group(process, force=True)
+
+    def _run_jobs(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            while not self._closed and time.monotonic() < self._paused_until:
+                self._wake.wait(self._paused_until - time.monotonic())
+            if self._closed:
+                return
+            source, encode_args = job
+            try:
+                try:
+                    key = self.key(source, encode_args)
+                except OSError:
+                    continue    # removed from the folder while queued
+                if key not in self._entries and key not in self._evicted:
+                    self._encode(key, source, list(encode_args))
+            except Exception as e:
+                self.log(f"Cache encode failed for {os.path.basename(source)}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(job)
+
+    def _encode(self, key, source, encode_args):
+        name = f"{key}.mp4"
+        final = os.path.join(self.cache_dir, name)
+        tmp = os.path.join(self.cache_dir, f"{key}.part.mp4")
+        decode_threads = ["-threads", str(self.threads)] if self.threads else []
+        cmd = [self.ffmpeg, "-nostdin", "-y", "-loglevel", "error", *decode_threads, "-i", source,
+               "-sn", "-dn", *encode_args, "-movflags", "+faststart", "-f", "mp4", tmp]
+
+        # Keep cache population from starving the live encode or leaving the channel's cores
+        popen_kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.PIPE, **popen_flags(nice=10)}
+
+        self.log(f"Caching {os.path.basename(source)}...")
+        with self._lock:
+            if self._closed:
+                return
+            self._process = subprocess.Popen(cmd, **popen_kwargs)
+            restrict(self._process.pid, self.cpus, nice=10)
+        _, stderr = self._process.communicate()
+        exit_code = self._process.returncode
+        with self._lock:
+            self._process = None
+            closed = self._closed
+            paused = time.monotonic() < self._paused_until
+
+        if exit_code != 0 or closed:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if not closed and not paused:
+                error = stderr.decode(errors="replace").strip().splitlines()
+                self.log(f"Cache encode of {os.path.basename(source)} exited with code {exit_code}"
+                         + (f": {error[-1]}" if error else ""))
+            return
+
+        os.replace(tmp, final)
+        with self._lock:
+            self._entries[key] = {
+                "file": name,
+                "source": os.path.abspath(source),
+                "size": os.path.getsize(final),
+                "last_used": time.time(),
+            }
+            self._added.add(key)
+            self._sync_index()
+        self.log(f"Cached {os.path.basename(source)}")
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries.pop(key)
+            total -= entry["size"]
+            if not self._evicted:
+                self.log(f"Cache is full ({self.max_bytes / 1024 ** 3:.1f} GB); "
+                         f"evicted items are encoded live from now on")
+            self._evicted.add(key)
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
@@ -0,0 +1,152 @@
+"""
+Encoder calibration
+Picks the slowest (best quality) x264 preset this machine can still run in
+real time with some headroom, by encoding a few seconds of synthetic
+testsrc2 video at candidate presets and reading ffmpeg's reported speed.
+
+Results are cached per machine and encode settings, so the measurement
+only runs again when the hardware, ffmpeg or the profile changes.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import time
+
+from .processes import popen_flags, restrict, signal_group
+from .progress import PROGRESS_ARGS, ProgressParser
+
+# Fastest first
+PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+
+HEADROOM = 1.3          # required speed, as a multiple of real time
+SAMPLE_SECONDS = 5
+# One lavfi input carrying both a video and an audio stream, like a real source
+SOURCE = "testsrc2=size=1920x1080:rate=30[out0];sine=frequency=440:sample_rate=44100[out1]"
+CACHE_FILE = os.path.join("cache", "calibration.json")
+
+
+def current_preset(encode_args):
+    for option, value in zip(encode_args[::2], encode_args[1::2]):
+        if option.split(":")[0] == "-preset":
+            return value
+    return None
+
+
+def with_preset(encode_args, preset):
+    """Copy of encode_args with every -preset (including -preset:v:N) set to preset"""
+    args = list(encode_args)
+    for index in range(0, len(args) - 1, 2):
+        if args[index].split(":")[0] == "-preset":
+            args[index + 1] = preset
+    return args
+
+
+def measure(encode_args, ffmpeg="ffmpeg", seconds=SAMPLE_SECONDS, cpus=None):
+    """Encode seconds of synthetic video with encode_args; returns the speed (1.0 = real time)"""
+    cmd = [
+        ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", *PROGRESS_ARGS,
+        "-f", "lavfi", "-i", SOURCE, "-t", str(seconds),
+        *encode_args, "-f", "null", "-"
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_flags())
+    restrict(process.pid, cpus)
+    try:
+        stdout, stderr = process.communicate(timeout=seconds * 20 + 30)
+    except subprocess.TimeoutExpired:
+        signal_group(process, force=True)
+        process.communicate()
+        raise
+    if process.returncode != 0:
+        error = stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"ffmpeg exited with code {process.returncode}")
+    parser = ProgressParser()
+    parser.feed(stdout)
+    return parser.progress.speed
+
+
+def machine_key(ffmpeg, cpus=None):
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpus": len(cpus) if cpus else os.cpu_count(),
+        "ffmpeg": os.path.abspath(ffmpeg) if os.path.exists(ffmpeg) else ffmpeg,
+    }
+
+
+def cache_key(encode_args, ffmpeg, cpus=None):
+    material = json.dumps([machine_key(ffmpeg, cpus), with_preset(encode_args, "*")], sort_keys=True)
+    return hashlib.sha1(material.encode()).hexdigest()
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, path)
+
+
+def calibrate(encode_args, ffmpeg="ffmpeg", cpus=None, headroom=HEADROOM, cache_file=CACHE_FILE,
+              refresh=False, log=print):
+    """Return encode_args with the slowest preset that still runs at headroom x real time.
+
+    Starts from the configured preset and walks slower while the machine
+    keeps up, or faster until it does. Falls back to the fastest preset if
+    none is quick enough, and to the unchanged args if ffmpeg fails.
+    """
+    configured = current_preset(encode_args)
+    if configured not in PRESETS:
+        return list(encode_args)
+
+    key = cache_key(encode_args, ffmpeg, cpus)
+    cache = load_cache(cache_file)
+    entry = cache.get(key)
+    if entry and not refresh and entry.get("headroom") == headroom:
+        log(f"Encoder calibration: using cached preset '{entry['preset']}'")
+        return with_preset(encode_args, entry["preset"])
+
+    speeds = {}
+
+    def sufficient(preset):
+        if preset not in speeds:
+            speeds[preset] = measure(with_preset(encode_args, preset), ffmpeg, cpus=cpus)
+            log(f"Encoder calibration: {preset} runs at {speeds[preset]:.2f}x")
+        return speeds[preset] >= headroom
+
+    log(f"Calibrating encoder (needs {headroom:.1f}x real time)...")
+    try:
+        index = PRESETS.index(configured)
+        if sufficient(PRESETS[index]):
+            while index + 1 < len(PRESETS) and sufficient(PRESETS[index + 1]):
+                index += 1
+        else:
+            while index > 0:
+                index -= 1
+                if sufficient(PRESETS[index]):
+                    break
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        log(f"Encoder calibration failed, keeping preset '{configured}': {e}")
+        return list(encode_args)
+
+    preset = PRESETS[index]
+    if speeds.get(preset, 0) < headroom:
+        log(f"Warning: even '{preset}' is below {headroom:.1f}x real time on this machine")
+    log(f"Encoder calibration picked preset '{preset}' (configured: '{configured}')")
+    cache[key] = {"preset": preset, "speeds": speeds, "headroom": headroom, "measured_at": round(time.time())}
+    try:
+        save_cache(cache_file, cache)
+    except OSError as e:
+        log(f"Could not save calibration cache: {e}")
+    return with_preset(encode_args, preset)
@@ -0,0 +1,218 @@
+"""
+Command line interface
+Runs the stream engine headless, e.g.
+
+    python -m streamer run --profile yt --folder videos/ --key YOUR_STREAM_KEY
+"""
+
+import argparse
+import os
+import signal
+import sys
+from datetime import datetime
+
+from .watchdog import STALL_TIMEOUT
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="streamer", description="Headless 24x7 RTMP streamer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="stream a file or folder until interrupted")
+    run.add_argument("--profile", default="yt", help="stream profile: yt, ig, yt-script or ig-script (default: yt)")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="video file to loop forever")
+    source.add_argument("--folder", help="folder of videos to loop in order")
+    run.add_argument("--key", default=os.environ.get("STREAM_KEY"),
+                     help="stream key (default: $STREAM_KEY)")
+    run.add_argument("--url", help="RTMP ingest URL the key is appended to (required for ig)")
+    run.add_argument("--also", action="append", default=[], metavar="RTMP_URL",
+                     help="extra destination (full URL with key) fed from the same encode; repeatable")
+    run.add_argument("--rendition", action="append", default=[], metavar="PROFILE=RTMP_URL",
+                     help="also encode PROFILE from the same decode and send it to RTMP_URL; repeatable")
+    run.add_argument("--no-gapless", action="store_true",
+                     help="open a new RTMP session per folder item")
+    run.add_argument("--no-cache", action="store_true", help="always encode folder items live")
+    run.add_argument("--calibrate", action="store_true",
+                     help="benchmark x264 presets first and use the slowest one that keeps up (cached per machine)")
+    run.add_argument("--adaptive", action="store_true",
+                     help="step the preset/bitrate down while encoding falls behind real time, and back up")
+    run.add_argument("--passthrough", action="store_true",
+                     help="stream-copy video/audio that already meets the profile instead of re-encoding it")
+    run.add_argument("--stall-timeout", type=float, default=STALL_TIMEOUT, metavar="SECONDS",
+                     help=f"restart ffmpeg after this long without output progress; 0 disables "
+                          f"(default: {STALL_TIMEOUT})")
+    run.add_argument("--log-file", help="also append log lines to this file")
+    run.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable")
+    run.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+
+    supervise = commands.add_parser("supervise", help="run every channel of a JSON manifest")
+    supervise.add_argument("manifest", help="channel manifest (see streamer/supervisor.py)")
+    supervise.add_argument("--cores", type=int, help="CPU cores to share between channels (default: all)")
+    supervise.add_argument("--health-file", help="write aggregate and per-channel health JSON here")
+    supervise.add_argument("--report-interval", type=float, default=60, help="seconds between health reports")
+    supervise.add_argument("--log-file", help="also append log lines to this file")
+    supervise.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+
+    bench = commands.add_parser("bench", help="stream to a local RTMP sink and report delivery timings")
+    source = bench.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="video file to loop")
+    source.add_argument("--folder", help="folder of videos to loop")
+    bench.add_argument("--mode", action="append", choices=["file", "folder", "gapless"],
+                       help="streaming mode to measure; repeatable (default: file, or gapless and folder)")
+    bench.add_argument("--profile", default="yt", help="stream profile: yt, ig, yt-script or ig-script (default: yt)")
+    bench.add_argument("--seconds", type=float, default=60, help="how long to stream each mode (default: 60)")
+    bench.add_argument("--drop-every", type=float, metavar="SECONDS",
+                       help="cut the RTMP connection this often to measure reconnects")
+    bench.add_argument("--cache", action="store_true", help="use the segment cache for folder items")
+    bench.add_argument("--json", help="also write the reports to this JSON file")
+    bench.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable")
+    bench.add_argument("--ffprobe", default="ffprobe", help="ffprobe executable")
+
+    microbench = commands.add_parser("microbench", help="time the engine's supervision against a fake ffmpeg")
+    microbench.add_argument("--channels", type=int, default=8, help="channels streaming in the CPU benchmark")
+    microbench.add_argument("--seconds", type=float, default=10, help="length of the CPU benchmark (default: 10)")
+    microbench.add_argument("--log-lines", type=int, default=100000, help="stderr lines in the log benchmark")
+    microbench.add_argument("--restarts", type=int, default=3, help="crashes in the restart benchmark")
+    microbench.add_argument("--json", help="also write the report to this JSON file")
+    microbench.add_argument("--ffmpeg", help="ffmpeg stand-in (default: streamer/fakeffmpeg.py)")
+    return parser
+
+
+def make_logger(log_file=None):
+    sink = None
+    if log_file:
+        from .logsink import LogSink
+        sink = LogSink(log_file)
+
+    def log(message):
+        entry = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+        print(entry, flush=True)
+        if sink:
+            sink.write(entry)
+    return log
+
+
+def start_metrics(port, engines, log):
+    """Start the metrics endpoint if a port was given; returns the server or None"""
+    if port is None:
+        return None
+    from .metrics import MetricsServer
+
+    server = MetricsServer(engines, port)
+    try:
+        server.start()
+    except OSError as e:
+        raise ValueError(f"Cannot serve metrics on port {port}: {e}")
+    log(f"Serving metrics on http://127.0.0.1:{server.port}/metrics")
+    return server
+
+
+def run(args):
+    # Imported here so --help and argument errors stay instant
+    from .supervisor import channel_engine
+
+    if not args.key:
+        raise ValueError("A stream key is required (--key or $STREAM_KEY)")
+    renditions = []
+    for spec in args.rendition:
+        name, _, url = spec.partition("=")
+        if not url:
+            raise ValueError(f"--rendition expects PROFILE=RTMP_URL, got '{spec}'")
+        renditions.append({"profile": name, "url": url})
+    channel = {
+        "profile": args.profile, "file": args.file, "folder": args.folder,
+        "key": args.key, "url": args.url, "also": args.also, "renditions": renditions,
+        "gapless": not args.no_gapless, "cache": not args.no_cache, "calibrate": args.calibrate,
+        "adaptive": args.adaptive, "passthrough": args.passthrough, "stall_timeout": args.stall_timeout,
+    }
+
+    log = make_logger(args.log_file)
+    errors = []
+
+    def on_error(message):
+        errors.append(message)
+        log(message)
+
+    engine = channel_engine(
+        channel, ffmpeg=args.ffmpeg, on_log=log, on_error=on_error,
+        on_file=lambda filename: filename and log(f"Now streaming: {filename}"),
+    )
+
+    def handle_signal(signum, frame):
+        log("Received stop signal, stopping stream...")
+        engine.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    metrics = start_metrics(args.metrics_port, lambda: [(args.profile, engine)], log)
+    engine.start()
+    # Join in slices so signal handlers get a chance to run
+    while engine.thread.is_alive():
+        engine.wait(0.5)
+    if metrics:
+        metrics.stop()
+    return 1 if errors else 0
+
+
+def supervise(args):
+    from .supervisor import Supervisor
+
+    log = make_logger(args.log_file)
+    supervisor = Supervisor.from_file(args.manifest, cores=args.cores, health_file=args.health_file, log=log)
+
+    def handle_signal(signum, frame):
+        log("Received stop signal, stopping all channels...")
+        supervisor.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    metrics = start_metrics(
+        args.metrics_port, lambda: [(channel.name, channel.engine) for channel in supervisor.channels], log
+    )
+    supervisor.run(report_interval=args.report_interval)
+    if metrics:
+        metrics.stop()
+    return 0
+
+
+def bench(args):
+    from . import bench as benchmark
+
+    log = make_logger()
+    benchmark.run(
+        args.file or args.folder, bool(args.folder), args.mode, args.seconds, json_file=args.json, log=log,
+        profile=args.profile, drop_every=args.drop_every, ffmpeg=args.ffmpeg, ffprobe=args.ffprobe,
+        use_cache=args.cache,
+    )
+    return 0
+
+
+def microbench(args):
+    from . import microbench as benchmark
+
+    log = make_logger()
+    benchmark.run(
+        ffmpeg=args.ffmpeg or benchmark.FAKE_FFMPEG, channels=args.channels, seconds=args.seconds,
+        log_lines=args.log_lines, restarts=args.restarts, json_file=args.json, log=log,
+    )
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "run":
+            return run(args)
+        if args.command == "supervise":
+            return supervise(args)
+        if args.command == "bench":
+            return bench(args)
+        if args.command == "microbench":
+            return microbench(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
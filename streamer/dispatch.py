@@ -0,0 +1,75 @@
+"""
+UI dispatcher
+The one channel through which worker threads reach a tkinter window.
+Threads post callables; the Tk main loop runs them in order, in batches,
+so widgets are only ever touched from the main thread.
+
+Tk-only helper for the GUIs; the engine and CLI never import it.
+"""
+
+import queue
+import threading
+import time
+import tkinter as tk
+
+# Longest the main loop spends draining before yielding back to Tk (one 60 Hz frame)
+FRAME_BUDGET = 0.012
+
+
+class UIDispatcher:
+    """Thread-safe queue of UI callbacks drained on the Tk main loop"""
+
+    def __init__(self, root, frame_budget=FRAME_BUDGET):
+        self.root = root
+        self.frame_budget = frame_budget
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._armed = False
+        self._closed = False
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the main thread soon; callable from any thread"""
+        if self._closed:
+            return
+        self._queue.put((callback, args))
+        with self._lock:
+            if self._armed:
+                return
+            self._armed = True
+        # The only Tk call a worker ever makes: wake the main loop once per
+        # batch. Nothing is scheduled while no events are pending.
+        try:
+            self.root.after(0, self._drain)
+        except (RuntimeError, tk.TclError):
+            # The window was destroyed or the main loop has exited
+            self._closed = True
+
+    def wrap(self, callback):
+        """Return a thread-safe version of callback that posts instead of calling"""
+        return lambda *args: self.post(callback, *args)
+
+    def _drain(self):
+        deadline = time.monotonic() + self.frame_budget
+        while time.monotonic() < deadline:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"UI callback {getattr(callback, '__name__', callback)} failed: {e}")
+        else:
+            # Out of budget: let Tk redraw, then continue with the rest
+            self.root.after(1, self._drain)
+            return
+
+        with self._lock:
+            self._armed = False
+        # A post that raced the disarm must not be stranded in the queue
+        if not self._queue.empty():
+            with self._lock:
+                if self._armed:
+                    return
+                self._armed = True
+            self.root.after(0, self._drain)
@@ -0,0 +1,777 @@
+"""
+Stream engine
+Headless ffmpeg command building, supervision and restart logic shared by
+the tkinter GUIs and the command line. Imports no tkinter.
+"""
+
+import asyncio
+import collections
+import os
+import subprocess
+import threading
+import time
+
+from .adaptive import AdaptiveController
+from .cache import SegmentCache
+from .calibrate import calibrate
+from .fanout import RelayPool, describe, output_args, stream_output
+from .mediaindex import MediaIndex, describe as describe_media
+from .passthrough import copy_args, describe as describe_copy, plan as plan_copy
+from .playout import GaplessPlayout, probe_duration
+from .prefetch import DEPTH as PREFETCH_DEPTH, Prefetcher
+from .processes import STOP_TIMEOUT, popen_flags, restrict, stop_async
+from .progress import PROGRESS_ARGS, READ_SIZE, Progress, ProgressParser
+from .recovery import (CLASSES as FAILURE_CLASSES, ERROR_LINES, INPUT, INPUT_RETRY_DELAY, NETWORK,
+                       QUARANTINE_SECONDS, RESOURCE, RESOURCE_DELAY, UNKNOWN, Backoff, classify)
+from .renditions import Rendition, combined_encode_args, stream_selects
+from .resume import RESUME_DIR, ResumePoint, format_position, resume_position
+from .watcher import FolderWatcher
+from .watchdog import CHECK_INTERVAL as STALL_CHECK_INTERVAL, STALL_TIMEOUT, StallWatchdog
+
+RESTART_DELAY = 5       # seconds before relaunching a single-file stream after an unclassified failure
+ERROR_DELAY = 2         # seconds after a folder item failed to launch
+PROGRESS_LOG_INTERVAL = 5  # seconds between progress summaries in the log
+RESOURCE_PAUSE = 600    # seconds cache encodes stay paused after ffmpeg ran out of resources
+
+
+def input_paths(args):
+    """Files an ffmpeg argument list reads (the values of its -i options)"""
+    return [args[index + 1] for index, arg in enumerate(args[:-1]) if arg == "-i"]
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class StreamEngine:
+    """Streams a single looping file or a folder playlist to one or more RTMP outputs.
+
+    outputs is a single RTMP URL or a list of them; several URLs share one
+    encode through the tee muxer (see fanout.py). renditions, a list of
+    Rendition, replaces profile/outputs with several profiles encoded from a
+    single decode (see renditions.py).
+
+    threads caps the encoder thread count and cpus pins the ffmpeg processes
+    to a set of cores; the multi-channel supervisor sets both from its budget.
+    calibrate replaces the profile's x264 preset with the slowest one this
+    machine sustains in real time (measured once, then cached; see calibrate.py).
+    adaptive steps the encode down (faster preset, then lower bitrate) while
+    ffmpeg falls behind real time and back up when healthy (see adaptive.py).
+    index_file is the SQLite media index backing folder scans and item
+    metadata (see mediaindex.py); None disables it. passthrough stream-copies
+    video and/or audio of sources that already meet the profile instead of
+    transcoding them (see passthrough.py; needs the index). prefetch is how
+    many upcoming folder items are kept probed and warm in the page cache
+    (see prefetch.py); 0 disables the lookahead. resume_dir stores the
+    playhead so reconnects and restarts continue in the same file and
+    position (see resume.py); None always starts from the top.
+    stall_timeout is how long ffmpeg may stay alive without output progress
+    before it is killed and the session restarted (see watchdog.py); None
+    disables the watchdog.
+
+    Failures are classified from ffmpeg's last stderr lines and recovered
+    per class (see recovery.py): unreadable folder items are quarantined,
+    dropped connections reconnect with jittered exponential backoff from
+    near zero, and resource exhaustion reduces load before retrying.
+
+    Views subscribe through callbacks, all invoked from the engine thread:
+    on_log(message), on_status(message), on_file(filename),
+    on_error(message) for fatal problems, and on_stopped().
+    on_progress(progress) receives the engine's Progress record after every
+    ffmpeg -progress block (from the publisher's reader thread when gapless).
+    """
+
+    def __init__(self, profile, source, outputs, folder=False, gapless=True, use_cache=True,
+                 cache_dir=os.path.join("cache", "segments"), ffmpeg="ffmpeg", ffprobe="ffprobe",
+                 renditions=None, threads=None, cpus=None, calibrate=False, adaptive=False,
+                 index_file=os.path.join("cache", "media.sqlite"), passthrough=False, prefetch=PREFETCH_DEPTH,
+                 resume_dir=RESUME_DIR, stall_timeout=STALL_TIMEOUT,
+                 on_log=None, on_status=None, on_file=None, on_error=None, on_stopped=None,
+                 on_progress=None):
+        self.profile = profile
+        self.source = source
+        self.renditions = renditions or [Rendition(profile, outputs)]
+        self.combined = len(self.renditions) > 1
+        self.outputs = [url for rendition in self.renditions for url in rendition.urls]
+        self.selects = stream_selects(self.renditions) if self.combined else None
+        self.output_args = output_args(self.outputs, options=profile.output_options) if len(self.outputs) == 1 else None
+        self.folder = folder
+        self.gapless = gapless
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.index_file = index_file
+        self.passthrough = passthrough and not self.combined
+        self.prefetch = prefetch
+        self.resume_dir = resume_dir
+        self.resume = None
+        self._replay = False        # play the current folder item again from the resume point
+        self._item = None           # file the progress out_time refers to...
+        self._item_seek = 0.0       # ...where in it that process started...
+        self._item_base = 0.0       # ...and the out_time at that moment
+        self._item_duration = None
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        if self.combined:
+            self.encode_args = combined_encode_args(self.renditions, folder)
+        else:
+            self.encode_args = profile.encode_args(folder)
+        if threads:
+            self.encode_args += ["-threads", str(threads)]
+        self.threads = threads
+        self.cpus = cpus
+        self.calibrate = calibrate
+        self.adaptive_enabled = adaptive
+        self.adaptive = None
+        self._adapt_restart = False
+
+        self.on_log = on_log or print
+        self.on_status = on_status or (lambda message: None)
+        self.on_file = on_file or (lambda filename: None)
+        self.on_error = on_error or self.on_log
+        self.on_stopped = on_stopped or (lambda: None)
+        self.on_progress = on_progress or (lambda progress: None)
+        self.progress = Progress()
+        self._progress_logged = 0.0
+        self.watchdog = StallWatchdog(self.progress, stall_timeout) if stall_timeout else None
+        self._stalled = False
+        self.backoff = Backoff()
+        self.failures = {failure: 0 for failure in FAILURE_CLASSES}
+        self.quarantined = {}       # unreadable folder items: path -> (file stamp, retry after)
+        self._errors = collections.deque(maxlen=ERROR_LINES)   # last stderr lines of the session
+
+        self.streaming = False
+        self.restart_count = 0
+        self.started_at = None
+        self.current_file = None
+        self.ffmpeg_process = None
+        self._interrupt = None
+        self._process_exited = threading.Event()
+        self._process_exited.set()
+        self.playout = None
+        self.relays = None
+        self.segment_cache = None
+        self.media_index = None
+        self.watcher = None
+        self.prefetcher = None
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def log(self, message):
+        self.on_log(message)
+
+    @property
+    def restarts(self):
+        """Times ffmpeg was relaunched after the first attempt"""
+        return max(0, self.restart_count - 1)
+
+    def _set_file(self, filename):
+        self.current_file = filename
+        self.on_file(filename)
+
+    def start(self):
+        """Run the engine on a background thread"""
+        if self.streaming:
+            raise RuntimeError("Stream is already running")
+        self.streaming = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Run the engine on the calling thread until stopped"""
+        self.streaming = True
+        self._stop_event.clear()
+        self._run()
+
+    def wait(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def stop(self):
+        """Stop streaming and terminate this engine's ffmpeg processes"""
+        if not self.streaming:
+            return
+        self.streaming = False
+        self._stop_event.set()
+        if self.playout:
+            self.playout.stop()
+        if self.watcher:
+            self.watcher.interrupt()
+        if self.ffmpeg_process:
+            self.log("Terminating ffmpeg process...")
+            self._interrupt_process()
+            if threading.current_thread() is not self.thread:
+                self._process_exited.wait(STOP_TIMEOUT + 1)
+            self.log("FFmpeg process terminated.")
+
+    def _sleep(self, seconds):
+        """Sleep unless stopped first; returns True if still streaming"""
+        self._stop_event.wait(seconds)
+        return self.streaming
+
+    def _run(self):
+        self.restart_count = 0
+        self.started_at = time.time()
+        try:
+            if self.calibrate:
+                self.encode_args = calibrate(self.encode_args, ffmpeg=self.ffmpeg, cpus=self.cpus, log=self.log)
+                if not self.streaming:
+                    return
+            if self.adaptive_enabled:
+                self.adaptive = AdaptiveController(self.encode_args, log=self.log)
+            if self.resume_dir:
+                self.resume = ResumePoint(self.resume_dir, f"{self.profile.name}:{os.path.abspath(self.source)}")
+
+            if len(self.outputs) > 1:
+                if self.combined:
+                    names = ", ".join(rendition.profile.label for rendition in self.renditions)
+                    self.log(f"Encoding {len(self.renditions)} renditions from one decode ({names})")
+                self.log(f"Simulcasting to {', '.join(describe(url) for url in self.outputs)}")
+                self.relays = RelayPool(self.outputs, selects=self.selects, ffmpeg=self.ffmpeg, log=self.log)
+                self.output_args = self.relays.output_args()
+                self.relays.start()
+
+            if self.watchdog:
+                threading.Thread(target=self._watch_stalls, daemon=True).start()
+
+            if self.index_file and (self.folder or self.passthrough):
+                self.media_index = MediaIndex(self.index_file, ffprobe=self.ffprobe, cpus=self.cpus, log=self.log)
+
+            if not self.folder:
+                self._file_loop()
+            else:
+                if self.use_cache:
+                    self.segment_cache = SegmentCache(self.cache_dir, ffmpeg=self.ffmpeg, threads=self.threads,
+                                                      cpus=self.cpus, log=self.log)
+                self.watcher = FolderWatcher(self.source, self.profile.video_extensions,
+                                             on_add=self._file_added, log=self.log)
+                self.watcher.start()
+                if self.prefetch:
+                    self.prefetcher = Prefetcher(resolve=self._prepare_item, log=self.log)
+                if self.gapless:
+                    self._gapless_loop()
+                else:
+                    self._folder_loop()
+        except FileNotFoundError:
+            self.on_error("FFmpeg not found. Please install FFmpeg and ensure it's in your PATH.")
+        except Exception as e:
+            self.on_error(f"Stream engine error: {e}")
+        finally:
+            self.streaming = False
+            if self.playout:
+                self.playout.stop()
+            if self.resume:
+                self.resume.flush()
+            if self.relays:
+                self.relays.stop()
+            if self.watcher:
+                self.watcher.close()
+                self.watcher = None
+            if self.prefetcher:
+                self.prefetcher.close()
+                self.prefetcher = None
+            if self.segment_cache:
+                self.segment_cache.close()
+            if self.media_index:
+                self.media_index.close()
+                self.media_index = None
+            self.on_status("Stopped")
+            self._set_file(None)
+            self.on_stopped()
+
+    def _file_loop(self):
+        """Loop a single file forever, restarting ffmpeg whenever it exits"""
+        copy_video, copy_audio = False, False
+        if self.passthrough and self.media_index:
+            try:
+                media = self.media_index.probe(self.source)
+            except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+                self.log(f"Could not probe {os.path.basename(self.source)}: {e}")
+                media = None
+            copy_video, copy_audio, reasons = plan_copy(media, self.encode_args)
+            if copy_video or copy_audio:
+                self.log(f"Source matches the {self.profile.label} profile: {describe_copy(copy_video, copy_audio)}")
+            if reasons:
+                self.log(f"Transcoding because of: {'; '.join(reasons)}")
+
+        duration = None
+        if self.resume:
+            duration = self.media_index.duration(self.source) if self.media_index else None
+            duration = duration or probe_duration(self.source, self.ffprobe)
+            self.resume.load()
+
+        delay = RESTART_DELAY
+        while self.streaming:
+            if self._adapt_restart:
+                # Deliberate restart to apply new encoder settings: no backoff
+                self._adapt_restart = False
+                self.log("Restarting encoder with adjusted settings...")
+            elif self.restart_count == 0:
+                self.restart_count += 1
+                self.log(f"Starting {self.profile.label} stream (attempt {self.restart_count})...")
+                self.on_status("Streaming...")
+            else:
+                self.restart_count += 1
+                self.log(f"Stream disconnected. Restarting stream in {delay:.1f}s (attempt {self.restart_count})...")
+                self.on_status(f"Reconnecting... (attempt {self.restart_count})")
+                if not self._sleep(delay):
+                    break
+
+            seek = resume_position(self.resume.position, duration) if self.resume else 0.0
+            if seek:
+                self.log(f"Resuming at {format_position(seek)}")
+            self._begin_item(self.source, seek, 0.0, duration)
+            codec_args = self._codec_args(copy_video, copy_audio)
+            cmd = [
+                self.ffmpeg,
+                *PROGRESS_ARGS,
+                "-re",  # Read input at native frame rate
+                "-stream_loop", "-1",  # Loop video indefinitely
+                *self._seek_args(seek),
+                "-i", self.source,
+                *codec_args,
+                *stream_output(codec_args, self.output_args)
+            ]
+
+            try:
+                self.log("Running ffmpeg command...")
+                launched = time.monotonic()
+                exit_code = self._run_process(cmd, self.log)
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                self.log(f"Error running ffmpeg: {e}")
+                continue
+
+            if not self.streaming:
+                self.log("Stream stopped by user.")
+                break
+            if not self._adapt_restart:
+                self.log(f"FFmpeg exited with code {exit_code}. Will restart...")
+                failure, _ = self._classify_failure([self.source])
+                delay = self._recovery_delay(failure, time.monotonic() - launched, RESTART_DELAY)
+
+    def _item_args(self, video_path):
+        """ffmpeg input + codec args for one playlist item.
+
+        Sources already meeting the profile are stream-copied directly,
+        then cached encodes, then any partial passthrough, then a full encode.
+        """
+        if self.adaptive and self.adaptive.pending:
+            # A new item starts new measurements, whichever branch below builds its args
+            self.adaptive.applied()
+        filename = os.path.basename(video_path)
+        media = self.media_index.get(video_path) if self.media_index else None
+        details = describe_media(media)
+        if details:
+            filename = f"{filename} [{details}]"
+        seek = self._seek_args(self._item_seek)
+        if self._item_seek:
+            filename = f"{filename} from {format_position(self._item_seek)}"
+        copy_video, copy_audio = self._passthrough_plan(media)
+        if copy_video and copy_audio:
+            self.log(f"Streaming: {filename} (stream copy)")
+            return [*seek, "-i", video_path, *self._codec_args(True, True)]
+        cached = self.segment_cache.lookup(video_path, self.encode_args) if self.segment_cache else None
+        if cached:
+            self.log(f"Streaming: {filename} (cached)")
+            return [*seek, "-i", cached, "-map", "0", "-c", "copy"]
+        copied = describe_copy(copy_video, copy_audio)
+        self.log(f"Streaming: {filename}" + (f" ({copied})" if copied else ""))
+        return [*seek, "-i", video_path, *self._codec_args(copy_video, copy_audio)]
+
+    def _seek_args(self, seek):
+        # Input seeking: ffmpeg jumps to the keyframe before seek (and, when
+        # encoding, decodes forward to it) without reading the skipped part
+        return ["-ss", f"{seek:.3f}"] if seek else []
+
+    def _begin_item(self, video_path, seek, base, duration):
+        """Point playhead tracking at a new ffmpeg input"""
+        self._item, self._item_seek, self._item_base, self._item_duration = video_path, seek, base, duration
+        if self.resume:
+            self.resume.update(video_path, seek, force=True)
+
+    def _track_playhead(self, progress):
+        if not self.resume or self._item is None:
+            return
+        position = self._item_seek + progress.out_time - self._item_base
+        if not self.folder and self._item_duration:
+            position %= self._item_duration  # -stream_loop wraps around
+        self.resume.update(self._item, position)
+
+    def _passthrough_plan(self, media):
+        """(copy video, copy audio) for an indexed source"""
+        if not self.passthrough:
+            return False, False
+        copy_video, copy_audio, _ = plan_copy(media, self.encode_args)
+        return copy_video, copy_audio
+
+    def _codec_args(self, copy_video, copy_audio):
+        if not (copy_video or copy_audio):
+            return self._live_encode_args()
+        return copy_args(self._live_encode_args(), copy_video, copy_audio)
+
+    def _live_encode_args(self):
+        """Encode args for the next ffmpeg launch, with any adaptive adjustment applied"""
+        if not self.adaptive:
+            return self.encode_args
+        if self.adaptive.pending:
+            self.adaptive.applied()
+        return self.adaptive.encode_args()
+
+    def _file_added(self, video_path, stat):
+        """A folder item appeared or changed (watcher thread): index it and queue its cache encode"""
+        if self.quarantined.pop(video_path, None):
+            self.log(f"{os.path.basename(video_path)} changed; it will be played again")
+        if self.media_index:
+            self.media_index.refresh(video_path, stat)
+        self._populate_cache(video_path)
+
+    def _populate_cache(self, video_path):
+        # Encode anything not cached yet so later passes can stream-copy
+        if self.segment_cache:
+            media = self.media_index.get(video_path) if self.media_index else None
+            if self._passthrough_plan(media) != (True, True):
+                self.segment_cache.populate(video_path, self.encode_args)
+
+    def _playlist(self):
+        """Yield folder items in order forever, following the folder as files come and go.
+
+        The current item is yielded again (from the resume point) when the
+        loop set _replay, and the first item continues a previous run's slot.
+        Quarantined items are passed over.
+        """
+        skipped = 0
+        current = None
+        if self.resume:
+            current, _ = self.resume.load()
+            self._replay = current is not None
+        while self.streaming:
+            replay = self._replay and current in self.watcher
+            self._replay = False
+            if replay:
+                video_path, new_cycle = current, False
+            else:
+                video_path, new_cycle = self.watcher.next_after(current)
+            if video_path is None:
+                self.log("No video files found in folder! Waiting for files...")
+                self.watcher.wait()
+                current = None
+                continue
+            if new_cycle:
+                playlist = self.watcher.playlist()
+                self.log(f"Found {len(playlist)} videos. Starting circular queue.")
+                for path in playlist:
+                    self._populate_cache(path)  # re-queues anything evicted since the last pass
+            current = video_path
+            if not replay and self._is_quarantined(video_path):
+                skipped += 1
+                if skipped >= len(self.watcher.playlist()):
+                    self.log(f"No video in the folder can be read. Retrying in {INPUT_RETRY_DELAY}s...")
+                    self._sleep(INPUT_RETRY_DELAY)
+                    skipped = 0
+                continue
+            skipped = 0
+            self._item_seek = 0.0
+            if replay and self.resume:
+                duration = self.media_index.duration(video_path) if self.media_index else None
+                self._item_seek = resume_position(self.resume.position, duration)
+            if self.prefetcher:
+                self.prefetcher.prefetch(self.watcher.upcoming(video_path, self.prefetch))
+            yield video_path
+
+    def _prepare_item(self, video_path):
+        """Get an upcoming item ready (prefetch thread); returns the file ffmpeg will open"""
+        if self.media_index:
+            # Duration and passthrough decisions need the metadata at the switch
+            try:
+                self.media_index.probe(video_path)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                pass  # the background probe reports it; playout probes on its own
+        cached = self.segment_cache.peek(video_path, self.encode_args) if self.segment_cache else None
+        return [cached or video_path]
+
+    def _folder_loop(self):
+        """Stream each folder item with its own ffmpeg process and RTMP session"""
+        for video_path in self._playlist():
+            filename = os.path.basename(video_path)
+            self._set_file(filename)
+            self.on_status("Streaming Live")
+
+            # No -stream_loop here, we want to move to next file
+            args = self._item_args(video_path)
+            cmd = [self.ffmpeg, *PROGRESS_ARGS, "-re", *args, *stream_output(args, self.output_args)]
+            self._begin_item(video_path, self._item_seek, 0.0, None)
+            try:
+                launched = time.monotonic()
+                exit_code = self._run_process(cmd, self._log_errors)
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                self.log(f"Error streaming {filename}: {e}")
+                self._sleep(ERROR_DELAY)
+                continue
+
+            if not self.streaming:
+                break
+            failure, line = self._classify_failure(input_paths(args)) if exit_code != 0 else (None, None)
+            if failure == INPUT:
+                self._quarantine(video_path, line)
+            elif failure in (NETWORK, RESOURCE) or (
+                    exit_code != 0 and self.resume and self.resume.position > self._item_seek + 1):
+                # Dropped mid-item or never got out: play it again, from where it stopped
+                delay = self._recovery_delay(failure, time.monotonic() - launched, ERROR_DELAY)
+                self.log(f"{filename} stopped with exit code {exit_code}. Resuming it in {delay:.1f}s...")
+                self._replay = True
+                self._sleep(delay)
+            else:
+                self.log(f"Finished {filename}. Moving to next...")
+                self._sleep(1)  # Small gap between files
+
+    def _gapless_loop(self):
+        """Stream the folder over one persistent ffmpeg publisher"""
+        # The publisher maps every stream itself (map_all) when combining renditions
+        publisher_maps = ["-map", "0"] if self.combined else []
+        self.playout = GaplessPlayout(stream_output(publisher_maps, self.output_args),
+                                      ffmpeg=self.ffmpeg, ffprobe=self.ffprobe, on_output=self._playout_output,
+                                      map_all=self.combined, cpus=self.cpus,
+                                      progress=self.progress, on_progress=self._progress_block)
+
+        connected = None
+        for video_path in self._playlist():
+            if not self.playout.running():
+                self.log(f"Opening {self.profile.label} connection...")
+                try:
+                    self.playout.start()
+                    connected = time.monotonic()
+                except FileNotFoundError:
+                    raise
+                except Exception as e:
+                    self.log(f"Error starting publisher: {e}")
+                    self._sleep(ERROR_DELAY)
+                    continue
+
+            filename = os.path.basename(video_path)
+            self._set_file(filename)
+            self.on_status("Streaming Live")
+
+            args = []
+            try:
+                duration = self.media_index.duration(video_path) if self.media_index else None
+                args = self._item_args(video_path)
+                self._begin_item(video_path, self._item_seek, self.playout.offset, duration)
+                self._errors.clear()    # classify this item by its own output only
+                if self.watchdog:
+                    self.watchdog.arm()     # only while a feeder runs: the publisher idles between items
+                try:
+                    exit_code = self.playout.play(args, duration - self._item_seek if duration else None)
+                finally:
+                    if self.watchdog:
+                        self.watchdog.disarm()
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                self.log(f"Error streaming {filename}: {e}")
+                continue
+
+            if not self.streaming:
+                break
+            if exit_code is None:
+                # The publisher went away; that is the connection unless the output says otherwise
+                failure, line = self._classify_failure(input_paths(args), default=NETWORK)
+                if failure == INPUT:
+                    self._quarantine(video_path, line)
+                else:
+                    delay = self._recovery_delay(failure, time.monotonic() - connected, ERROR_DELAY)
+                    self.log(f"{self.profile.label} connection dropped. Reconnecting in {delay:.1f}s...")
+                    self._replay = True
+                    self._sleep(delay)
+            elif exit_code != 0:
+                failure, line = self._classify_failure(input_paths(args))
+                if failure == INPUT:
+                    self._quarantine(video_path, line)
+                elif failure == RESOURCE:
+                    delay = self._recovery_delay(failure, 0, ERROR_DELAY)
+                    self.log(f"Error streaming {filename} (exit code {exit_code}). Retrying in {delay:.1f}s...")
+                    self._replay = True
+                    self._sleep(delay)
+                else:
+                    self.log(f"Error streaming {filename} (exit code {exit_code}). Skipping...")
+            else:
+                self.log(f"Finished {filename}. Moving to next...")
+
+    def _run_process(self, cmd, on_line):
+        """Run one ffmpeg process to completion, feeding its output lines to on_line.
+
+        Output, exit and stop requests are all awaited on an asyncio loop, so
+        an idle engine thread sleeps in the kernel instead of polling.
+        """
+        self._process_exited.clear()
+        try:
+            return asyncio.run(self._supervise_process(cmd, on_line))
+        finally:
+            self._process_exited.set()
+
+    async def _supervise_process(self, cmd, on_line):
+        stop_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self.progress.reset()
+        self._errors.clear()
+        # stdin is a pipe so stopping can send ffmpeg its `q`
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_flags()
+        )
+        restrict(process.pid, self.cpus)
+        self.ffmpeg_process = process
+        self._interrupt = lambda: loop.call_soon_threadsafe(stop_requested.set)
+        if self.watchdog:
+            self.watchdog.arm()
+        try:
+            if not self.streaming:
+                # stop() raced the launch and could not reach this loop yet
+                stop_requested.set()
+            readers = asyncio.gather(self._read_lines(process.stderr, on_line),
+                                     self._read_progress(process.stdout))
+            exited = asyncio.create_task(process.wait())
+            stopped = asyncio.create_task(stop_requested.wait())
+            await asyncio.wait({exited, stopped}, return_when=asyncio.FIRST_COMPLETED)
+
+            if not exited.done():
+                await stop_async(process)
+                await exited
+            stopped.cancel()
+            await readers
+            return process.returncode
+        finally:
+            if self.watchdog:
+                self.watchdog.disarm()
+            self._interrupt = None
+            self.ffmpeg_process = None
+
+    def _watch_stalls(self):
+        """Watchdog thread: restart sessions whose ffmpeg is alive but no longer streaming"""
+        while self.streaming and not self._stop_event.wait(STALL_CHECK_INTERVAL):
+            idle = self.watchdog.check()
+            if idle is None or not self.streaming:
+                continue
+            self.log(f"No output progress for {idle:.0f}s: ffmpeg is hung. Restarting the stream...")
+            self._stalled = True
+            if self.playout and self.playout.running():
+                self.playout.interrupt()
+            else:
+                self._interrupt_process()
+
+    def _interrupt_process(self):
+        """Ask the running _supervise_process to terminate its ffmpeg (thread-safe)"""
+        interrupt = self._interrupt
+        if interrupt:
+            try:
+                interrupt()
+            except RuntimeError:
+                # The loop closed between the check and the call
+                pass
+
+    async def _read_lines(self, stream, on_line):
+        # ffmpeg separates progress updates with \r, errors with \n
+        buffer = b""
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.replace(b"\r", b"\n").split(b"\n")
+            for line in lines:
+                self._emit_line(line, on_line)
+        self._emit_line(buffer, on_line)
+
+    def _emit_line(self, line, on_line):
+        line = line.decode(errors="replace").strip()
+        if line and self.streaming:
+            self._errors.append(line)
+            on_line(line)
+
+    async def _read_progress(self, stream):
+        parser = ProgressParser(self.progress)
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            if parser.feed(chunk):
+                self._progress_block(self.progress)
+
+    def _progress_block(self, progress):
+        """Publish a completed -progress block and log a summary now and then"""
+        if not self.streaming:
+            return
+        self._track_playhead(progress)
+        if progress.updated - self._progress_logged >= PROGRESS_LOG_INTERVAL:
+            self._progress_logged = progress.updated
+            self.log(progress.summary())
+        if self.adaptive and self.adaptive.observe(progress) and not self.folder:
+            # A single file never reaches a natural boundary; restart the encoder now.
+            # Folder items pick the new settings up at the next item.
+            self._adapt_restart = True
+            self._interrupt_process()
+        self.on_progress(progress)
+
+    def _playout_output(self, line):
+        self._errors.append(line)
+        self._log_errors(line)
+
+    def _classify_failure(self, inputs, default=UNKNOWN):
+        """(class, explaining line) of the session that just failed; counted and logged"""
+        if self._stalled:
+            failure, line = NETWORK, "no output progress"
+        else:
+            failure, line = classify(list(self._errors), inputs)
+            if failure == UNKNOWN:
+                failure = default
+        self._stalled = False
+        self.failures[failure] += 1
+        self.log(f"Failure class: {failure}" + (f" ({line})" if line else ""))
+        return failure, line
+
+    def _recovery_delay(self, failure, ran_for, unknown_delay):
+        """Seconds to wait before the next attempt, after applying failure's strategy"""
+        self.backoff.ran(ran_for)
+        if failure == NETWORK:
+            return self.backoff.next()
+        if failure == RESOURCE:
+            self._reduce_load()
+            return RESOURCE_DELAY
+        if failure == INPUT:
+            return INPUT_RETRY_DELAY
+        return unknown_delay
+
+    def _reduce_load(self):
+        if self.adaptive:
+            self.adaptive.force_down("ffmpeg ran out of resources")
+        if self.segment_cache:
+            self.segment_cache.pause(RESOURCE_PAUSE)
+            self.log(f"Pausing cache encodes for {RESOURCE_PAUSE // 60} minutes")
+
+    def _quarantine(self, video_path, line):
+        """Pass over an unreadable folder item until it changes or QUARANTINE_SECONDS pass"""
+        self.quarantined[video_path] = (file_stamp(video_path), time.monotonic() + QUARANTINE_SECONDS)
+        self.log(f"Skipping {os.path.basename(video_path)}: it cannot be read ({line}). It is tried again "
+                 f"when the file changes or in {QUARANTINE_SECONDS // 60} minutes.")
+
+    def _is_quarantined(self, video_path):
+        entry = self.quarantined.get(video_path)
+        if entry is None:
+            return False
+        stamp, retry_after = entry
+        if time.monotonic() < retry_after and stamp == file_stamp(video_path):
+            return True
+        self.quarantined.pop(video_path, None)
+        self.log(f"Trying {os.path.basename(video_path)} again")
+        return False
+
+    def _log_errors(self, line):
+        """Forward ffmpeg error lines to the log"""
+        if "Error" in line:
+            self.log(line)
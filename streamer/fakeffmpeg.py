@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Fake ffmpeg
+A stand-in ffmpeg executable for exercising the engine's supervision
+(launch, output reading, stop and restart) without real encodes or a live
+ingest. It accepts the command lines the engine builds and answers the way
+ffmpeg would: -progress blocks on stdout, log lines on stderr, a clean exit
+on `q` from stdin, exit code 255 on SIGTERM or SIGINT.
+
+Behaviour is set through environment variables, all optional:
+
+    FAKE_FFMPEG_PROGRESS_INTERVAL  seconds between progress blocks (0.5, ffmpeg's default)
+    FAKE_FFMPEG_SPEED              encode speed reported, as a multiple of real time (1.0)
+    FAKE_FFMPEG_LOG_RATE           stderr lines per second while running (0)
+    FAKE_FFMPEG_LOG_LINES          stderr lines written as fast as possible at startup (0)
+    FAKE_FFMPEG_DURATION           seconds until a normal exit with code 0 (run until stopped)
+    FAKE_FFMPEG_CRASH_AFTER        seconds until it fails like a dropped connection
+    FAKE_FFMPEG_CRASH_MESSAGE      last stderr line of that failure
+    FAKE_FFMPEG_CRASH_CODE         exit code of that failure (1)
+    FAKE_FFMPEG_STALL_AFTER        seconds until it stops producing any output but keeps running
+    FAKE_FFMPEG_EXIT_DELAY         seconds it takes to exit once asked to stop (0)
+    FAKE_FFMPEG_IGNORE_TERM        1 to ignore q and SIGTERM/SIGINT, so only SIGKILL ends it
+    FAKE_FFMPEG_EVENTS             file that gets a "<time> <pid> start|exit <code>" line per launch and exit
+
+The engine takes it like any other binary:
+
+    python -m streamer run --ffmpeg streamer/fakeffmpeg.py --file any.mp4 --key test
+"""
+
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+
+LOG_LINES = [
+    "[flv @ 0x55d5c0a3c2c0] Failed to update header with correct duration.",
+    "[h264 @ 0x55d5c0a41a80] Increasing reorder buffer to 1",
+    "[aac @ 0x55d5c0a3f440] Queue input is backward in time",
+    "[flv @ 0x55d5c0a3c2c0] Non-monotonous DTS in output stream 0:1; previous: 4087, current: 4086; changing to 4087.",
+    "[rtmp @ 0x55d5c0a3d100] Error in the pull function.",
+]
+CRASH_LINES = [
+    "[flv @ 0x55d5c0a3c2c0] Failed to update header with correct duration.",
+    "av_interleaved_write_frame(): Broken pipe",
+    "[flv @ 0x55d5c0a3c2c0] Failed to update header with correct duration.",
+    "Error writing trailer of rtmp://a.rtmp.youtube.com/live2/****: Broken pipe",
+]
+CRASH_MESSAGE = "Conversion failed!"
+FPS = 30
+
+
+def setting(name, default=None):
+    value = os.environ.get(f"FAKE_FFMPEG_{name}")
+    if value in (None, ""):
+        return default
+    return float(value)
+
+
+def record(event):
+    path = os.environ.get("FAKE_FFMPEG_EVENTS")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"{time.time():.6f} {os.getpid()} {event}\n")
+
+
+class FakeFFmpeg:
+    def __init__(self, argv):
+        self.argv = argv
+        self.interval = setting("PROGRESS_INTERVAL", 0.5)
+        self.speed = setting("SPEED", 1.0)
+        self.log_rate = setting("LOG_RATE", 0)
+        self.duration = setting("DURATION")
+        self.crash_after = setting("CRASH_AFTER")
+        self.stall_after = setting("STALL_AFTER")
+        self.exit_delay = setting("EXIT_DELAY", 0)
+        self.ignore_term = bool(setting("IGNORE_TERM", 0))
+        self.stop_requested = threading.Event()
+        self.wake = threading.Event()
+        self.signum = None
+        self.lock = threading.Lock()
+        self.progress_out = self._option("-progress") == "pipe:1"
+        self.stats = "-nostats" not in argv and not self.progress_out
+        self.frame = 0
+        self.total_size = 0
+        self.log_index = 0
+
+    def _option(self, name):
+        if name in self.argv[:-1]:
+            return self.argv[self.argv.index(name) + 1]
+        return None
+
+    def write(self, stream, data):
+        with self.lock:
+            try:
+                stream.buffer.write(data.encode())
+                stream.buffer.flush()
+            except (BrokenPipeError, ValueError):
+                pass  # the reader went away; keep behaving until stopped
+
+    def log_line(self):
+        self.write(sys.stderr, LOG_LINES[self.log_index % len(LOG_LINES)] + "\n")
+        self.log_index += 1
+
+    def progress(self, elapsed, end=False):
+        out_time = elapsed * self.speed
+        self.frame = int(out_time * FPS)
+        self.total_size = int(out_time * 4500 * 1000 / 8)
+        us = int(out_time * 1e6)
+        hours, rest = divmod(out_time, 3600)
+        minutes, seconds = divmod(rest, 60)
+        stamp = f"{int(hours):02d}:{int(minutes):02d}:{seconds:09.6f}"
+        if self.progress_out:
+            self.write(sys.stdout, (
+                f"frame={self.frame}\nfps={FPS * self.speed:.2f}\nstream_0_0_q=23.0\n"
+                f"bitrate=4500.0kbits/s\ntotal_size={self.total_size}\nout_time_us={us}\n"
+                f"out_time_ms={us}\nout_time={stamp}\ndup_frames=0\ndrop_frames=0\n"
+                f"speed={self.speed:.3g}x\nprogress={'end' if end else 'continue'}\n"
+            ))
+        elif self.stats:
+            self.write(sys.stderr, (
+                f"frame={self.frame:5d} fps={FPS * self.speed:.0f} q=23.0 size={self.total_size // 1024:8d}kB "
+                f"time={stamp[:11]} bitrate=4500.0kbits/s speed={self.speed:.3g}x    \r"
+            ))
+
+    def request_stop(self, signum=None, frame=None):
+        if not self.ignore_term:
+            self.signum = signum
+            self.stop_requested.set()
+            self.wake.set()
+
+    def watch_stdin(self):
+        # ffmpeg's interactive `q`; the engine's pipe:0 publisher input is consumed elsewhere
+        while True:
+            try:
+                data = os.read(sys.stdin.fileno(), 1)
+            except OSError:
+                return
+            if not data:
+                return
+            if data in (b"q", b"Q"):
+                self.request_stop()
+
+    def run(self):
+        started = time.monotonic()
+        record("start")
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        if "pipe:0" in self.argv:
+            reader = threading.Thread(target=self.consume_stdin, daemon=True)
+        elif sys.stdin is not None and not sys.stdin.isatty() and "-nostdin" not in self.argv:
+            reader = threading.Thread(target=self.watch_stdin, daemon=True)
+        else:
+            reader = None
+        if reader:
+            reader.start()
+
+        output = self.argv[-1] if len(self.argv) > 1 else ""
+        if output.endswith(".mp4") and "-i" in self.argv:
+            # A segment cache encode: produce the file at once
+            shutil.copyfile(self._option("-i"), output)
+            return self.exit(0)
+        if output == "pipe:1" and not self.progress_out:
+            return self.exit(self.feed())
+        if self._option("-t") and "null" in self.argv:
+            # Calibration run: report its speed, then finish
+            self.duration = float(self._option("-t")) / max(self.speed, 0.01)
+
+        for _ in range(int(setting("LOG_LINES", 0))):
+            self.log_line()
+
+        next_progress = started + self.interval
+        next_log = started + 1 / self.log_rate if self.log_rate else None
+        stalled = False
+        while True:
+            now = time.monotonic()
+            elapsed = now - started
+            if self.stop_requested.is_set():
+                time.sleep(self.exit_delay)
+                if self.signum is None:
+                    # q finishes the output properly, like reaching the end
+                    self.progress(elapsed, end=True)
+                    return self.exit(0)
+                self.write(sys.stderr, f"Exiting normally, received signal {self.signum}.\n")
+                return self.exit(255)
+            if self.duration is not None and elapsed >= self.duration:
+                self.progress(elapsed, end=True)
+                return self.exit(0)
+            if self.crash_after is not None and elapsed >= self.crash_after:
+                for line in CRASH_LINES:
+                    self.write(sys.stderr, line + "\n")
+                self.write(sys.stderr, os.environ.get("FAKE_FFMPEG_CRASH_MESSAGE", CRASH_MESSAGE) + "\n")
+                return self.exit(int(setting("CRASH_CODE", 1)))
+            if self.stall_after is not None and elapsed >= self.stall_after:
+                stalled = True
+            if not stalled and now >= next_progress:
+                self.progress(elapsed)
+                next_progress += self.interval
+            if not stalled and next_log is not None and now >= next_log:
+                self.log_line()
+                next_log += 1 / self.log_rate
+            deadlines = [next_progress, next_log] if not stalled else []
+            deadlines += [started + limit for limit in (self.duration, self.crash_after, self.stall_after)
+                          if limit is not None]
+            upcoming = [deadline - time.monotonic() for deadline in deadlines if deadline is not None]
+            self.wake.wait(min([wait for wait in upcoming if wait > 0], default=0.5))
+            self.wake.clear()
+
+    def consume_stdin(self):
+        # Publisher mode: runs while its feeders write, finishes at EOF like ffmpeg does
+        while True:
+            try:
+                data = os.read(sys.stdin.fileno(), 64 * 1024)
+            except OSError:
+                data = b""
+            if not data:
+                self.duration = 0
+                self.wake.set()
+                return
+
+    def feed(self):
+        """Gapless feeder: MPEG-TS-sized chunks on stdout for the item's duration"""
+        seconds = self.duration if self.duration is not None else 2.0
+        packet = b"\x47" + b"\xff" * 187
+        started = time.monotonic()
+        while time.monotonic() - started < seconds / max(self.speed, 0.01):
+            if self.stop_requested.is_set():
+                return 255
+            if self.crash_after is not None and time.monotonic() - started >= self.crash_after:
+                # A feeder fails on its input: no muxer trailer lines, just the error
+                self.write(sys.stderr, os.environ.get("FAKE_FFMPEG_CRASH_MESSAGE", CRASH_MESSAGE) + "\n")
+                return int(setting("CRASH_CODE", 1))
+            try:
+                sys.stdout.buffer.write(packet * 100)
+                sys.stdout.buffer.flush()
+            except BrokenPipeError:
+                return 1
+            self.stop_requested.wait(0.1)
+        return 0
+
+    def exit(self, code):
+        record(f"exit {code}")
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+        return code
+
+
+if __name__ == "__main__":
+    sys.exit(FakeFFmpeg(sys.argv).run())
@@ -0,0 +1,144 @@
+"""
+Multi-destination fan-out
+One encode pushed to several RTMP destinations through ffmpeg's tee muxer.
+
+With more than one destination the tee slaves are local MPEG-TS/UDP
+sockets (onfail=ignore), each drained by a tiny stream-copy relay that owns
+the RTMP connection. A platform dropping only restarts its own relay; the
+encoder and the other destinations never notice.
+"""
+
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .processes import popen_flags, stop_processes
+
+RELAY_RETRY_MIN = 0.5
+RELAY_RETRY_MAX = 30
+TEE_MAPS = ["-map", "0:v:0", "-map", "0:a:0?"]  # what a tee carries when nothing else maps streams
+
+
+def describe(url):
+    """Printable name for a destination that never includes the stream key"""
+    parts = urlsplit(url)
+    return parts.hostname or url.split("/")[0]
+
+
+def free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def output_args(urls, ports=None, selects=None, options=()):
+    """ffmpeg output arguments for one URL (plain FLV) or a tee over relay ports.
+
+    options are extra FLV output options (a profile's output_options) and
+    only apply to the plain single-URL output.
+
+    selects optionally gives each destination a stream specifier; the caller
+    is then responsible for mapping the streams it picks from. Maps are
+    added per command by stream_output(), never here.
+    """
+    if len(urls) == 1 and not selects:
+        return ["-f", "flv", *options, urls[0]]
+    slaves = []
+    for index, port in enumerate(ports):
+        options = "f=mpegts:onfail=ignore"
+        if selects:
+            options = f"select='{selects[index]}':{options}"
+        slaves.append(f"[{options}]udp://127.0.0.1:{port}?pkt_size=1316")
+    return ["-f", "tee", "|".join(slaves)]
+
+
+def stream_output(args, output_args):
+    """output_args for a command whose other options are args.
+
+    A tee output gets TEE_MAPS unless args already map streams (passthrough
+    copy args, a cached item's -map 0, a rendition graph); mapping twice
+    would send every stream twice.
+    """
+    if "tee" in output_args[:2] and "-map" not in args:
+        return [*TEE_MAPS, *output_args]
+    return list(output_args)
+
+
+class RelayPool:
+    """Per-destination stream-copy relays with independent reconnects"""
+
+    def __init__(self, urls, selects=None, ffmpeg="ffmpeg", log=None):
+        self.urls = list(urls)
+        self.selects = selects
+        self.ports = [free_udp_port() for _ in self.urls]
+        self.ffmpeg = ffmpeg
+        self.log = log or print
+        self.processes = {}
+        # Destination names for logs and metrics, unique even for two keys on one host
+        self.names = []
+        for url in self.urls:
+            name = describe(url)
+            self.names.append(name if name not in self.names else f"{name}#{len(self.names) + 1}")
+        self.reconnects = {name: 0 for name in self.names}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()   # relays are launched and registered under it, so stop() sees them all
+        self._threads = []
+
+    def output_args(self):
+        return output_args(self.urls, self.ports, self.selects)
+
+    def start(self):
+        self._stop_event.clear()
+        for name, url, port in zip(self.names, self.urls, self.ports):
+            thread = threading.Thread(target=self._supervise, args=(name, url, port), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._lock:
+            self._stop_event.set()
+            processes = list(self.processes.values())
+            self.processes.clear()
+        stop_processes(processes, send_quit=False)
+
+    def _supervise(self, name, url, port):
+        source = f"udp://127.0.0.1:{port}?fifo_size=1000000&overrun_nonfatal=1"
+        cmd = [
+            self.ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error",
+            "-f", "mpegts", "-i", source,
+            "-c", "copy", "-f", "flv", url
+        ]
+        delay = RELAY_RETRY_MIN
+        while not self._stop_event.is_set():
+            with self._lock:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    process = subprocess.Popen(
+                        cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **popen_flags()
+                    )
+                except OSError as e:
+                    self.log(f"[{name}] Relay failed to start: {e}")
+                    return
+                self.processes[url] = process
+            started = time.monotonic()
+            for line in iter(process.stderr.readline, b""):
+                if line.strip():
+                    self.log(f"[{name}] {line.decode(errors='replace').strip()}")
+            exit_code = process.wait()
+            with self._lock:
+                if self.processes.get(url) is process:
+                    del self.processes[url]
+            if self._stop_event.is_set():
+                break
+
+            # Back off only while the destination keeps failing quickly
+            if time.monotonic() - started > RELAY_RETRY_MAX:
+                delay = RELAY_RETRY_MIN
+            self.reconnects[name] += 1
+            self.log(f"[{name}] Relay exited with code {exit_code}. Reconnecting in {delay:.1f}s...")
+            if self._stop_event.wait(delay):
+                break
+            delay = min(delay * 2, RELAY_RETRY_MAX)
@@ -0,0 +1,89 @@
+"""
+Log queue
+Bounded hand-off of engine log lines to a consumer that may fall behind
+(a busy Tk main loop). Producers never block and memory never grows past
+the capacity, whatever ffmpeg prints.
+
+Overflow policy: errors are always kept (evicting the oldest ordinary
+line), progress lines are coalesced into the latest one, and any other
+line arriving at a full queue is dropped and counted.
+"""
+
+import heapq
+import threading
+from collections import deque
+
+CAPACITY = 1000
+
+
+def is_error(line):
+    lowered = line.lower()
+    return "error" in lowered or "fail" in lowered
+
+
+def is_progress(line):
+    return line.startswith("frame=") or ("size=" in line and "time=" in line and "bitrate=" in line)
+
+
+class LogQueue:
+    """Bounded, coalescing FIFO of log lines with drop accounting"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.dropped = 0        # lines discarded since creation
+        self.coalesced = 0      # progress lines replaced by a newer one
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._ordinary = deque()
+        self._errors = deque()
+        self._progress = None   # (seq, line) of the pending progress update
+        self._dropped_since_drain = 0
+        self._armed = False
+
+    def __len__(self):
+        return len(self._ordinary) + len(self._errors) + (self._progress is not None)
+
+    def put(self, line):
+        """Queue a line without blocking.
+
+        Returns True when the consumer should be woken, i.e. for the first
+        line after a drain; later lines ride along with that wake-up.
+        """
+        with self._lock:
+            self._seq += 1
+            if is_progress(line):
+                if self._progress is not None:
+                    # Keep the original position so the log order stays sensible
+                    self._progress = (self._progress[0], line)
+                    self.coalesced += 1
+                else:
+                    self._progress = (self._seq, line)
+            elif len(self) >= self.capacity:
+                if is_error(line) and (self._ordinary or self._errors):
+                    (self._ordinary or self._errors).popleft()
+                    self._errors.append((self._seq, line))
+                self.dropped += 1
+                self._dropped_since_drain += 1
+            elif is_error(line):
+                self._errors.append((self._seq, line))
+            else:
+                self._ordinary.append((self._seq, line))
+
+            if self._armed:
+                return False
+            self._armed = True
+            return True
+
+    def drain(self):
+        """Take every pending line in arrival order, plus a note about drops"""
+        with self._lock:
+            pending = [self._ordinary, self._errors, [self._progress] if self._progress else []]
+            lines = [line for _, line in heapq.merge(*pending)]
+            self._ordinary = deque()
+            self._errors = deque()
+            self._progress = None
+            dropped, self._dropped_since_drain = self._dropped_since_drain, 0
+            self._armed = False
+        if dropped:
+            lines.append(f"... {dropped} log line(s) dropped while the display was behind")
+        return lines
@@ -0,0 +1,136 @@
+"""
+Log sink
+Buffered, rotating log file writer. Callers hand lines to a bounded queue
+and return immediately; a background thread keeps the file open, writes
+whatever has queued up in one batch, and rotates (optionally gzipping the
+old file) by size or age.
+"""
+
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+QUEUE_SIZE = 10000
+BATCH_SIZE = 1000
+
+
+class LogSink:
+    """Asynchronous append-only log file with rotation.
+
+    The file is rotated once it reaches max_bytes or, if rotate_interval
+    (seconds) is set, once it is that old. Rotated files are kept as
+    path.1 .. path.N (newest first), gzipped when compress is true. write()
+    never blocks: if the queue is full the line is counted as dropped and a
+    note is written once the writer catches up.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, rotate_interval=None, backups=BACKUPS, compress=True,
+                 queue_size=QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.compress = compress
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()   # writers count, the writer thread reads and resets
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._opened_at = None
+        self._closed = False
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line):
+        """Queue one line for writing; never blocks the caller"""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self, timeout=5):
+        """Flush queued lines and close the file"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            # Block for the first line, then take whatever else queued up meanwhile
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is None
+            lines = [line for line in batch if line is not None]
+            try:
+                self._write(lines)
+            except OSError as e:
+                print(f"Error writing to log file: {e}")
+            if done:
+                if self._file:
+                    self._file.close()
+                return
+
+    def _write(self, lines):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.append(f"[log sink] {dropped} line(s) dropped while the writer was behind")
+        if not lines:
+            return
+        if self._file is None:
+            self._open()
+        elif self._due():
+            self._file.close()
+            self._rotate()
+            self._open()
+        self._file.write("".join(line.rstrip("\n") + "\n" for line in lines))
+        self._file.flush()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _due(self):
+        if self._file.tell() >= self.max_bytes:
+            return True
+        return self.rotate_interval is not None and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        suffix = ".gz" if self.compress else ""
+        oldest = f"{self.path}.{self.backups}{suffix}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}{suffix}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}{suffix}")
+        if not self.compress:
+            os.replace(self.path, f"{self.path}.1")
+            return
+        with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
@@ -0,0 +1,63 @@
+"""
+Log view
+Ring-buffered front end for a tkinter Text log pane. Lines are collected
+in a fixed-size buffer and written to the widget in batches at a capped
+rate, and the widget is trimmed to the same capacity, so a window that
+streams for days costs the same as one that just started.
+
+Tk-only helper for the GUIs; the engine and CLI never import it. Like any
+Tk code it runs on the main thread only: engine threads hand their lines
+over through LogQueue and UIDispatcher.
+"""
+
+import tkinter as tk
+from collections import deque
+
+CAPACITY = 5000     # lines kept in the widget
+FLUSH_MS = 100      # at most 10 widget updates a second
+
+
+class LogView:
+    """Batched, bounded writer for a (disabled) tkinter Text widget"""
+
+    def __init__(self, root, widget, capacity=CAPACITY, flush_ms=FLUSH_MS):
+        self.root = root
+        self.widget = widget
+        self.capacity = capacity
+        self.flush_ms = flush_ms
+        self.lines = 0
+        self._pending = deque(maxlen=capacity)
+        self._scheduled = False
+
+    def append(self, line):
+        """Queue a line for display (main thread only); cheap, the widget is updated in batches"""
+        self._pending.append(line if line.endswith("\n") else line + "\n")
+        if self._scheduled:
+            return
+        self._scheduled = True
+        # Only a flush is ever scheduled; nothing runs while the log is quiet
+        self.root.after(self.flush_ms, self._flush)
+
+    def clear(self):
+        self._pending.clear()
+        self.widget.config(state=tk.NORMAL)
+        self.widget.delete("1.0", tk.END)
+        self.widget.config(state=tk.DISABLED)
+        self.lines = 0
+
+    def _flush(self):
+        batch = list(self._pending)
+        self._pending.clear()
+        self._scheduled = False
+        if not batch:
+            return
+
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, "".join(batch))
+        self.lines += sum(line.count("\n") for line in batch)
+        excess = self.lines - self.capacity
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self.lines -= excess
+        self.widget.see(tk.END)
+        self.widget.config(state=tk.DISABLED)
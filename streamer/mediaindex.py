@@ -0,0 +1,287 @@
+"""
+Media index
+Persistent SQLite index of ffprobe metadata (duration, codecs, resolution,
+frame rate, audio layout) for folder sources. Entries are keyed by path and
+validated by size + mtime, so an unchanged file is probed once, ever.
+
+All rows are also held in memory: lookups are a dict access, and probing
+runs on low-priority background workers so even a folder of tens of
+thousands of videos never delays the playout loop.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import subprocess
+import threading
+import time
+
+from .processes import KILL_TIMEOUT, popen_flags, restrict, signal_group
+
+SCHEMA_VERSION = 2      # bump when columns change; older indexes are rebuilt
+WORKERS = 2
+PROBE_TIMEOUT = 60
+KEYINT_WINDOW = 60      # seconds of H.264 packets read to measure the keyframe interval
+
+COLUMNS = ["path", "size", "mtime_ns", "duration", "bit_rate", "video_codec", "video_profile", "width", "height",
+           "fps", "pix_fmt", "video_bit_rate", "keyint", "audio_codec", "channels", "sample_rate",
+           "channel_layout", "audio_bit_rate", "error", "probed_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    bit_rate INTEGER,
+    video_codec TEXT,
+    video_profile TEXT,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    pix_fmt TEXT,
+    video_bit_rate INTEGER,
+    keyint REAL,
+    audio_codec TEXT,
+    channels INTEGER,
+    sample_rate INTEGER,
+    channel_layout TEXT,
+    audio_bit_rate INTEGER,
+    error TEXT,
+    probed_at REAL
+)
+"""
+
+
+def parse_rate(rate):
+    """'30000/1001' -> 29.97"""
+    try:
+        num, _, den = rate.partition("/")
+        return float(num) / float(den or 1) if float(den or 1) else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_probe(data):
+    """Flatten ffprobe -show_format -show_streams JSON into index columns"""
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    container = data.get("format", {})
+    return {
+        "duration": parse_number(container.get("duration")),
+        "bit_rate": parse_number(container.get("bit_rate"), int),
+        "video_codec": video.get("codec_name"),
+        "video_profile": video.get("profile"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": parse_rate(video.get("avg_frame_rate")) or parse_rate(video.get("r_frame_rate")),
+        "pix_fmt": video.get("pix_fmt"),
+        "video_bit_rate": parse_number(video.get("bit_rate"), int),
+        "audio_codec": audio.get("codec_name"),
+        "channels": audio.get("channels"),
+        "sample_rate": parse_number(audio.get("sample_rate"), int),
+        "channel_layout": audio.get("channel_layout"),
+        "audio_bit_rate": parse_number(audio.get("bit_rate"), int),
+    }
+
+
+def parse_keyint(csv):
+    """Longest gap in seconds between keyframes in ffprobe 'pts_time,flags' packet lines"""
+    keyframes, last = [], None
+    for line in csv.splitlines():
+        pts, _, flags = line.partition(",")
+        pts = parse_number(pts)
+        if pts is None:
+            continue
+        last = pts if last is None else max(last, pts)
+        if "K" in flags:
+            keyframes.append(pts)
+    if not keyframes:
+        return None
+    keyframes.sort()
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])] + [last - keyframes[-1]]
+    return max(gaps)
+
+
+def describe(media):
+    """Short human summary, e.g. '1920x1080 h264 30fps, aac stereo, 3:25'"""
+    if not media or media.get("error"):
+        return ""
+    parts = []
+    if media.get("video_codec"):
+        fps = f" {media['fps']:.4g}fps" if media.get("fps") else ""
+        parts.append(f"{media['width']}x{media['height']} {media['video_codec']}{fps}")
+    if media.get("audio_codec"):
+        layout = media.get("channel_layout") or f"{media.get('channels')}ch"
+        parts.append(f"{media['audio_codec']} {layout}")
+    if media.get("duration"):
+        minutes, seconds = divmod(int(media["duration"]), 60)
+        parts.append(f"{minutes}:{seconds:02d}")
+    return ", ".join(parts)
+
+
+class MediaIndex:
+    """ffprobe metadata for every file it has been told about"""
+
+    def __init__(self, db_path, ffprobe="ffprobe", workers=WORKERS, cpus=None, log=None):
+        self.db_path = db_path
+        self.ffprobe = ffprobe
+        self.cpus = cpus
+        self.workers = workers
+        self.log = log or (lambda message: None)
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS media")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.execute(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._entries = {row[0]: dict(zip(COLUMNS, row))
+                         for row in self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM media")}
+        self._jobs = queue.Queue()
+        self._pending = set()
+        self._threads = []
+        self._processes = set()     # ffprobe runs in flight, killed by close()
+        self._closed = False
+
+    def get(self, path):
+        """Metadata dict for path, or None if it has not been probed (yet)"""
+        return self._entries.get(path)
+
+    def duration(self, path):
+        entry = self._entries.get(path)
+        return entry["duration"] if entry else None
+
+    def probe(self, path):
+        """Metadata for path, probing it now on the calling thread if new or changed.
+
+        None if it would need a probe but the index is closed (or ffprobe missing).
+        """
+        st = os.stat(path)
+        entry = self._entries.get(path)
+        if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+            if self._closed:
+                return None
+            self._probe(path, st.st_size, st.st_mtime_ns)
+            entry = self._entries.get(path)
+        return entry
+
+    def refresh(self, path, stat):
+        """Queue a background probe of path unless its indexed size and mtime still match stat"""
+        entry = self._entries.get(path)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            self._queue_probe(path, stat.st_size, stat.st_mtime_ns)
+
+    def close(self):
+        """Drop the queued probes, kill the running ones and close the database"""
+        with self._lock:
+            self._closed = True
+            processes = list(self._processes)
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._jobs.put(None)
+        for process in processes:
+            signal_group(process, force=True)
+        for thread in self._threads:
+            thread.join(KILL_TIMEOUT)
+        with self._lock:
+            self._db.close()
+
+    def _queue_probe(self, path, size, mtime_ns):
+        with self._lock:
+            if self._closed or path in self._pending:
+                return
+            self._pending.add(path)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run_jobs, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._jobs.put((path, size, mtime_ns))
+
+    def _run_jobs(self):
+        while True:
+            job = self._jobs.get()
+            if job is None or self._closed:
+                return
+            path, size, mtime_ns = job
+            try:
+                self._probe(path, size, mtime_ns)
+            except FileNotFoundError:
+                self.log(f"ffprobe not found; media index disabled ({self.ffprobe})")
+                with self._lock:
+                    self._closed = True
+                return
+            except Exception as e:
+                if not self._closed:
+                    self.log(f"Probe of {os.path.basename(path)} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+    def _probe(self, path, size, mtime_ns):
+        result = self._run_ffprobe(["-print_format", "json", "-show_format", "-show_streams", path])
+        entry = dict.fromkeys(COLUMNS)
+        entry.update(path=path, size=size, mtime_ns=mtime_ns, probed_at=time.time())
+        if result.returncode == 0:
+            entry.update(parse_probe(json.loads(result.stdout or b"{}")))
+            if entry["video_codec"] == "h264":
+                # GOP length decides whether the video can be stream-copied (see passthrough.py)
+                packets = self._run_ffprobe([
+                    "-select_streams", "v:0", "-read_intervals", f"%+{KEYINT_WINDOW}",
+                    "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+                ])
+                if packets.returncode == 0:
+                    entry["keyint"] = parse_keyint(packets.stdout.decode(errors="replace"))
+        else:
+            # Remember the failure too, so a broken file is not probed every cycle
+            error = result.stderr.decode(errors="replace").strip().splitlines()
+            entry["error"] = error[-1] if error else f"ffprobe exited with code {result.returncode}"
+
+        with self._lock:
+            if self._closed:
+                return
+            self._entries[path] = entry
+            self._db.execute(
+                f"INSERT OR REPLACE INTO media ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [entry[column] for column in COLUMNS]
+            )
+
+    def _run_ffprobe(self, args):
+        # Background metadata must never compete with the live encode, nor leave the channel's cores
+        popen_kwargs = popen_flags(nice=10)
+        with self._lock:
+            if self._closed:
+                raise OSError("media index closed")   # callers already handle a failed probe
+            process = subprocess.Popen([self.ffprobe, "-v", "error", *args], stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_kwargs)
+            restrict(process.pid, self.cpus, nice=10)
+            self._processes.add(process)
+        try:
+            stdout, stderr = process.communicate(timeout=PROBE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            signal_group(process, force=True)
+            process.communicate()
+            raise
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
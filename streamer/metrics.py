@@ -0,0 +1,148 @@
+"""
+Metrics endpoint
+Optional Prometheus/OpenMetrics text endpoint served from the streaming
+process, so channels can be scraped instead of having their logs parsed.
+
+    python -m streamer run ... --metrics-port 9464
+    curl http://127.0.0.1:9464/metrics
+"""
+
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name, type, help
+METRICS = [
+    ("streamer_streaming", "gauge", "1 while the channel's engine is running"),
+    ("streamer_uptime_seconds", "gauge", "Seconds since the engine started"),
+    ("streamer_restarts_total", "counter", "ffmpeg relaunches after the first attempt"),
+    ("streamer_encode_speed", "gauge", "Encode speed as a multiple of real time"),
+    ("streamer_encode_fps", "gauge", "Frames per second reported by ffmpeg"),
+    ("streamer_output_bitrate_kbps", "gauge", "Output bitrate in kbit/s"),
+    ("streamer_output_bytes", "gauge", "Bytes written by the current ffmpeg process"),
+    ("streamer_dropped_frames", "gauge", "Frames dropped by the current ffmpeg process"),
+    ("streamer_duplicated_frames", "gauge", "Frames duplicated by the current ffmpeg process"),
+    ("streamer_progress_age_seconds", "gauge", "Seconds since ffmpeg last reported progress"),
+    ("streamer_stalls_total", "counter", "Sessions restarted because ffmpeg stopped making output progress"),
+    ("streamer_stall_detection_seconds", "gauge", "Seconds from the last output progress to the last stall detection"),
+    ("streamer_failures_total", "counter", "ffmpeg failures, by class (input, network, resource, unknown)"),
+    ("streamer_quarantined_files", "gauge", "Folder items skipped because they cannot be read"),
+    ("streamer_current_file", "gauge", "Playlist item being streamed (value is always 1)"),
+    ("streamer_relay_reconnects_total", "counter", "Reconnects of each simulcast destination"),
+    ("streamer_adaptive_level", "gauge", "Adaptive encoder rung (0 = configured settings)"),
+    ("streamer_adaptive_adjustments_total", "counter", "Adaptive encoder steps, by direction"),
+]
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def engine_samples(channel, engine, now=None, monotonic=None):
+    """(metric, labels, value) samples describing one StreamEngine"""
+    now = now or time.time()
+    monotonic = monotonic or time.monotonic()
+    labels = {"channel": channel}
+    progress = engine.progress
+    samples = [
+        ("streamer_streaming", labels, 1 if engine.streaming else 0),
+        ("streamer_uptime_seconds", labels, now - engine.started_at if engine.started_at else 0.0),
+        ("streamer_restarts_total", labels, engine.restarts),
+        ("streamer_encode_speed", labels, progress.speed),
+        ("streamer_encode_fps", labels, progress.fps),
+        ("streamer_output_bitrate_kbps", labels, progress.bitrate),
+        ("streamer_output_bytes", labels, progress.total_size),
+        ("streamer_dropped_frames", labels, progress.drop_frames),
+        ("streamer_duplicated_frames", labels, progress.dup_frames),
+        ("streamer_progress_age_seconds", labels,
+         monotonic - progress.updated if progress.updated is not None else None),
+    ]
+    if engine.watchdog:
+        samples.append(("streamer_stalls_total", labels, engine.watchdog.stalls))
+        samples.append(("streamer_stall_detection_seconds", labels, engine.watchdog.last_detection))
+    for failure, count in engine.failures.items():
+        samples.append(("streamer_failures_total", {**labels, "class": failure}, count))
+    samples.append(("streamer_quarantined_files", labels, len(engine.quarantined)))
+    if engine.current_file:
+        samples.append(("streamer_current_file", {**labels, "file": engine.current_file}, 1))
+    if engine.relays:
+        for name, count in engine.relays.reconnects.items():
+            samples.append(("streamer_relay_reconnects_total", {**labels, "destination": name}, count))
+    if engine.adaptive:
+        samples.append(("streamer_adaptive_level", labels, engine.adaptive.level))
+        for direction, count in engine.adaptive.adjustments.items():
+            samples.append(("streamer_adaptive_adjustments_total", {**labels, "direction": direction}, count))
+    return samples
+
+
+def render(engines):
+    """Prometheus text exposition for a list of (channel name, engine)"""
+    now, monotonic = time.time(), time.monotonic()
+    by_metric = {}
+    for channel, engine in engines:
+        for name, labels, value in engine_samples(channel, engine, now, monotonic):
+            by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, kind, help_text in METRICS:
+        samples = by_metric.get(name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves /metrics on a background thread.
+
+    engines is a callable returning the current list of (channel name,
+    StreamEngine) pairs, evaluated on every scrape.
+    """
+
+    def __init__(self, engines, port, host="127.0.0.1"):
+        self.engines = engines
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        engines = self.engines
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render(engines()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes every few seconds would drown the stream log
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
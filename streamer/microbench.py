@@ -0,0 +1,234 @@
+"""
+Supervision microbenchmarks
+Times the engine's own hot paths (launching ffmpeg, reading its output,
+stopping and restarting it) against the fake ffmpeg in fakeffmpeg.py, so
+no encode or network time hides a regression:
+
+    supervisor CPU      engine CPU time per channel while N channels stream
+    log throughput      ffmpeg stderr lines per second delivered to on_log
+    stop latency        stop() until the engine thread has exited, for an ffmpeg
+                        that exits at once, one that is slow to exit and one that
+                        ignores q and SIGTERM
+    restart latency     ffmpeg crash -> next ffmpeg launch (a dropped connection, so
+                        this is the reconnect backoff plus the engine's overhead)
+
+    python -m streamer microbench --channels 8 --json microbench.json
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .engine import StreamEngine
+from .fakeffmpeg import LOG_LINES
+from .profiles import get_profile
+from .recovery import BACKOFF_MAX
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakeffmpeg.py")
+SOURCE = "microbench.mp4"                   # never opened: the fake ffmpeg ignores its input
+OUTPUT = "rtmp://127.0.0.1:1/live/microbench"
+WARMUP = 1.0                                # seconds before CPU is sampled
+START_TIMEOUT = 10                          # seconds to wait for a fake ffmpeg's first progress block
+
+
+class FakeSettings:
+    """Sets FAKE_FFMPEG_* environment variables for the processes launched inside the block"""
+
+    def __init__(self, **settings):
+        self.settings = {f"FAKE_FFMPEG_{name.upper()}": str(value) for name, value in settings.items()
+                         if value is not None}
+        self.saved = {}
+
+    def __enter__(self):
+        for name, value in self.settings.items():
+            self.saved[name] = os.environ.get(name)
+            os.environ[name] = value
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def make_engine(ffmpeg, on_log=None, on_progress=None):
+    """A single-file engine with every optional subsystem off, so only supervision is measured"""
+    return StreamEngine(
+        get_profile("yt"), SOURCE, OUTPUT, ffmpeg=ffmpeg, use_cache=False, index_file=None, prefetch=0,
+        resume_dir=None, on_log=on_log or (lambda message: None), on_progress=on_progress,
+    )
+
+
+def started_engine(ffmpeg, on_log=None):
+    """Start an engine and wait for its ffmpeg's first progress block"""
+    streaming = threading.Event()
+    engine = make_engine(ffmpeg, on_log=on_log, on_progress=lambda progress: streaming.set())
+    engine.start()
+    if not streaming.wait(START_TIMEOUT):
+        engine.stop()
+        raise RuntimeError(f"{ffmpeg} reported no progress within {START_TIMEOUT}s")
+    return engine
+
+
+def supervisor_cpu(ffmpeg=FAKE_FFMPEG, channels=8, seconds=10, progress_interval=0.5, log_rate=2):
+    """Engine CPU time per channel while channels engines stream"""
+    blocks = [0]
+
+    def count(progress):
+        blocks[0] += 1
+
+    with FakeSettings(progress_interval=progress_interval, log_rate=log_rate):
+        engines = [make_engine(ffmpeg, on_progress=count) for _ in range(channels)]
+        for engine in engines:
+            engine.start()
+        time.sleep(WARMUP)
+        blocks[0] = 0
+        cpu, wall = time.process_time(), time.monotonic()
+        time.sleep(seconds)
+        cpu, wall = time.process_time() - cpu, time.monotonic() - wall
+        received = blocks[0]
+        for engine in engines:
+            engine.stop()
+        for engine in engines:
+            engine.wait(10)
+    return {
+        "channels": channels,
+        "seconds": round(wall, 3),
+        "cpu_percent_per_channel": round(cpu / wall / channels * 100, 3),
+        "progress_blocks_per_second": round(received / wall, 1),
+    }
+
+
+def log_throughput(ffmpeg=FAKE_FFMPEG, lines=100000, timeout=60):
+    """Rate at which a burst of ffmpeg stderr lines reaches on_log"""
+    known = set(LOG_LINES)
+    received = [0]
+    done = threading.Event()
+
+    def on_log(message):
+        if message in known:
+            received[0] += 1
+            if received[0] >= lines:
+                done.set()
+
+    with FakeSettings(log_lines=lines):
+        started = time.monotonic()
+        engine = make_engine(ffmpeg, on_log=on_log)
+        engine.start()
+        done.wait(timeout)
+        elapsed = time.monotonic() - started
+        engine.stop()
+        engine.wait(10)
+    return {
+        "lines": lines,
+        "received": received[0],
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(received[0] / elapsed),
+    }
+
+
+def stop_latency(ffmpeg=FAKE_FFMPEG, exit_delay=0.0, ignore_term=False, repeats=3):
+    """Seconds from stop() until the engine thread is gone, once ffmpeg is streaming"""
+    timings = []
+    with FakeSettings(exit_delay=exit_delay, ignore_term=int(ignore_term)):
+        for _ in range(repeats):
+            engine = started_engine(ffmpeg)
+            started = time.monotonic()
+            engine.stop()
+            engine.wait(30)
+            timings.append(time.monotonic() - started)
+    return {
+        "exit_delay": exit_delay,
+        "ignore_term": ignore_term,
+        "mean": round(sum(timings) / len(timings), 3),
+        "max": round(max(timings), 3),
+    }
+
+
+def read_events(path):
+    """(time, pid, event, code) tuples a fake ffmpeg recorded"""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            stamp, pid, event, *code = line.split()
+            events.append((float(stamp), int(pid), event, int(code[0]) if code else None))
+    return events
+
+
+def launches(path):
+    try:
+        return sum(event == "start" for _, _, event, _ in read_events(path))
+    except OSError:
+        return 0
+
+
+def restart_latency(ffmpeg=FAKE_FFMPEG, restarts=3, crash_after=0.5):
+    """Seconds from an ffmpeg crash (a broken RTMP pipe) to the next launch"""
+    with tempfile.TemporaryDirectory() as folder:
+        events_file = os.path.join(folder, "events")
+        with FakeSettings(crash_after=crash_after, events=events_file):
+            engine = make_engine(ffmpeg)
+            engine.start()
+            deadline = time.monotonic() + (restarts + 1) * (BACKOFF_MAX + crash_after + 5)
+            while launches(events_file) <= restarts and engine.thread.is_alive() and time.monotonic() < deadline:
+                time.sleep(0.1)
+            engine.stop()
+            engine.wait(10)
+        events = read_events(events_file) if os.path.exists(events_file) else []
+
+    gaps = []
+    for (stamp, _, event, code), following in zip(events, events[1:]):
+        if event == "exit" and code and following[2] == "start":
+            gaps.append(following[0] - stamp)
+    if not gaps:
+        return {"restarts": 0}
+    return {
+        "restarts": len(gaps),
+        "first": round(gaps[0], 3),
+        "mean": round(sum(gaps) / len(gaps), 3),
+        "max": round(max(gaps), 3),
+    }
+
+
+def format_report(report):
+    cpu, logs, restart = report["supervisor_cpu"], report["log_throughput"], report["restart_latency"]
+    lines = [
+        f"supervisor CPU: {cpu['cpu_percent_per_channel']:.3f}% of a core per channel "
+        f"({cpu['channels']} channels, {cpu['progress_blocks_per_second']} progress blocks/s)",
+        f"log throughput: {logs['lines_per_second']} lines/s ({logs['received']}/{logs['lines']} lines "
+        f"in {logs['seconds']:.3f}s)",
+    ]
+    for stop in report["stop_latency"]:
+        kind = "ignores q and SIGTERM" if stop["ignore_term"] else f"exits after {stop['exit_delay']:g}s"
+        lines.append(f"stop latency (ffmpeg {kind}): mean {stop['mean']:.3f}s, max {stop['max']:.3f}s")
+    if restart["restarts"]:
+        lines.append(f"restart latency: first {restart['first']:.3f}s, mean {restart['mean']:.3f}s, "
+                     f"max {restart['max']:.3f}s over {restart['restarts']} restarts")
+    else:
+        lines.append("restart latency: no restarts observed")
+    return "\n".join(lines)
+
+
+def run(ffmpeg=FAKE_FFMPEG, channels=8, seconds=10, log_lines=100000, restarts=3, json_file=None, log=print):
+    """Run every microbenchmark once; returns the report"""
+    log(f"Supervisor CPU with {channels} channels for {seconds:g}s...")
+    report = {"supervisor_cpu": supervisor_cpu(ffmpeg, channels, seconds)}
+    log(f"Log throughput over {log_lines} lines...")
+    report["log_throughput"] = log_throughput(ffmpeg, log_lines)
+    log("Stop latency...")
+    report["stop_latency"] = [
+        stop_latency(ffmpeg),
+        stop_latency(ffmpeg, exit_delay=1.0),
+        stop_latency(ffmpeg, ignore_term=True, repeats=1),
+    ]
+    log(f"Restart latency over {restarts} crashes...")
+    report["restart_latency"] = restart_latency(ffmpeg, restarts)
+    print(format_report(report), flush=True)
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
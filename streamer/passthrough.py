@@ -0,0 +1,163 @@
+"""
+Stream-copy passthrough
+Compares a source's probed metadata (see mediaindex.py) with what a
+profile's encode args would produce and, where the source already meets
+the target, stream-copies that part instead of transcoding it. A library
+pre-mastered to the ingest spec then streams at almost no CPU cost.
+
+Video is copied only when codec, H.264 profile, pixel format, resolution,
+frame rate, keyframe interval and bitrate ceiling all fit; audio when
+codec, sample rate, channels and bitrate do. Unknown values never match.
+"""
+
+import re
+
+# Encoder named in the encode args -> codec it produces
+ENCODERS = {"libx264": "h264", "h264_nvenc": "h264", "h264_qsv": "h264", "h264_vaapi": "h264",
+            "aac": "aac", "libfdk_aac": "aac"}
+
+H264_PROFILES = ("Constrained Baseline", "Baseline", "Main", "High")
+DEFAULT_PIX_FMT = "yuv420p"
+MAX_CHANNELS = 2
+FPS_TOLERANCE = 0.01
+KEYINT_TOLERANCE = 0.05     # seconds
+
+# Options that configure the video encoder / audio encoder (matched without stream specifiers)
+VIDEO_OPTIONS = {"-c:v", "-vcodec", "-preset", "-tune", "-profile", "-level", "-b:v", "-maxrate", "-bufsize",
+                 "-vf", "-filter:v", "-r", "-pix_fmt", "-g", "-keyint_min", "-sc_threshold", "-x264-params"}
+AUDIO_OPTIONS = {"-c:a", "-acodec", "-b:a", "-ar", "-ac", "-af", "-filter:a"}
+
+
+def option_name(option):
+    """'-b:v:0' -> '-b:v', '-preset:v' -> '-preset', '-c:a' -> '-c:a'"""
+    parts = option.split(":")
+    if parts[0] in ("-c", "-b", "-codec", "-filter") and len(parts) > 1:
+        return f"{parts[0].replace('-codec', '-c')}:{parts[1]}"
+    return parts[0]
+
+
+def parse_bitrate(value):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKM]?)", value or "")
+    if not match:
+        return None
+    return int(float(match.group(1)) * {"": 1, "k": 1000, "K": 1000, "M": 1000000}[match.group(2)])
+
+
+def targets(encode_args):
+    """What the encode args produce, as {option: value} with stream specifiers folded"""
+    wanted = {}
+    for option, value in zip(encode_args[::2], encode_args[1::2]):
+        wanted.setdefault(option_name(option), value)
+    return wanted
+
+
+def filters_match(media, chain):
+    """True if the -vf chain would leave this source's frames unchanged"""
+    pix_fmt = None
+    for spec in chain.split(","):
+        name, _, args = spec.partition("=")
+        if name == "scale":
+            size = args.split(":")
+            if len(size) != 2 or not all(part.isdigit() for part in size):
+                return False, None
+            if (media.get("width"), media.get("height")) != (int(size[0]), int(size[1])):
+                return False, None
+        elif name == "crop" and args == "in_h*9/16:in_h":
+            # Already vertical 9:16 (to the pixel) means the centre crop is a no-op
+            if not media.get("height") or abs(media["width"] - media["height"] * 9 // 16) > 1:
+                return False, None
+        elif name == "format" and args:
+            pix_fmt = args
+        else:
+            return False, None
+    return True, pix_fmt
+
+
+def video_mismatch(media, wanted):
+    """Why the source's video cannot be copied, or None if it can"""
+    encoder = wanted.get("-c:v")
+    if ENCODERS.get(encoder) != media.get("video_codec"):
+        return f"video is {media.get('video_codec') or 'unknown'}, not {ENCODERS.get(encoder, encoder)}"
+    if media["video_codec"] == "h264" and media.get("video_profile") not in H264_PROFILES:
+        return f"H.264 profile {media.get('video_profile') or 'unknown'}"
+
+    filter_pix_fmt = None
+    if "-vf" in wanted or "-filter:v" in wanted:
+        ok, filter_pix_fmt = filters_match(media, wanted.get("-vf") or wanted.get("-filter:v"))
+        if not ok:
+            return f"resolution {media.get('width')}x{media.get('height')} needs filtering"
+    pix_fmt = wanted.get("-pix_fmt") or filter_pix_fmt or DEFAULT_PIX_FMT
+    if media.get("pix_fmt") != pix_fmt:
+        return f"pixel format {media.get('pix_fmt')}"
+
+    fps = media.get("fps")
+    if not fps:
+        return "unknown frame rate"
+    if "-r" in wanted and abs(fps - float(wanted["-r"])) > FPS_TOLERANCE:
+        return f"{fps:.4g} fps"
+    if "-g" in wanted:
+        max_keyint = int(wanted["-g"]) / (float(wanted["-r"]) if "-r" in wanted else fps)
+        keyint = media.get("keyint")
+        if keyint is None or keyint > max_keyint + KEYINT_TOLERANCE:
+            measured = f"{keyint:.3g}s" if keyint is not None else "unknown"
+            return f"keyframe interval {measured} (max {max_keyint:.3g}s)"
+
+    ceiling = parse_bitrate(wanted.get("-maxrate") or wanted.get("-b:v"))
+    # Without a per-stream bitrate the container total is an upper bound
+    bitrate = media.get("video_bit_rate") or media.get("bit_rate")
+    if ceiling and (bitrate is None or bitrate > ceiling):
+        return f"video bitrate {bitrate // 1000 if bitrate else 'unknown'}k over {ceiling // 1000}k"
+    return None
+
+
+def audio_mismatch(media, wanted):
+    """Why the source's audio cannot be copied, or None if it can"""
+    if not media.get("audio_codec"):
+        return None  # nothing to encode either way
+    encoder = wanted.get("-c:a")
+    if ENCODERS.get(encoder) != media["audio_codec"]:
+        return f"audio is {media['audio_codec']}, not {ENCODERS.get(encoder, encoder)}"
+    if "-ar" in wanted and media.get("sample_rate") != int(wanted["-ar"]):
+        return f"{media.get('sample_rate')} Hz audio"
+    channels = media.get("channels")
+    if channels is None or channels > int(wanted.get("-ac", MAX_CHANNELS)) or \
+            "-ac" in wanted and channels != int(wanted["-ac"]):
+        return f"{channels} audio channels"
+    ceiling = parse_bitrate(wanted.get("-b:a"))
+    if ceiling and (media.get("audio_bit_rate") is None or media["audio_bit_rate"] > ceiling):
+        return f"audio bitrate over {ceiling // 1000}k"
+    return None
+
+
+def plan(media, encode_args):
+    """(copy video, copy audio, reasons) for streaming media with encode_args"""
+    if not media or media.get("error") or not media.get("video_codec"):
+        return False, False, ["not probed"]
+    wanted = targets(encode_args)
+    video, audio = video_mismatch(media, wanted), audio_mismatch(media, wanted)
+    return video is None, audio is None, [reason for reason in (video, audio) if reason]
+
+
+def copy_args(encode_args, copy_video, copy_audio):
+    """encode_args with the copied streams' encoder options swapped for -c copy"""
+    args = ["-map", "0:v:0", "-map", "0:a:0?"]
+    for option, value in zip(encode_args[::2], encode_args[1::2]):
+        name = option_name(option)
+        if copy_video and name in VIDEO_OPTIONS or copy_audio and name in AUDIO_OPTIONS:
+            continue
+        args += [option, value]
+    if copy_video:
+        args += ["-c:v", "copy"]
+    if copy_audio:
+        args += ["-c:a", "copy"]
+    return args
+
+
+def describe(copy_video, copy_audio):
+    if copy_video and copy_audio:
+        return "stream copy"
+    if copy_video:
+        return "video copied, audio encoded"
+    if copy_audio:
+        return "audio copied, video encoded"
+    return ""
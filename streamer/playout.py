@@ -0,0 +1,168 @@
+"""
+Gapless playout
+Keeps one long-lived ffmpeg publisher (and its RTMP session) open while the
+playlist is fed into it file by file over an MPEG-TS pipe.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+from .processes import popen_flags, restrict, signal_group, stop_processes
+from .progress import PROGRESS_ARGS, READ_SIZE, ProgressParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+def probe_duration(path, ffprobe="ffprobe"):
+    """Return the container duration of path in seconds, or None if unknown"""
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=15, **popen_flags()
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+class GaplessPlayout:
+    """One persistent RTMP publisher fed by short-lived per-file feeders.
+
+    Each feeder remuxes (or encodes) a single item to MPEG-TS on stdout with
+    its timestamps shifted by the running playlist offset, so the publisher
+    sees one continuous stream and only stream-copies it to the output(s).
+    """
+
+    def __init__(self, output_args, ffmpeg="ffmpeg", ffprobe="ffprobe", on_output=None, map_all=False,
+                 cpus=None, progress=None, on_progress=None):
+        self.output_args = list(output_args)
+        self.cpus = cpus
+        # Copy every stream the feeders produce (one video stream per rendition)
+        self.map_args = ["-map", "0"] if map_all else []
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.on_output = on_output or (lambda line: None)
+        # The publisher's -progress blocks, i.e. what actually reaches the ingest
+        self.parser = ProgressParser(progress)
+        self.progress = self.parser.progress
+        self.on_progress = on_progress or (lambda progress: None)
+        self.publisher = None
+        self.feeder = None
+        self.offset = 0.0
+        self._stopped = False
+        self._interrupted = False
+
+    def running(self):
+        return self.publisher is not None and self.publisher.poll() is None
+
+    def start(self):
+        """Launch the publisher and reset the playlist clock"""
+        self._stopped = False
+        self._interrupted = False
+        self.offset = 0.0
+        self.progress.reset()
+        self.parser = ProgressParser(self.progress)
+        cmd = [
+            self.ffmpeg, "-hide_banner", "-loglevel", "warning", *PROGRESS_ARGS,
+            "-fflags", "+genpts", "-f", "mpegts", "-i", "pipe:0",
+            *self.map_args, "-c", "copy", *self.output_args
+        ]
+        self.publisher = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_flags()
+        )
+        restrict(self.publisher.pid, self.cpus)
+        self._forward_output(self.publisher.stderr)
+        self._forward_progress(self.publisher.stdout)
+
+    def play(self, input_args, duration=None):
+        """Feed one item (its ffmpeg input + codec args) and block until it ends.
+
+        duration, if already known (e.g. from the media index), saves an
+        ffprobe run; it is what remains after any -ss seek in input_args.
+        Returns the feeder's exit code, or None if the publisher went away.
+        """
+        # Local references: stop() and interrupt() clear the attributes from other threads
+        publisher = self.publisher
+        if publisher is None or publisher.poll() is not None:
+            return None
+
+        if duration is None:
+            duration = probe_duration(input_args[input_args.index("-i") + 1], self.ffprobe)
+            if duration and "-ss" in input_args:
+                duration = max(0.0, duration - float(input_args[input_args.index("-ss") + 1]))
+        cmd = [
+            self.ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", "-re",
+            *input_args,
+            "-output_ts_offset", f"{self.offset:.6f}",
+            "-f", "mpegts", "pipe:1"
+        ]
+        started = time.monotonic()
+        self.feeder = feeder = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_flags()
+        )
+        restrict(feeder.pid, self.cpus)
+        self._forward_output(feeder.stderr)
+
+        feeder_out = feeder.stdout.fileno()
+        sink = publisher.stdin
+        publisher_alive = True
+        try:
+            while True:
+                chunk = os.read(feeder_out, CHUNK_SIZE)
+                if not chunk:
+                    break
+                sink.write(chunk)
+                sink.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            publisher_alive = False
+
+        if not publisher_alive and feeder.poll() is None:
+            signal_group(feeder, force=True)
+        exit_code = feeder.wait()
+        self.feeder = None
+
+        # Advance the playlist clock so the next item continues this one's timestamps.
+        # Only a clean run wrote the whole item; otherwise count what was written,
+        # which under -re is the time the feeder ran
+        elapsed = time.monotonic() - started
+        complete = exit_code == 0 and publisher_alive and not (self._stopped or self._interrupted)
+        self.offset += duration if duration and complete else elapsed
+        if not publisher_alive or self._stopped or self._interrupted:
+            return None
+        return exit_code
+
+    def interrupt(self):
+        """Kill a hung session from any thread; play() returns None as for a dropped connection"""
+        self._interrupted = True
+        stop_processes([self.feeder, self.publisher], send_quit=False)
+
+    def stop(self):
+        """Tear down the feeder and publisher"""
+        self._stopped = True
+        # The publisher's stdin is its input: EOF lets it finish the RTMP session cleanly
+        stop_processes([self.feeder, self.publisher], send_quit=False)
+        self.feeder = None
+        self.publisher = None
+
+    def _forward_output(self, stream):
+        def pump():
+            # ffmpeg separates progress updates with \r, errors with \n
+            buffer = b""
+            for chunk in iter(lambda: stream.read1(READ_SIZE), b""):
+                buffer += chunk
+                *lines, buffer = buffer.replace(b"\r", b"\n").split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        self.on_output(line.decode(errors="replace").strip())
+
+        threading.Thread(target=pump, daemon=True).start()
+
+    def _forward_progress(self, stream):
+        def pump():
+            for chunk in iter(lambda: stream.read1(READ_SIZE), b""):
+                if self.parser.feed(chunk):
+                    self.on_progress(self.progress)
+
+        threading.Thread(target=pump, daemon=True).start()
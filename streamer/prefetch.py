@@ -0,0 +1,99 @@
+"""
+Lookahead prefetch
+While one playlist item streams, a background thread gets the next ones
+ready: it checks that they still exist and can be read, and pulls their
+headers, first GOP and tail (where an unoptimised MP4 keeps its index) into
+the page cache, so ffmpeg's open at the transition costs no disk seeks.
+
+posix_fadvise(WILLNEED) starts kernel readahead where available; the
+ranges are then read as well, because network filesystems often ignore
+the hint.
+"""
+
+import os
+import threading
+
+DEPTH = 2                       # playlist items kept warm ahead of the current one
+HEAD_BYTES = 8 * 1024 * 1024    # container header and the first GOPs at streaming bitrates
+TAIL_BYTES = 4 * 1024 * 1024    # moov atom of files without +faststart
+READ_SIZE = 1024 * 1024
+
+
+def warm(path, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+    """Pull the start and end of path into the page cache; returns the bytes read"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            raise ValueError("file is empty")
+        ranges = [(0, min(size, head_bytes))]
+        if size > head_bytes:
+            start = max(head_bytes, size - tail_bytes)
+            ranges.append((start, size - start))
+        if hasattr(os, "posix_fadvise"):
+            for offset, length in ranges:
+                os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        total = 0
+        for offset, length in ranges:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while length > 0:
+                chunk = os.read(fd, min(READ_SIZE, length))
+                if not chunk:
+                    break
+                total += len(chunk)
+                length -= len(chunk)
+        return total
+    finally:
+        os.close(fd)
+
+
+class Prefetcher:
+    """Keeps the next few playlist items warm on a background thread.
+
+    prefetch(paths) replaces the set of upcoming items; resolve(path), if
+    given, is called first for each and returns the files ffmpeg will really
+    open (e.g. a cached encode instead of the source), doing any other
+    preparation (metadata probes) along the way.
+    """
+
+    def __init__(self, resolve=None, log=None):
+        self.resolve = resolve or (lambda path: [path])
+        self.log = log or (lambda message: None)
+        self._lock = threading.Condition()
+        self._wanted = []
+        self._closed = False
+        self._thread = None
+
+    def prefetch(self, paths):
+        with self._lock:
+            if self._closed:
+                return
+            self._wanted = list(paths)
+            self._lock.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+
+    def _next(self):
+        with self._lock:
+            self._lock.wait_for(lambda: self._wanted or self._closed)
+            if self._closed:
+                return None
+            return self._wanted.pop(0)
+
+    def _run(self):
+        while True:
+            path = self._next()
+            if path is None:
+                return
+            try:
+                # Re-warming a file that is still cached is only a memory copy
+                for name in self.resolve(path):
+                    warm(name)
+            except Exception as e:
+                self.log(f"Upcoming item {os.path.basename(path)} may not play: {e}")
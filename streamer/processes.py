@@ -0,0 +1,145 @@
+"""
+Process shutdown
+Every ffmpeg the engine starts gets its own process group (a new session
+on POSIX, CREATE_NEW_PROCESS_GROUP on Windows) and is stopped through its
+own PID, never by name, so stopping one channel cannot touch another
+channel's ffmpeg or anybody else's.
+
+Children are also pinned to their channel's cores and deprioritised from
+here (restrict()), after they start rather than in a preexec_fn.
+
+Stopping escalates with short bounded waits: `q` on stdin (ffmpeg's own
+clean exit, which also closes the RTMP session properly), or EOF when
+stdin carries the input; then SIGTERM to the group; then SIGKILL.
+"""
+
+import asyncio
+import os
+import platform
+import signal
+import subprocess
+import time
+
+QUIT_TIMEOUT = 0.1      # seconds ffmpeg gets to act on q / end of input
+TERM_TIMEOUT = 0.1      # seconds after SIGTERM before SIGKILL
+KILL_TIMEOUT = 1.0      # seconds to reap a killed process
+STOP_TIMEOUT = QUIT_TIMEOUT + TERM_TIMEOUT + KILL_TIMEOUT
+
+
+def group_flags():
+    """Popen kwargs that start the child in its own process group"""
+    if platform.system() == "Windows":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def popen_flags(nice=0):
+    """Popen kwargs: own process group, no console window on Windows (and, for
+    background work with nice > 0, below-normal priority there; see restrict())"""
+    flags = group_flags()
+    if platform.system() == "Windows":
+        flags["creationflags"] |= subprocess.CREATE_NO_WINDOW
+        if nice:
+            flags["creationflags"] |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    return flags
+
+
+def restrict(pid, cpus=None, nice=0):
+    """Pin a started child to cpus and raise its niceness by nice (POSIX).
+
+    Applied from the parent once the child exists: a preexec_fn can deadlock
+    a multi-threaded parent between fork and exec. Linux keeps both per
+    thread, so every thread the child already has is updated; the ones it
+    starts later inherit them.
+    """
+    if platform.system() == "Windows" or not (cpus or nice):
+        return
+    try:
+        threads = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        threads = [pid]
+    priority = os.getpriority(os.PRIO_PROCESS, 0) + nice if nice else None
+    for tid in threads:
+        try:
+            if cpus and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(tid, cpus)
+            if priority is not None:
+                os.setpriority(os.PRIO_PROCESS, tid, priority)
+        except OSError:
+            pass    # already exited, or not ours to change
+
+
+def signal_group(process, force=False):
+    """SIGTERM (SIGKILL if force) to process's group; CTRL_BREAK (TerminateProcess) on Windows"""
+    if process.returncode is not None:
+        return  # already reaped: its PID may belong to someone else by now
+    try:
+        if platform.system() == "Windows":
+            if force:
+                process.kill()
+            else:
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            return
+        sig = signal.SIGKILL if force else signal.SIGTERM
+        try:
+            os.killpg(process.pid, sig)
+        except PermissionError:
+            # Not a group leader after all: signal just the process
+            process.send_signal(sig)
+    except (ProcessLookupError, OSError):
+        pass
+
+
+def _close_stdin(stdin, send_quit):
+    try:
+        if send_quit:
+            stdin.write(b"q")
+            if hasattr(stdin, "flush"):
+                stdin.flush()
+        stdin.close()
+    except (OSError, ValueError, RuntimeError):
+        pass
+
+
+def stop_processes(processes, send_quit=True, quit_timeout=QUIT_TIMEOUT, term_timeout=TERM_TIMEOUT):
+    """Stop subprocess.Popen processes together: q (or EOF) -> SIGTERM -> SIGKILL.
+
+    send_quit=False only closes stdin, for processes whose stdin is their
+    input (EOF ends them cleanly) or that were started without one.
+    """
+    processes = [process for process in processes if process is not None and process.poll() is None]
+    for process in processes:
+        if process.stdin:
+            _close_stdin(process.stdin, send_quit)
+    phases = [(None, quit_timeout if any(process.stdin for process in processes) else 0),
+              (False, term_timeout), (True, KILL_TIMEOUT)]
+    for force, timeout in phases:
+        if force is not None:
+            for process in processes:
+                signal_group(process, force)
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                pass
+        processes = [process for process in processes if process.poll() is None]
+        if not processes:
+            return
+
+
+async def stop_async(process, send_quit=True):
+    """stop_processes for one asyncio subprocess; returns its exit code"""
+    if process.returncode is None and process.stdin:
+        _close_stdin(process.stdin, send_quit)
+    for force, timeout in ((None, QUIT_TIMEOUT if process.stdin else 0), (False, TERM_TIMEOUT),
+                           (True, KILL_TIMEOUT)):
+        if process.returncode is not None:
+            break
+        if force is not None:
+            signal_group(process, force)
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return process.returncode
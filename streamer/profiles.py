@@ -0,0 +1,105 @@
+"""
+Stream profiles
+Per-platform ingest URLs and encode settings for single-file and folder streaming.
+"""
+
+YOUTUBE_RTMP_URL = "rtmp://a.rtmp.youtube.com/live2/"
+
+AUDIO_ARGS = ["-c:a", "aac", "-b:a", "128k", "-ar", "44100"]
+
+SCRIPT_ARGS = {
+    platform: [
+        "-c:v", "libx264", "-preset", "superfast", "-b:v", rate, "-maxrate", rate, "-bufsize", bufsize,
+        "-pix_fmt", "yuv420p", "-g", "60",
+        *AUDIO_ARGS,
+    ]
+    for platform, rate, bufsize in (("yt", "6800k", "13600k"), ("ig", "2000k", "4000k"))
+}
+
+
+class Profile:
+    """Encode settings and ingest details for one streaming platform"""
+
+    def __init__(self, name, label, rtmp_url, file_args, folder_args, video_extensions, output_options=()):
+        self.name = name
+        self.label = label
+        self.rtmp_url = rtmp_url
+        self.file_args = file_args
+        self.folder_args = folder_args
+        self.video_extensions = video_extensions
+        self.output_options = list(output_options)  # FLV muxer/protocol options for a direct single output
+
+    def encode_args(self, folder=False):
+        return list(self.folder_args if folder else self.file_args)
+
+    def output_url(self, stream_key, rtmp_url=None):
+        """Join the ingest URL (the platform default unless given) and stream key"""
+        base = rtmp_url or self.rtmp_url
+        if not base:
+            raise ValueError(f"{self.label} needs an RTMP URL")
+        return f"{base}{stream_key}"
+
+
+PROFILES = {
+    "yt": Profile(
+        name="yt",
+        label="YouTube",
+        rtmp_url=YOUTUBE_RTMP_URL,
+        file_args=[
+            "-c:v", "libx264", "-preset", "superfast", "-b:v", "4500k", "-maxrate", "4500k", "-bufsize", "9000k",
+            "-vf", "scale=1920:1080", "-r", "30", "-pix_fmt", "yuv420p", "-g", "60",
+            *AUDIO_ARGS,
+        ],
+        folder_args=[
+            "-c:v", "libx264", "-preset", "veryfast", "-b:v", "4000k", "-maxrate", "4000k", "-bufsize", "8000k",
+            "-vf", "scale=1280:720,format=yuv420p", "-g", "60",
+            *AUDIO_ARGS,
+        ],
+        video_extensions=('.mp4', '.avi', '.mov', '.mkv', '.flv', '.ts', '.wmv'),
+    ),
+    # crop=in_h*9/16:in_h crops the center to vertical, then we scale to 720:1280
+    "ig": Profile(
+        name="ig",
+        label="Instagram",
+        rtmp_url=None,
+        file_args=[
+            "-vf", "crop=in_h*9/16:in_h,scale=720:1280",
+            "-c:v", "libx264", "-preset", "superfast", "-b:v", "2500k", "-maxrate", "2500k", "-bufsize", "5000k",
+            "-pix_fmt", "yuv420p", "-g", "60",
+            *AUDIO_ARGS,
+        ],
+        folder_args=[
+            "-vf", "crop=in_h*9/16:in_h,scale=720:1280",
+            "-c:v", "libx264", "-preset", "superfast", "-b:v", "3000k", "-maxrate", "3000k", "-bufsize", "6000k",
+            "-pix_fmt", "yuv420p", "-g", "60",
+            *AUDIO_ARGS,
+        ],
+        video_extensions=('.mp4', '.mov', '.avi', '.mkv', '.flv', '.ts'),
+    ),
+    # The exact encodes the YTstream/IGstream scripts ran before the shared engine:
+    # source resolution and frame rate kept, no crop, and -rtmp_live live for Instagram
+    "yt-script": Profile(
+        name="yt-script",
+        label="YouTube",
+        rtmp_url=YOUTUBE_RTMP_URL,
+        file_args=SCRIPT_ARGS["yt"],
+        folder_args=SCRIPT_ARGS["yt"],
+        video_extensions=('.mp4', '.avi', '.mov', '.mkv', '.flv', '.ts', '.wmv'),
+    ),
+    "ig-script": Profile(
+        name="ig-script",
+        label="Instagram",
+        rtmp_url=None,
+        file_args=SCRIPT_ARGS["ig"],
+        folder_args=SCRIPT_ARGS["ig"],
+        video_extensions=('.mp4', '.mov', '.avi', '.mkv', '.flv', '.ts'),
+        output_options=["-rtmp_live", "live"],
+    ),
+}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown profile '{name}' (choose from {', '.join(PROFILES)})") from None
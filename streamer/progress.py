@@ -0,0 +1,94 @@
+"""
+Progress telemetry
+Parses ffmpeg's machine-readable `-progress` output (key=value lines, one
+block per stats period ending in progress=continue|end) into a metrics
+record that is updated in place.
+"""
+
+import time
+
+# Global options that send progress blocks to stdout and silence the \r stats line
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+READ_SIZE = 4096
+
+
+def _number(value, suffix=b""):
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None  # N/A while ffmpeg has nothing to report yet
+
+
+class Progress:
+    """Latest progress values of one ffmpeg process.
+
+    bitrate is in kbit/s, out_time in seconds of output written, speed the
+    encode speed as a multiple of real time. updated is the time.monotonic()
+    of the last complete block, or None before the first one.
+    """
+
+    __slots__ = ("frame", "fps", "bitrate", "total_size", "out_time", "dup_frames",
+                 "drop_frames", "speed", "status", "updated")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frame = 0
+        self.fps = 0.0
+        self.bitrate = 0.0
+        self.total_size = 0
+        self.out_time = 0.0
+        self.dup_frames = 0
+        self.drop_frames = 0
+        self.speed = 0.0
+        self.status = None
+        self.updated = None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def summary(self):
+        return (f"frame={self.frame} fps={self.fps:.1f} bitrate={self.bitrate:.0f}kbits/s "
+                f"speed={self.speed:.2f}x dup={self.dup_frames} drop={self.drop_frames}")
+
+
+class ProgressParser:
+    """Incremental parser feeding raw -progress bytes into a Progress record"""
+
+    def __init__(self, progress=None):
+        self.progress = progress if progress is not None else Progress()
+        self._buffer = b""
+
+    def feed(self, chunk):
+        """Consume a chunk of bytes; returns the number of blocks it completed"""
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        progress = self.progress
+        blocks = 0
+        for line in lines:
+            key, _, value = line.strip().partition(b"=")
+            if key == b"frame":
+                progress.frame = int(value) if value.isdigit() else progress.frame
+            elif key == b"fps":
+                progress.fps = _number(value) or 0.0
+            elif key == b"bitrate":
+                progress.bitrate = _number(value, b"kbits/s") or 0.0
+            elif key == b"total_size":
+                progress.total_size = int(value) if value.isdigit() else progress.total_size
+            elif key == b"out_time_us":
+                # out_time_ms is a legacy alias that is also in microseconds
+                progress.out_time = int(value) / 1e6 if value.lstrip(b"-").isdigit() else progress.out_time
+            elif key == b"dup_frames":
+                progress.dup_frames = int(value) if value.isdigit() else progress.dup_frames
+            elif key == b"drop_frames":
+                progress.drop_frames = int(value) if value.isdigit() else progress.drop_frames
+            elif key == b"speed":
+                progress.speed = _number(value.strip(), b"x") or 0.0
+            elif key == b"progress":
+                progress.status = value.decode()
+                progress.updated = time.monotonic()
+                blocks += 1
+        return blocks
@@ -0,0 +1,108 @@
+"""
+Failure recovery
+Sorts an ffmpeg failure into a class from its last stderr lines, so each
+class gets a recovery that can actually help instead of one fixed retry:
+
+    input       the file is corrupt, truncated or unreadable: retrying it
+                cannot help, so folder items are skipped (quarantined until
+                the file changes or QUARANTINE_SECONDS pass)
+    network     the ingest refused, reset or timed out: reconnect at once,
+                then with exponential backoff and jitter while it keeps failing
+    resource    out of memory, disk or file handles: reduce load (adaptive
+                step down, pause cache encodes) and wait RESOURCE_DELAY
+    unknown     anything else: the engine's fixed delays, as before
+"""
+
+import random
+import re
+
+INPUT, NETWORK, RESOURCE, UNKNOWN = "input", "network", "resource", "unknown"
+CLASSES = (INPUT, NETWORK, RESOURCE, UNKNOWN)
+
+ERROR_LINES = 30            # stderr lines kept per session for classification
+BACKOFF_FIRST = 0.25        # seconds before the first reconnect (before jitter)
+BACKOFF_MAX = 30
+HEALTHY_AFTER = 60          # a session that ran this long resets the backoff
+RESOURCE_DELAY = 10
+INPUT_RETRY_DELAY = 60      # a single broken file can only be retried; not too often
+QUARANTINE_SECONDS = 600    # folder items that failed to read are retried after this
+
+# strerror texts as ffmpeg prints them, at the end of a line ("...: Cannot allocate memory")
+RESOURCE_PATTERN = re.compile(
+    r"(?:: |-- |^)(?:Cannot allocate memory|Out of memory|No space left on device|Too many open files|"
+    r"Disk quota exceeded)\.?$|malloc of size \d+ failed")
+NETWORK_PATTERN = re.compile(
+    r"Connection refused|Connection reset by peer|Connection timed out|Operation timed out|Broken pipe|"
+    r"Resource temporarily unavailable|Network is unreachable|No route to host|Failed to resolve hostname|"
+    r"Name or service not known|Temporary failure in name resolution|Error writing trailer|"
+    r"av_interleaved_write_frame\(\)|RTMP_\w+|Server returned \d|Cannot open connection|"
+    r"Error in the pull function|Failed to connect")
+# Fatal reading/demuxing errors only: mid-stream decode warnings ("Error while decoding",
+# "corrupt decoded frame") also show up when a connection dies and prove nothing
+INPUT_PATTERN = re.compile(
+    r"Invalid data found when processing input|moov atom not found|partial file$|"
+    r"could not find codec parameters|does not contain any stream|Error opening input|"
+    r"Unknown input format|Failed to open file")
+# Protocol lines only: the flv muxer also logs harmless lines when its output closes
+# ("Failed to update header with correct duration."), whatever ended the stream
+OUTPUT_PREFIXES = ("rtmp://", "rtmps://", "udp://", "tcp://", "srt://", "[rtmp", "[tcp", "[tls")
+
+
+def line_class(line, inputs=()):
+    """(class, decisive) of one stderr line; decisive when it names one of the inputs or outputs"""
+    if line.startswith(OUTPUT_PREFIXES):
+        return NETWORK, True    # about the connection, whatever the error text says
+    if RESOURCE_PATTERN.search(line):
+        return RESOURCE, True
+    if any(path and line.startswith(f"{path}:") for path in inputs):
+        return INPUT, True
+    if NETWORK_PATTERN.search(line):
+        return NETWORK, True
+    if INPUT_PATTERN.search(line):
+        return INPUT, False
+    return UNKNOWN, False
+
+
+def classify(lines, inputs=()):
+    """(class, explaining line) of an ffmpeg failure from its last stderr lines.
+
+    inputs are the paths it read; ffmpeg prefixes errors about a file with
+    its name ("video.mp4: Invalid data found..."), which settles the class.
+    Decode warnings alone do not make an input failure when a network
+    error is also present, since damaged frames are often logged on the
+    way down.
+    """
+    found = {}
+    for line in lines:
+        failure, decisive = line_class(line, inputs)
+        if failure != UNKNOWN:
+            found[(failure, decisive)] = line
+    for key in ((RESOURCE, True), (INPUT, True), (NETWORK, True), (INPUT, False)):
+        if key in found:
+            return key[0], found[key]
+    return UNKNOWN, lines[-1] if lines else None
+
+
+class Backoff:
+    """Exponential reconnect delays with jitter, starting near zero.
+
+    Delays double per consecutive failure up to maximum; each is drawn from
+    its upper half so channels that dropped together do not reconnect in
+    lockstep. A session that ran for healthy_after seconds resets it.
+    """
+
+    def __init__(self, first=BACKOFF_FIRST, maximum=BACKOFF_MAX, healthy_after=HEALTHY_AFTER):
+        self.first = first
+        self.maximum = maximum
+        self.healthy_after = healthy_after
+        self.attempts = 0
+
+    def ran(self, seconds):
+        """Report how long the last session lasted"""
+        if seconds >= self.healthy_after:
+            self.attempts = 0
+
+    def next(self):
+        delay = min(self.maximum, self.first * 2 ** self.attempts)
+        self.attempts += 1
+        return delay / 2 + random.uniform(0, delay / 2)
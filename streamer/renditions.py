@@ -0,0 +1,69 @@
+"""
+Renditions
+Several profiles (e.g. 1920x1080 landscape for YouTube and 720x1280 vertical
+for Instagram) encoded from one decode with a split filter graph.
+
+All renditions are written as streams of a single ffmpeg output: video
+stream i belongs to rendition i and the audio track is shared. The tee
+muxer then hands each destination only its own streams (select=v:i,a:0).
+"""
+
+# Output options that configure the audio encoder rather than the video one
+AUDIO_OPTIONS = {"-c:a", "-b:a", "-ar", "-ac", "-acodec"}
+
+
+class Rendition:
+    """One profile's encode and the destinations that receive it"""
+
+    def __init__(self, profile, urls):
+        self.profile = profile
+        self.urls = [urls] if isinstance(urls, str) else list(urls)
+
+
+def split_args(args):
+    """Split profile encode args into (video filter, video options, audio options)"""
+    video_filter = None
+    video, audio = [], []
+    for option, value in zip(args[::2], args[1::2]):
+        if option in ("-vf", "-filter:v"):
+            video_filter = value
+        elif option in AUDIO_OPTIONS:
+            audio += [option, value]
+        else:
+            video += [option, value]
+    return video_filter, video, audio
+
+
+def indexed_video_args(args, index):
+    """Rewrite video options so they only apply to output video stream index"""
+    result = []
+    for option, value in zip(args[::2], args[1::2]):
+        name = option.split(":")[0]
+        result += [f"{name}:v:{index}", value]
+    return result
+
+
+def combined_encode_args(renditions, folder=False):
+    """ffmpeg output args encoding every rendition from a single decode"""
+    count = len(renditions)
+    branches = []
+    video_options = []
+    audio_options = None
+    for index, rendition in enumerate(renditions):
+        video_filter, video, audio = split_args(rendition.profile.encode_args(folder))
+        branches.append(f"[s{index}]{video_filter or 'null'}[v{index}]")
+        video_options += indexed_video_args(video, index)
+        if audio_options is None:
+            audio_options = audio
+
+    graph = f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count)) + ";" + ";".join(branches)
+    maps = []
+    for index in range(count):
+        maps += ["-map", f"[v{index}]"]
+    maps += ["-map", "0:a:0?"]
+    return ["-filter_complex", graph, *maps, *video_options, *audio_options]
+
+
+def stream_selects(renditions):
+    """Tee select= specifier for every destination, in flattened URL order"""
+    return [f"v:{index},a:0" for index, rendition in enumerate(renditions) for _ in rendition.urls]
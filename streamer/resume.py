@@ -0,0 +1,80 @@
+"""
+Resume points
+Remembers where each channel's playhead is (file and seconds into it, from
+ffmpeg's progress out_time) so reconnects and application restarts pick up
+in the same file and playlist slot instead of from the top.
+
+One small JSON file per channel, rewritten atomically at most every
+SAVE_INTERVAL seconds, keeps the cost to a few writes a minute.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+RESUME_DIR = os.path.join("cache", "resume")
+SAVE_INTERVAL = 5       # seconds between writes of a moving playhead
+END_MARGIN = 2          # a position this close to the end counts as finished
+
+
+class ResumePoint:
+    """Last known playhead of one channel, persisted under directory"""
+
+    def __init__(self, directory, channel_key):
+        self.path = os.path.join(directory, hashlib.sha1(channel_key.encode()).hexdigest()[:16] + ".json")
+        self.channel_key = channel_key
+        self.file = None
+        self.position = 0.0
+        self._saved = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """(file, position) saved by a previous run, or (None, 0.0)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None, 0.0
+        if data.get("channel") != self.channel_key or not data.get("file"):
+            return None, 0.0
+        self.file, self.position = data["file"], float(data.get("position") or 0.0)
+        return self.file, self.position
+
+    def update(self, file, position, force=False):
+        """Record the playhead; written to disk when forced or SAVE_INTERVAL has passed"""
+        with self._lock:
+            self.file, self.position = file, max(0.0, position)
+            now = time.monotonic()
+            if not force and now - self._saved < SAVE_INTERVAL:
+                return
+            self._saved = now
+            data = {"channel": self.channel_key, "file": file, "position": round(self.position, 3),
+                    "updated": round(time.time())}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # losing a resume point only costs replaying a little
+
+    def flush(self):
+        if self.file:
+            self.update(self.file, self.position, force=True)
+
+
+def resume_position(position, duration):
+    """Where to seek in a file of duration: position, or 0 if there is none or it (nearly) finished"""
+    if not position or position < 0 or (duration and position >= duration - END_MARGIN):
+        return 0.0
+    return position
+
+
+def format_position(seconds):
+    """3725.4 -> '1:02:05'"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
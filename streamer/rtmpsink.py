@@ -0,0 +1,338 @@
+"""
+RTMP sink
+Minimal local RTMP ingest that stands in for YouTube/Instagram when
+benchmarking (see bench.py). It accepts ffmpeg publishers, answers just
+enough of the RTMP command set for them to start publishing, and records
+the arrival time, timestamp and size of every audio and video message.
+Media is discarded.
+
+    sink = RTMPSink(port=0)
+    sink.start()
+    engine = StreamEngine(profile, source, sink.url(), ...)
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+
+HANDSHAKE_SIZE = 1536
+CHUNK_SIZE = 128            # RTMP default until a peer announces otherwise
+SERVER_CHUNK_SIZE = 4096
+WINDOW_ACK_SIZE = 2500000
+
+MSG_SET_CHUNK_SIZE = 1
+MSG_ACK = 3
+MSG_USER_CONTROL = 4
+MSG_WINDOW_ACK_SIZE = 5
+MSG_SET_PEER_BANDWIDTH = 6
+MSG_AUDIO = 8
+MSG_VIDEO = 9
+MSG_DATA_AMF0 = 18
+MSG_COMMAND_AMF3 = 17
+MSG_COMMAND_AMF0 = 20
+
+STREAM_ID = 1
+
+
+def amf_encode(value):
+    """AMF0 encoding of None, bool, numbers, str and dict"""
+    if value is None:
+        return b"\x05"
+    if isinstance(value, bool):
+        return b"\x01" + bytes([value])
+    if isinstance(value, (int, float)):
+        return b"\x00" + struct.pack(">d", value)
+    if isinstance(value, str):
+        data = value.encode()
+        return b"\x02" + struct.pack(">H", len(data)) + data
+    if isinstance(value, dict):
+        body = b"".join(struct.pack(">H", len(key.encode())) + key.encode() + amf_encode(item)
+                        for key, item in value.items())
+        return b"\x03" + body + b"\x00\x00\x09"
+    raise TypeError(f"Cannot AMF0-encode {type(value).__name__}")
+
+
+def amf_decode(data, offset=0):
+    """Decode one AMF0 value at offset; returns (value, next offset)"""
+    marker = data[offset]
+    offset += 1
+    if marker == 0x00:
+        return struct.unpack_from(">d", data, offset)[0], offset + 8
+    if marker == 0x01:
+        return bool(data[offset]), offset + 1
+    if marker == 0x02:
+        length = struct.unpack_from(">H", data, offset)[0]
+        return data[offset + 2:offset + 2 + length].decode(errors="replace"), offset + 2 + length
+    if marker == 0x0C:
+        length = struct.unpack_from(">I", data, offset)[0]
+        return data[offset + 4:offset + 4 + length].decode(errors="replace"), offset + 4 + length
+    if marker in (0x05, 0x06):
+        return None, offset
+    if marker in (0x03, 0x08):
+        if marker == 0x08:
+            offset += 4  # ECMA array count, unreliable; the end marker terminates it
+        result = {}
+        while True:
+            length = struct.unpack_from(">H", data, offset)[0]
+            offset += 2
+            if length == 0 and data[offset] == 0x09:
+                return result, offset + 1
+            key = data[offset:offset + length].decode(errors="replace")
+            result[key], offset = amf_decode(data, offset + length)
+    if marker == 0x0A:
+        count = struct.unpack_from(">I", data, offset)[0]
+        offset += 4
+        items = []
+        for _ in range(count):
+            item, offset = amf_decode(data, offset)
+            items.append(item)
+        return items, offset
+    if marker == 0x0B:
+        return struct.unpack_from(">d", data, offset)[0], offset + 10
+    raise ValueError(f"Unsupported AMF0 marker 0x{marker:02x}")
+
+
+def amf_decode_all(data):
+    values, offset = [], 0
+    while offset < len(data):
+        value, offset = amf_decode(data, offset)
+        values.append(value)
+    return values
+
+
+def is_sequence_header(kind, payload):
+    """AVC/AAC decoder configuration rather than media"""
+    if len(payload) < 2:
+        return True
+    if kind == "video":
+        return payload[0] & 0x0F == 7 and payload[1] == 0
+    return payload[0] >> 4 == 10 and payload[1] == 0
+
+
+class Session:
+    """One publisher connection and the media it delivered.
+
+    packets holds (arrival, kind, timestamp ms, size, keyframe) for every
+    audio/video message except codec configuration; arrival is
+    time.monotonic().
+    """
+
+    def __init__(self, index, peer):
+        self.index = index
+        self.peer = peer
+        self.connected = time.monotonic()
+        self.closed = None
+        self.app = None
+        self.stream_key = None
+        self.metadata = None
+        self.packets = []
+        self.bytes = 0
+
+    def as_dict(self):
+        return {
+            "index": self.index, "app": self.app, "stream_key": self.stream_key,
+            "packets": len(self.packets), "bytes": self.bytes,
+            "duration": round((self.closed or time.monotonic()) - self.connected, 3),
+        }
+
+
+class Connection:
+    """RTMP chunk stream reader/writer for one client socket"""
+
+    def __init__(self, sock, session, log):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.session = session
+        self.log = log
+        self.in_chunk_size = CHUNK_SIZE
+        self.ack_window = None
+        self.received = 0
+        self.acked = 0
+        self.chunk_streams = {}
+
+    def read(self, size):
+        data = self.reader.read(size)
+        if len(data) < size:
+            raise ConnectionError("publisher disconnected")
+        self.received += size
+        if self.ack_window and self.received - self.acked >= self.ack_window:
+            self.acked = self.received
+            self.send(2, MSG_ACK, 0, struct.pack(">I", self.received & 0xFFFFFFFF))
+        return data
+
+    def handshake(self):
+        c0c1 = self.read(1 + HANDSHAKE_SIZE)
+        s1 = struct.pack(">II", 0, 0) + os.urandom(HANDSHAKE_SIZE - 8)
+        self.sock.sendall(b"\x03" + s1 + c0c1[1:])  # S0, S1, S2 (echo of C1)
+        self.read(HANDSHAKE_SIZE)  # C2
+
+    def send(self, csid, msg_type, stream_id, payload, timestamp=0):
+        header = bytes([csid]) + timestamp.to_bytes(3, "big") + len(payload).to_bytes(3, "big")
+        header += bytes([msg_type]) + stream_id.to_bytes(4, "little")
+        chunks = [payload[i:i + SERVER_CHUNK_SIZE] for i in range(0, len(payload), SERVER_CHUNK_SIZE)] or [b""]
+        self.sock.sendall(header + chunks[0] + b"".join(bytes([0xC0 | csid]) + chunk for chunk in chunks[1:]))
+
+    def command(self, name, transaction, *values, stream_id=0):
+        payload = amf_encode(name) + amf_encode(transaction) + b"".join(amf_encode(value) for value in values)
+        self.send(3 if stream_id == 0 else 5, MSG_COMMAND_AMF0, stream_id, payload)
+
+    def read_message(self):
+        """Read chunks until one message is complete; returns (type, stream id, timestamp, payload)"""
+        while True:
+            first = self.read(1)[0]
+            fmt, csid = first >> 6, first & 0x3F
+            if csid == 0:
+                csid = 64 + self.read(1)[0]
+            elif csid == 1:
+                extra = self.read(2)
+                csid = 64 + extra[0] + extra[1] * 256
+            state = self.chunk_streams.setdefault(csid, {
+                "timestamp": 0, "field": 0, "length": 0, "type": 0, "stream_id": 0,
+                "extended": False, "payload": bytearray(),
+            })
+
+            if fmt < 3:
+                header = self.read((11, 7, 3)[fmt])
+                field = int.from_bytes(header[0:3], "big")
+                state["extended"] = field == 0xFFFFFF
+                if state["extended"]:
+                    field = int.from_bytes(self.read(4), "big")
+                if fmt <= 1:
+                    state["length"] = int.from_bytes(header[3:6], "big")
+                    state["type"] = header[6]
+                if fmt == 0:
+                    state["stream_id"] = int.from_bytes(header[7:11], "little")
+                # fmt 0 carries an absolute timestamp, 1 and 2 a delta
+                state["timestamp"] = field if fmt == 0 else state["timestamp"] + field
+                state["field"] = field
+            else:
+                if state["extended"]:
+                    self.read(4)
+                if not state["payload"]:
+                    # A new message in a type 3 chunk repeats the previous delta
+                    state["timestamp"] += state["field"]
+
+            payload = state["payload"]
+            payload += self.read(min(self.in_chunk_size, state["length"] - len(payload)))
+            if len(payload) >= state["length"]:
+                state["payload"] = bytearray()
+                return state["type"], state["stream_id"], state["timestamp"] & 0xFFFFFFFF, bytes(payload)
+
+    def serve(self):
+        self.handshake()
+        while True:
+            msg_type, stream_id, timestamp, payload = self.read_message()
+            if msg_type in (MSG_AUDIO, MSG_VIDEO):
+                kind = "video" if msg_type == MSG_VIDEO else "audio"
+                self.session.bytes += len(payload)
+                if not is_sequence_header(kind, payload):
+                    keyframe = kind == "video" and payload[0] >> 4 == 1
+                    self.session.packets.append((time.monotonic(), kind, timestamp, len(payload), keyframe))
+            elif msg_type == MSG_SET_CHUNK_SIZE:
+                self.in_chunk_size = struct.unpack(">I", payload[:4])[0] & 0x7FFFFFFF
+            elif msg_type == MSG_WINDOW_ACK_SIZE:
+                self.ack_window = struct.unpack(">I", payload[:4])[0]
+            elif msg_type == MSG_DATA_AMF0:
+                values = amf_decode_all(payload)
+                if values and values[0] == "@setDataFrame":
+                    values = values[1:]
+                if len(values) > 1 and values[0] == "onMetaData":
+                    self.session.metadata = values[1]
+            elif msg_type in (MSG_COMMAND_AMF0, MSG_COMMAND_AMF3):
+                if msg_type == MSG_COMMAND_AMF3:
+                    payload = payload[1:]
+                self.on_command(amf_decode_all(payload))
+
+    def on_command(self, values):
+        if not values:
+            return
+        name = values[0]
+        transaction = values[1] if len(values) > 1 else 0
+        if name == "connect":
+            params = values[2] if len(values) > 2 and isinstance(values[2], dict) else {}
+            self.session.app = params.get("app")
+            self.send(2, MSG_WINDOW_ACK_SIZE, 0, struct.pack(">I", WINDOW_ACK_SIZE))
+            self.send(2, MSG_SET_PEER_BANDWIDTH, 0, struct.pack(">IB", WINDOW_ACK_SIZE, 2))
+            self.send(2, MSG_SET_CHUNK_SIZE, 0, struct.pack(">I", SERVER_CHUNK_SIZE))
+            self.command("_result", transaction, {"fmsVer": "FMS/3,0,1,123", "capabilities": 31}, {
+                "level": "status", "code": "NetConnection.Connect.Success",
+                "description": "Connection succeeded.", "objectEncoding": 0,
+            })
+        elif name == "createStream":
+            self.command("_result", transaction, None, STREAM_ID)
+        elif name == "publish":
+            self.session.stream_key = values[3] if len(values) > 3 else None
+            self.send(2, MSG_USER_CONTROL, 0, struct.pack(">HI", 0, STREAM_ID))  # StreamBegin
+            self.command("onStatus", 0, None, {
+                "level": "status", "code": "NetStream.Publish.Start",
+                "description": f"{self.session.stream_key} is now published.",
+            }, stream_id=STREAM_ID)
+        elif name in ("releaseStream", "FCPublish", "FCUnpublish") and transaction:
+            self.command("_result", transaction, None, None)
+
+
+class RTMPSink:
+    """Listens on host:port and records every publishing session"""
+
+    def __init__(self, host="127.0.0.1", port=1935, log=None):
+        self.host = host
+        self.port = port
+        self.log = log or (lambda message: None)
+        self.sessions = []
+        self._server = None
+        self._sockets = set()
+        self._lock = threading.Lock()
+
+    def url(self, app="live2", key="bench"):
+        return f"rtmp://{self.host}:{self.port}/{app}/{key}"
+
+    def start(self):
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+        self.drop()
+
+    def drop(self):
+        """Cut every open publisher connection, like a network failure would"""
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _accept(self):
+        while self._server:
+            try:
+                sock, peer = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                session = Session(len(self.sessions), peer)
+                self.sessions.append(session)
+                self._sockets.add(sock)
+            threading.Thread(target=self._serve, args=(sock, session), daemon=True).start()
+
+    def _serve(self, sock, session):
+        self.log(f"RTMP sink: publisher {session.index} connected from {session.peer[0]}:{session.peer[1]}")
+        try:
+            Connection(sock, session, self.log).serve()
+        except (ConnectionError, OSError, ValueError, struct.error, IndexError) as e:
+            if not isinstance(e, ConnectionError):
+                self.log(f"RTMP sink: publisher {session.index} protocol error: {e}")
+        finally:
+            session.closed = time.monotonic()
+            with self._lock:
+                self._sockets.discard(sock)
+            sock.close()
+            self.log(f"RTMP sink: publisher {session.index} disconnected "
+                     f"({len(session.packets)} packets, {session.bytes} bytes)")
@@ -0,0 +1,242 @@
+"""
+Multi-channel supervisor
+Runs many 24x7 channels from one process, splitting a machine-wide CPU
+budget between them so the encoders never oversubscribe the box.
+
+Manifest (JSON):
+
+    {
+        "cores": 16,
+        "channels": [
+            {"name": "lofi", "profile": "yt", "folder": "/srv/lofi", "key": "..."},
+            {"name": "news", "profile": "yt", "file": "/srv/news.mp4", "key": "...",
+             "renditions": [{"profile": "ig", "url": "rtmps://.../key"}], "weight": 2}
+        ]
+    }
+
+Channels accept the same settings as `python -m streamer run`: profile,
+file or folder, key, url, also, renditions, gapless, cache, calibrate,
+adaptive, passthrough and stall_timeout (seconds; 0 disables the stall
+watchdog). weight defaults to the number of renditions the channel
+encodes. An optional top-level "ffmpeg" picks the executable for every
+channel.
+"""
+
+import json
+import os
+import threading
+import time
+
+from .engine import StreamEngine
+from .profiles import get_profile
+from .renditions import Rendition
+from .watchdog import STALL_TIMEOUT
+
+REPORT_INTERVAL = 60
+
+
+def available_cpus():
+    """CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cpus(weights, cpus):
+    """Split cpus between channels by weight.
+
+    Returns (x264 threads, cpu ids) per channel. Every channel gets at least
+    one core and no two channels share one, unless there are more channels
+    than cores: then each gets a single core, assigned round-robin.
+    """
+    if len(weights) > len(cpus):
+        return [(1, [cpus[index % len(cpus)]]) for index in range(len(weights))]
+
+    # Whole cores by largest remainder, at least one each
+    total = sum(weights)
+    shares = [len(cpus) * weight / total for weight in weights]
+    counts = [max(1, int(share)) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda index: shares[index] - int(shares[index]), reverse=True)
+    for index in by_remainder[:max(0, len(cpus) - sum(counts))]:
+        counts[index] += 1
+    while sum(counts) > len(cpus):
+        # Minimum cores handed to light channels come out of the heaviest
+        counts[counts.index(max(counts))] -= 1
+
+    plan = []
+    start = 0
+    for count in counts:
+        plan.append((count, cpus[start:start + count]))
+        start += count
+    assert start <= len(cpus), "channels were planned overlapping cores"
+    return plan
+
+
+def channel_engine(channel, **engine_kwargs):
+    """Build a StreamEngine from one manifest channel (or CLI arguments)"""
+    profile = get_profile(channel.get("profile", "yt"))
+    if not channel.get("key"):
+        raise ValueError("A stream key is required")
+    folder = channel.get("folder")
+    source = folder or channel.get("file")
+    if not source:
+        raise ValueError("Either a file or a folder is required")
+    if folder and not os.path.isdir(source):
+        raise ValueError(f"Folder not found: {source}")
+    if not folder and not os.path.isfile(source):
+        raise ValueError(f"Video file not found: {source}")
+
+    outputs = [profile.output_url(channel["key"], channel.get("url")), *channel.get("also", [])]
+    renditions = None
+    if channel.get("renditions"):
+        # Group extra destinations by profile; each profile is encoded once
+        renditions = [Rendition(profile, outputs)]
+        for extra in channel["renditions"]:
+            extra_profile = get_profile(extra["profile"])
+            rendition = next((r for r in renditions if r.profile is extra_profile), None)
+            if rendition:
+                rendition.urls.append(extra["url"])
+            else:
+                renditions.append(Rendition(extra_profile, [extra["url"]]))
+
+    return StreamEngine(
+        profile, source, outputs, renditions=renditions, folder=bool(folder),
+        gapless=channel.get("gapless", True), use_cache=channel.get("cache", True),
+        calibrate=channel.get("calibrate", False), adaptive=channel.get("adaptive", False),
+        passthrough=channel.get("passthrough", False), stall_timeout=channel.get("stall_timeout", STALL_TIMEOUT),
+        **engine_kwargs
+    )
+
+
+class Channel:
+    """Health bookkeeping for one supervised engine"""
+
+    def __init__(self, name, threads, cpus, log=print):
+        self.name = name
+        self.log = log
+        self.threads = threads
+        self.cpus = cpus
+        self.engine = None
+        self.state = "starting"
+        self.current_file = None
+        self.last_error = None
+        self.started_at = None
+
+    def on_status(self, message):
+        if message.startswith("Streaming"):
+            self.state = "live"
+        elif message.startswith("Reconnecting"):
+            self.state = "reconnecting"
+        elif message == "Stopped" and self.state != "error":
+            self.state = "stopped"
+
+    def on_log(self, message):
+        self.log(f"[{self.name}] {message}")
+
+    def on_file(self, filename):
+        self.current_file = filename
+
+    def on_error(self, message):
+        self.state = "error"
+        self.last_error = message
+        self.on_log(message)
+
+    def health(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "restarts": self.engine.restarts if self.engine else 0,
+            "stalls": self.engine.watchdog.stalls if self.engine and self.engine.watchdog else 0,
+            "failures": dict(self.engine.failures) if self.engine else {},
+            "current_file": self.current_file,
+            "uptime": round(time.time() - self.started_at) if self.started_at else 0,
+            "threads": self.threads,
+            "cpus": self.cpus,
+            "last_error": self.last_error,
+        }
+
+
+class Supervisor:
+    """Starts, watches and stops every channel of a manifest"""
+
+    def __init__(self, manifest, cores=None, health_file=None, log=print):
+        self.manifest = manifest
+        self.health_file = health_file
+        self.log = log
+        self.channels = []
+        self._stop_event = threading.Event()
+
+        configs = manifest.get("channels", [])
+        if not configs:
+            raise ValueError("The manifest has no channels")
+        cpus = available_cpus()
+        budget = cores or manifest.get("cores") or len(cpus)
+        cpus = cpus[:budget]
+        weights = [c.get("weight", 1 + len(c.get("renditions", []))) for c in configs]
+
+        for index, (config, (threads, channel_cpus)) in enumerate(zip(configs, plan_cpus(weights, cpus))):
+            channel = Channel(config.get("name", f"channel-{index + 1}"), threads, channel_cpus, log)
+            channel.engine = channel_engine(
+                config,
+                threads=threads,
+                cpus=channel_cpus,
+                ffmpeg=manifest.get("ffmpeg", "ffmpeg"),
+                on_log=channel.on_log,
+                on_status=channel.on_status,
+                on_file=channel.on_file,
+                on_error=channel.on_error,
+            )
+            self.channels.append(channel)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def start(self):
+        for channel in self.channels:
+            self.log(f"[{channel.name}] Starting with {channel.threads} encoder thread(s) on CPUs {channel.cpus}")
+            channel.started_at = time.time()
+            channel.engine.start()
+
+    def stop(self):
+        """Stop every channel in parallel"""
+        self._stop_event.set()
+        stoppers = [threading.Thread(target=channel.engine.stop) for channel in self.channels]
+        for thread in stoppers:
+            thread.start()
+        for thread in stoppers:
+            thread.join()
+
+    def running(self):
+        return any(channel.engine.streaming for channel in self.channels)
+
+    def health(self):
+        channels = [channel.health() for channel in self.channels]
+        return {
+            "time": round(time.time()),
+            "total": len(channels),
+            "live": sum(1 for c in channels if c["state"] == "live"),
+            "restarts": sum(c["restarts"] for c in channels),
+            "channels": channels,
+        }
+
+    def report(self):
+        health = self.health()
+        problems = [f"{c['name']}={c['state']}" for c in health["channels"] if c["state"] != "live"]
+        self.log(f"Health: {health['live']}/{health['total']} live, {health['restarts']} restart(s)"
+                 + (f"; {', '.join(problems)}" if problems else ""))
+        if self.health_file:
+            tmp = self.health_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(health, f, indent=2)
+            os.replace(tmp, self.health_file)
+
+    def run(self, report_interval=REPORT_INTERVAL):
+        """Start all channels and report health until stopped"""
+        self.start()
+        while not self._stop_event.wait(report_interval):
+            self.report()
+            if not self.running():
+                break
+        self.report()
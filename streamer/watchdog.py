@@ -0,0 +1,63 @@
+"""
+Stall watchdog
+ffmpeg can stay alive for minutes without streaming anything: a half-open
+RTMP socket blocks its writes, a hung network share blocks its reads. The
+process never exits, so restarting on exit never fires. The watchdog
+follows the -progress output instead (out_time, total_size and when the
+last block arrived) and declares a stall once neither has moved for
+STALL_TIMEOUT seconds, so the engine can kill the session and start over.
+"""
+
+import time
+
+STALL_TIMEOUT = 30      # seconds without output progress before ffmpeg counts as hung
+CHECK_INTERVAL = 1      # seconds between checks
+
+
+class StallWatchdog:
+    """Stall detection over one engine's Progress record.
+
+    arm() when an ffmpeg session starts (the timeout also covers its start-up)
+    and disarm() when it ends; check() is called periodically and returns
+    the seconds since output last advanced once that exceeds timeout, after
+    which the watchdog stays disarmed until the next session.
+    """
+
+    def __init__(self, progress, timeout=STALL_TIMEOUT):
+        self.progress = progress
+        self.timeout = timeout
+        self.stalls = 0
+        self.last_detection = None  # seconds from the last output progress to the last detection
+        self._armed_at = None
+        self._mark = None
+        self._advanced = None
+
+    def arm(self, now=None):
+        self._armed_at = now if now is not None else time.monotonic()
+        self._mark = (self.progress.out_time, self.progress.total_size)
+        self._advanced = self._armed_at
+
+    def disarm(self):
+        self._armed_at = None
+
+    @property
+    def armed(self):
+        return self._armed_at is not None
+
+    def check(self, now=None):
+        """Seconds without output progress if the session has stalled, else None"""
+        if self._armed_at is None:
+            return None
+        now = now if now is not None else time.monotonic()
+        progress = self.progress
+        mark = (progress.out_time, progress.total_size)
+        if mark != self._mark:
+            self._mark = mark
+            self._advanced = max(self._armed_at, progress.updated or now)
+        idle = now - self._advanced
+        if idle < self.timeout:
+            return None
+        self.stalls += 1
+        self.last_detection = idle
+        self._armed_at = None
+        return idle
@@ -0,0 +1,259 @@
+"""
+Folder watcher
+Keeps a sorted playlist of a folder's videos up to date incrementally, so
+the playout loop sees additions, removals and renames mid-cycle and wakes
+the moment the first file lands in an empty folder.
+
+On Linux the folder is watched with inotify (through ctypes, no extra
+dependency); elsewhere, or if inotify is unavailable, a background thread
+checks the folder's mtime and only lists it again when that changes.
+"""
+
+import bisect
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+POLL_INTERVAL = 2       # seconds between folder mtime checks without inotify
+RESCAN_INTERVAL = 300   # full listing at least this often without inotify (in-place rewrites)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# A file is only playable once its writer closed it (or it was moved in whole)
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR)
+EVENT = struct.Struct("iIII")   # wd, mask, cookie, name length
+
+
+def load_inotify():
+    """libc with inotify, or None when the platform has none"""
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FolderWatcher:
+    """Sorted, live list of the video files in one folder.
+
+    on_add(path, stat) is called (from the watcher thread, and for every
+    file already present from start()) whenever a file appears or is
+    rewritten, so callers can index or cache it.
+    """
+
+    def __init__(self, folder, extensions, on_add=None, log=None):
+        self.folder = folder
+        self.extensions = extensions
+        self.on_add = on_add or (lambda path, stat: None)
+        self.log = log or (lambda message: None)
+        self.mode = None
+        self._paths = []
+        self._changed = threading.Condition()
+        self._closed = False
+        self._interrupted = False
+        self._fd = None
+        self._wake_r, self._wake_w = None, None
+        self._thread = None
+        self._listed_mtime = None
+
+    def start(self):
+        """List the folder once and begin watching it"""
+        libc = load_inotify()
+        if libc:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.folder), WATCH_MASK) >= 0:
+                self._fd = fd
+                self._wake_r, self._wake_w = os.pipe()
+                self.mode = "inotify"
+            elif fd >= 0:
+                os.close(fd)
+        if self.mode is None:
+            self.mode = "poll"
+            self._listed_mtime = self._folder_mtime()
+
+        # Listed after the watch is in place, so nothing slips in between
+        self._rescan()
+        target = self._read_events if self.mode == "inotify" else self._poll
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop watching and wake any waiter"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"x")
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(POLL_INTERVAL + 1)
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake_r = self._wake_w = None
+
+    def __contains__(self, path):
+        with self._changed:
+            index = bisect.bisect_left(self._paths, path)
+            return index < len(self._paths) and self._paths[index] == path
+
+    def playlist(self):
+        with self._changed:
+            return list(self._paths)
+
+    def next_after(self, current):
+        """(path, new cycle) of the item after current, wrapping at the end; (None, False) if empty"""
+        with self._changed:
+            if not self._paths:
+                return None, False
+            index = 0 if current is None else bisect.bisect_right(self._paths, current)
+            if index >= len(self._paths):
+                return self._paths[0], True
+            return self._paths[index], current is None
+
+    def upcoming(self, current, count):
+        """Up to count distinct items following current, wrapping around"""
+        with self._changed:
+            index = bisect.bisect_right(self._paths, current)
+            following = self._paths[index:] + self._paths[:index]
+            return [path for path in following if path != current][:count]
+
+    def wait(self, timeout=None):
+        """Block until the folder has files (or interrupt()/close()); returns True if it has"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._paths or self._closed or self._interrupted, timeout)
+            self._interrupted = False
+            return bool(self._paths)
+
+    def interrupt(self):
+        """Wake a thread blocked in wait()"""
+        with self._changed:
+            self._interrupted = True
+            self._changed.notify_all()
+
+    def _is_video(self, name):
+        return name.lower().endswith(self.extensions)
+
+    def _add(self, path, stat=None):
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return
+        with self._changed:
+            index = bisect.bisect_left(self._paths, path)
+            if index == len(self._paths) or self._paths[index] != path:
+                self._paths.insert(index, path)
+            self._changed.notify_all()
+        self.on_add(path, stat)
+
+    def _remove(self, path):
+        with self._changed:
+            index = bisect.bisect_left(self._paths, path)
+            if index < len(self._paths) and self._paths[index] == path:
+                del self._paths[index]
+
+    def _rescan(self):
+        """Full listing; reconciles the playlist and reports new or changed files"""
+        found = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if self._is_video(entry.name) and entry.is_file():
+                        found[entry.path] = entry.stat()
+        except OSError as e:
+            self.log(f"Cannot read folder: {e}")
+        with self._changed:
+            previous = set(self._paths)
+            self._paths = sorted(found)
+            self._changed.notify_all()
+        for path, stat in found.items():
+            if path not in previous:
+                self.on_add(path, stat)
+        return found
+
+    def _read_events(self):
+        buffer = b""
+        while not self._closed:
+            try:
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            except (OSError, ValueError):
+                return
+            if self._wake_r in readable or self._closed:
+                return
+            try:
+                buffer += os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+            while len(buffer) >= EVENT.size:
+                _, mask, _, length = EVENT.unpack_from(buffer)
+                if len(buffer) < EVENT.size + length:
+                    break
+                name = buffer[EVENT.size:EVENT.size + length].rstrip(b"\0")
+                buffer = buffer[EVENT.size + length:]
+                self._handle(mask, os.fsdecode(name))
+
+    def _handle(self, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # The kernel dropped events; fall back to one listing to resync
+            self._rescan()
+        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self.log(f"Watched folder {self.folder} was removed or moved")
+            with self._changed:
+                self._paths = []
+        elif name and not mask & IN_ISDIR and self._is_video(name):
+            path = os.path.join(self.folder, name)
+            if mask & (IN_MOVED_FROM | IN_DELETE):
+                self._remove(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._add(path)
+
+    def _folder_mtime(self):
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return None
+
+    def _poll(self):
+        """Fallback watcher: relist only when the folder's mtime moves"""
+        known = {}
+        for path in self.playlist():
+            try:
+                st = os.stat(path)
+                known[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+        last_scan = time.monotonic()
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._closed, POLL_INTERVAL)
+                if self._closed:
+                    return
+            mtime = self._folder_mtime()
+            if mtime == self._listed_mtime and time.monotonic() - last_scan < RESCAN_INTERVAL:
+                continue
+            self._listed_mtime, last_scan = mtime, time.monotonic()
+            found = self._rescan()
+            for path, st in found.items():
+                stamp = (st.st_size, st.st_mtime_ns)
+                if path in known and known[path] != stamp:
+                    self.on_add(path, st)   # rewritten in place
+            known = {path: (st.st_size, st.st_mtime_ns) for path, st in found.items()}